@@ -15,6 +15,7 @@ import { SaveLoadPanel, getSaveSlotKey, getAllSaveMetas, saveMetas, hasAnySaveDa
 import { updateWorldEntityAI, generateRoadPatrolPoints, generateCityPatrolPoints } from './services/worldMapAI.ts';
 import { generateWorldMap, getBiome, BIOME_CONFIGS, generateCityMarket, rollPriceModifier, generateCityQuests } from './services/mapGenerator.ts';
 import { calculateRecruitHireCost } from './services/recruitPricing.ts';
+import { BgmPlayer } from './services/audioVariants.ts';
 import { AmbitionSelect } from './components/AmbitionSelect.tsx';
 import { ContactModal } from './components/ContactModal.tsx';
 import { ConfirmDialog } from './components/ConfirmDialog.tsx';
@@ -935,42 +936,17 @@ export const App: React.FC = () => {
   const pendingMapRef = useRef<{ tiles: WorldTile[], cities: City[] } | null>(null);
 
   // --- 音频管理 (BGM播放与切换) ---
-  const bgmRef = useRef<HTMLAudioElement | null>(null);
+  const bgmRef = useRef<BgmPlayer | null>(null);
 
   useEffect(() => {
-    // 初始化音频对象
+    // 初始化播放器（片头先播、完整版后台加载后接上，见 services/audioVariants.ts）
     if (!bgmRef.current) {
-      bgmRef.current = new Audio();
-      bgmRef.current.loop = true;
+      bgmRef.current = new BgmPlayer();
     }
 
-    const audio = bgmRef.current;
-    audio.volume = bgmVolume;
-    
     // 战斗中使用特定的战斗音乐，其他界面使用主音乐
     const isCombat = view === 'COMBAT';
-    const targetSrc = isCombat ? '/audio/combat_bgm.mp3' : '/audio/main_bgm.mp3';
-    
-    // 检查 src 是否变化
-    const currentSrc = audio.src.split('/').pop();
-    const newSrc = targetSrc.split('/').pop();
-
-    if (currentSrc !== newSrc) {
-      audio.src = targetSrc;
-      audio.load();
-      
-      const playBgm = () => {
-        audio.play().catch(() => {
-          // 浏览器自动播放拦截处理：监听用户点击后播放
-          const retryPlay = () => {
-            audio.play().catch(() => {});
-            window.removeEventListener('click', retryPlay);
-          };
-          window.addEventListener('click', retryPlay);
-        });
-      };
-      playBgm();
-    }
+    bgmRef.current.play(isCombat ? '/audio/combat_bgm.mp3' : '/audio/main_bgm.mp3', bgmVolume);
   }, [view, bgmVolume]);
 
   useEffect(() => {
@@ -42,10 +42,18 @@ import {
   DamageResult,
   HitLocation
 } from '../services/damageService.ts';
+import { getAtlasFrame, getAtlasStyle } from '../services/iconAtlas.ts';
 
 // --- HELPER COMPONENTS ---
 
 const RenderIcon: React.FC<{ icon: string; className?: string; style?: React.CSSProperties }> = ({ icon, className, style }) => {
+  // 武器图标走图集：一张图集替代多张 640px 原图
+  const frame = getAtlasFrame(icon);
+  if (frame) {
+    const width = parseFloat(String(style?.width ?? frame.w));
+    const height = parseFloat(String(style?.height ?? frame.h));
+    return <span className={`icon-atlas ${className ?? ''}`} style={{ ...style, ...getAtlasStyle(frame, width, height) }} />;
+  }
   if (icon.startsWith('/assets/')) {
     return <img src={icon} alt="" className={className} style={{ ...style, display: 'inline-block', verticalAlign: 'middle' }} />;
   }
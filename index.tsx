@@ -45,6 +45,14 @@ import { App } from './App.tsx';
   }
 })();
 
+// 生产构建的资源缓存：sw.js 按 asset-manifest.json 取带内容哈希的副本并预缓存首屏资源。
+// Electron 的 file:// 不支持 Service Worker，直接跳过。
+if (import.meta.env.PROD && 'serviceWorker' in navigator && location.protocol.startsWith('http')) {
+  window.addEventListener('load', () => {
+    navigator.serviceWorker.register('./sw.js').catch(() => {});
+  });
+}
+
 const rootElement = document.getElementById('root');
 if (!rootElement) {
   throw new Error("Could not find root element to mount to");
@@ -0,0 +1,116 @@
+// 资源 Service Worker（仅生产构建注册，见 index.tsx）。
+// scripts/asset_manifest.py 在 dist/ 中为 public/ 的每个资源放一份带内容哈希的副本，
+// 并写出 asset-manifest.json（逻辑路径 → 哈希副本）与 precache.json（按首屏优先级排序）。
+// 页面仍按固定文件名请求（/audio/main_bgm.mp3 等），这里经清单改为取哈希副本、缓存优先：
+// 哈希副本内容永不变化，重复启动全部命中缓存；版本更新后只下载哈希变了的文件，清单不再引用的副本被删除。
+
+const ASSET_CACHE = 'assets-v1';
+const META_CACHE = 'asset-meta-v1';
+const SCOPE = self.registration.scope;
+const SCOPE_PATH = new URL(SCOPE).pathname;
+const MANIFEST_URL = new URL('asset-manifest.json', SCOPE).href;
+const PRECACHE_URL = new URL('precache.json', SCOPE).href;
+
+let manifest = null;   // { version, assets: { 逻辑路径: { file, sha256, bytes } } }
+let refreshing = null;
+
+const assetUrl = file => new URL(file, SCOPE).href;
+
+const fetchFresh = async url => {
+  const response = await fetch(url, { cache: 'no-cache' });
+  if (!response.ok) throw new Error(`${url}: ${response.status}`);
+  return response;
+};
+
+/** 取最新清单：预缓存 precache.json 中还没有的哈希副本，再删除新清单不再引用的副本 */
+const refresh = () => {
+  refreshing = refreshing || (async () => {
+    const [manifestResponse, precacheResponse] = await Promise.all([fetchFresh(MANIFEST_URL), fetchFresh(PRECACHE_URL)]);
+    await (await caches.open(META_CACHE)).put(MANIFEST_URL, manifestResponse.clone());
+    const next = await manifestResponse.json();
+    const { urls } = await precacheResponse.json();
+    const cache = await caches.open(ASSET_CACHE);
+    for (const file of urls) {
+      if (!(await cache.match(assetUrl(file)))) await cache.add(assetUrl(file));
+    }
+    manifest = next;
+    const current = new Set(Object.values(next.assets).map(entry => assetUrl(entry.file)));
+    for (const request of await cache.keys()) {
+      if (!current.has(request.url)) await cache.delete(request);
+    }
+  })().catch(() => {}).finally(() => { refreshing = null; });
+  return refreshing;
+};
+
+/** 当前清单；Service Worker 被回收后重启时从缓存恢复 */
+const currentManifest = async () => {
+  if (!manifest) {
+    const cached = await (await caches.open(META_CACHE)).match(MANIFEST_URL);
+    if (cached) manifest = await cached.json();
+  }
+  return manifest;
+};
+
+/** 音频元素发的是 Range 请求：从缓存的完整响应中切出对应区间 */
+const sliceRange = async (response, range) => {
+  const match = /^bytes=(\d*)-(\d*)$/.exec(range.trim());
+  if (!match || (!match[1] && !match[2])) return response;
+  const body = await response.arrayBuffer();
+  const size = body.byteLength;
+  const start = match[1] ? Number(match[1]) : Math.max(0, size - Number(match[2]));
+  const end = match[1] && match[2] ? Math.min(Number(match[2]), size - 1) : size - 1;
+  if (start >= size || start > end) {
+    return new Response(null, { status: 416, headers: { 'Content-Range': `bytes */${size}` } });
+  }
+  return new Response(body.slice(start, end + 1), {
+    status: 206,
+    headers: {
+      'Content-Type': response.headers.get('Content-Type') || '',
+      'Content-Range': `bytes ${start}-${end}/${size}`,
+      'Content-Length': String(end - start + 1),
+    },
+  });
+};
+
+const serve = async (request, logical) => {
+  const entry = (await currentManifest())?.assets[logical];
+  if (!entry) return fetch(request);
+  const url = assetUrl(entry.file);
+  const cache = await caches.open(ASSET_CACHE);
+  let response = await cache.match(url);
+  if (!response) {
+    response = await fetch(url);
+    if (!response.ok) return response;
+    await cache.put(url, response.clone());
+  }
+  const range = request.headers.get('range');
+  return range ? sliceRange(response, range) : response;
+};
+
+self.addEventListener('install', event => {
+  event.waitUntil(refresh().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil((async () => {
+    for (const name of await caches.keys()) {
+      if (name !== ASSET_CACHE && name !== META_CACHE) await caches.delete(name);
+    }
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('fetch', event => {
+  const { request } = event;
+  if (request.method !== 'GET') return;
+  if (request.mode === 'navigate') {
+    // 每次启动检查一次清单，页面本身照常走网络
+    event.waitUntil(refresh());
+    return;
+  }
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin || !url.pathname.startsWith(SCOPE_PATH)) return;
+  const logical = decodeURIComponent(url.pathname.slice(SCOPE_PATH.length));
+  if (manifest && !manifest.assets[logical]) return;
+  event.respondWith(serve(request, logical));
+});
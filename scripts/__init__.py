@@ -0,0 +1 @@
+"""QingBrother 资源/数据脚本。统一入口见 __main__.py（python -m scripts）。"""
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+scripts/ 统一命令行入口。
+
+用法:
+    python -m scripts <子命令> [参数...]
+    python -m scripts csv --dry-run weapons
+    python -m scripts images --dry-run
+    python -m scripts validate
+    python -m scripts stats
+    python -m scripts compose --profile   # 任意子命令加 --profile 即输出剖析报告（见 profiling.py）
+
+子命令所在模块只在被调用时才导入；google.genai / PIL 等重依赖也只在真正
+需要时由各模块内部导入，所以 dry-run / validate / stats 这类轻命令启动只需几十毫秒。
+路径一律相对仓库根目录解析，可在任意目录下运行。
+"""
+
+import importlib
+import sys
+from pathlib import Path
+
+# 子命令 → (模块, 入口函数, 说明)
+COMMANDS = {
+    "csv": ("generate_csv", "main", "用 Gemini 生成配置数据（CSV / 任务模板）"),
+    "images": ("generate_images", "main", "按 docs/art_design_prompts.md 生成美术图"),
+    "derive": ("derivatives", "main", "为成品图生成 WebP/AVIF/缩略图/元数据"),
+    "compose": ("smart_compose", "main", "AI 布局 + Logo 合成宣传图"),
+    "icons": ("generate_icons", "main", "生成 Android / Electron / Web 图标"),
+    "atlas": ("sprite_atlas", "main", "打包武器图标图集（1x/2x WebP + PNG）"),
+    "fonts": ("subset_fonts", "main", "按游戏文本子集化 Noto Serif SC 字体"),
+    "taptap": ("taptap_crop_screenshots", "main", "按 TapTap 规范裁剪截图"),
+    "stores": ("store_export", "main", "按商店规格表导出截图与宣传图（TapTap/Google Play/Steam/itch）"),
+    "audio": ("audio_variants", "main", "用 ffmpeg 生成背景音乐的 Opus/AAC 低码率版本、片头与清单"),
+    "manifest": ("asset_manifest", "main", "为 dist/ 生成带内容哈希的资源副本、清单与预缓存列表"),
+    "budget": ("payload_budget", "main", "冷启动下载量/解析量预算报告（按提交记录历史）"),
+    "models": ("list_models", "main", "测速候选 Gemini 模型，按任务选出最快的（--list 只列出）"),
+    "docx": ("extract_docx", "main", "从 .docx 批量提取保留结构的 Markdown 文本"),
+    "build": ("build", "main", "增量构建全部资源"),
+    "db": ("design_db", "main", "把 csv/ 构建为带类型与索引的 SQLite 数据库，或执行查询"),
+    "recruits": ("recruit_sim", "main", "蒙特卡洛评估各背景新兵的属性分布与战力/薪资性价比"),
+    "market": ("market_sim", "main", "蒙特卡洛模拟各城市规模的商店库存、价格与找到物品的天数"),
+    "validate": ("csv_tools", "validate_main", "校验 csv/ 配置表"),
+    "stats": ("csv_tools", "stats_main", "统计 csv/ 配置表规模"),
+}
+
+
+def print_usage():
+    print("用法: python -m scripts <子命令> [参数...]\n")
+    print("子命令:")
+    for name, (_, _, help_text) in COMMANDS.items():
+        print(f"  {name:<10} {help_text}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help", "help"):
+        print_usage()
+        return
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        print(f"[错误] 未知子命令 '{name}'\n")
+        print_usage()
+        sys.exit(2)
+
+    # 各脚本之间以顶层模块名互相导入（from common import ...），与直接运行脚本时一致
+    scripts_dir = str(Path(__file__).resolve().parent)
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+
+    from profiling import profiled_main
+
+    module_name, func_name, _ = COMMANDS[name]
+    sys.argv = [f"python -m scripts {name}"] + rest
+    profiled_main(getattr(importlib.import_module(module_name), func_name), label=name)
+
+
+if __name__ == "__main__":
+    main()
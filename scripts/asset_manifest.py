@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+静态资源内容哈希清单与预缓存列表（Web / Electron / Capacitor 共用 dist/）。
+
+public/ 下的资源以固定文件名发布，客户端无法长期缓存，更新后也无法精确失效。
+本脚本在 vite build 之后运行：
+    1. 并行计算 public/ 下每个资源的 sha256（HashCache 按 size+mtime 缓存，未改动的文件不重读）
+    2. 在输出目录里为每个资源放一份带哈希的副本：audio/main_bgm.mp3 → audio/main_bgm.<哈希>.mp3
+       （能硬链接就硬链接；文件名已带内容哈希的，如字体子集，直接沿用原名）
+    3. 写出 asset-manifest.json（逻辑路径 → 带哈希的路径）与 precache.json（按首屏优先级排序）
+上次清单里有、这次不再引用的哈希副本会被删除。
+
+页面仍按固定文件名请求资源，由 public/sw.js（Service Worker）读取这两个文件：
+固定文件名经清单换成哈希副本、缓存优先；安装时与每次启动时按 precache.json 预缓存，
+并删除新清单不再引用的副本。哈希副本内容永不变化，也可以在服务器上配置为永久缓存
+（Cache-Control: immutable）；版本更新后只有哈希变了的文件需要重新下载。
+
+用法:
+    npm run build && python -m scripts manifest         # 输出到 dist/
+    python scripts/asset_manifest.py --out dist --workers 8
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from buildgraph import hash_cache
+from common import ROOT
+from encoder import write_atomic
+from profiling import profiled_main, span
+
+PUBLIC_DIR = ROOT / "public"
+DIST_DIR = ROOT / "dist"
+MANIFEST_NAME = "asset-manifest.json"
+PRECACHE_NAME = "precache.json"
+HASH_LENGTH = 10
+
+# 只用于构建、运行时不会请求的文件
+EXCLUDE = [
+    "fonts/NotoSerifSC/*",           # 字体分片（subset_fonts.py 的输入）
+    "fonts/NotoSerifSC.slices.css",
+    "fonts/NotoSerifSC-subset/subset.json",
+    "assets/icons/*",                # 已打进图集（sprite_atlas.py）
+    "assets/atlas/icons.json",       # 打包进 JS
+    "audio/variants/*/*.json",       # 音频清单，同样打包进 JS
+]
+
+# 保持固定文件名、不进清单的文件：Service Worker 本身（浏览器按原名检查更新）
+STABLE = ["sw.js"]
+
+# 首屏资源，按加载顺序分组：首屏文字 → 首屏图片与图标 → 主菜单音乐（Opus 版）。
+# payload_budget.py 按同一份列表区分首屏与延后加载。
+FIRST_SCREEN = [
+    ["fonts/NotoSerifSC.css", "fonts/NotoSerifSC-subset/*.woff2"],
+    ["favicon.ico", "images/p6.png"],
+    ["audio/variants/main_bgm/*.opus32.webm"],  # 片头在前，完整版随后
+]
+
+# 预缓存顺序：首屏资源 → 战斗界面；同组内小文件在前。不匹配任何一组的资源按需加载，不预缓存。
+PRECACHE_PRIORITY = FIRST_SCREEN + [
+    ["assets/atlas/*.webp", "audio/combat_bgm.*"],
+]
+
+# 文件名里已有内容哈希（如 noto-serif-sc-400.1701da8336.woff2）
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{8,}\.[^.]+$")
+
+
+def _rel(path: Path, base: Path) -> str:
+    return path.relative_to(base).as_posix()
+
+
+def list_assets(public: Path = PUBLIC_DIR) -> list[Path]:
+    files = []
+    for path in sorted(public.rglob("*")):
+        if path.is_file() and not any(fnmatch.fnmatch(_rel(path, public), pat) for pat in EXCLUDE):
+            files.append(path)
+    return files
+
+
+def hashed_name(logical: str, digest: str) -> str:
+    if HASHED_NAME_RE.search(logical):
+        return logical
+    stem, dot, ext = logical.rpartition(".")
+    if not dot or "/" in ext:
+        return f"{logical}.{digest[:HASH_LENGTH]}"
+    return f"{stem}.{digest[:HASH_LENGTH]}.{ext}"
+
+
+def place_copy(src: Path, dest: Path) -> bool:
+    """放一份副本；目标已存在（内容寻址，同名即同内容）时跳过。返回是否新写入。"""
+    if dest.exists() and dest.stat().st_size == src.stat().st_size:
+        return False
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+    return True
+
+
+def precache_order(assets: dict) -> list[str]:
+    ordered = []
+    for group in PRECACHE_PRIORITY:
+        matched = [name for name in assets if name not in ordered
+                   and any(fnmatch.fnmatch(name, pat) for pat in group)]
+        ordered += sorted(matched, key=lambda name: (assets[name]["bytes"], name))
+    return ordered
+
+
+def build_manifest(out_dir: Path = DIST_DIR, public: Path = PUBLIC_DIR, workers: int | None = None) -> dict:
+    files = [path for path in list_assets(public) if _rel(path, public) not in STABLE]
+    cache = hash_cache()
+    with span("hash", files=len(files)), ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+        digests = list(pool.map(cache.digest, files))
+    cache.save()
+
+    assets = {}
+    for path, digest in zip(files, digests):
+        logical = _rel(path, public)
+        assets[logical] = {"file": hashed_name(logical, digest), "sha256": digest, "bytes": path.stat().st_size}
+
+    with span("copy", files=len(assets)):
+        copied = sum(place_copy(public / name, out_dir / entry["file"])
+                     for name, entry in assets.items() if entry["file"] != name)
+        for name, entry in assets.items():
+            if entry["file"] == name:
+                place_copy(public / name, out_dir / name)
+
+    # 删除上一版清单引用、这一版不再引用的哈希副本
+    manifest_path = out_dir / MANIFEST_NAME
+    try:
+        previous = json.loads(manifest_path.read_text(encoding="utf-8")).get("assets", {})
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    current = {entry["file"] for entry in assets.values()}
+    removed = 0
+    for name, entry in previous.items():
+        if entry["file"] != name and entry["file"] not in current:
+            (out_dir / entry["file"]).unlink(missing_ok=True)
+            removed += 1
+
+    precache = precache_order(assets)
+    manifest = {"version": 1, "assets": assets}
+    write_atomic(manifest_path, (json.dumps(manifest, ensure_ascii=False, indent=1) + "\n").encode("utf-8"))
+    write_atomic(out_dir / PRECACHE_NAME, (json.dumps({
+        "urls": [assets[name]["file"] for name in precache],
+        "bytes": sum(assets[name]["bytes"] for name in precache),
+    }, ensure_ascii=False, indent=1) + "\n").encode("utf-8"))
+    return {"assets": len(assets), "copied": copied, "removed": removed, "precache": precache,
+            "precache_bytes": sum(assets[name]["bytes"] for name in precache)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成带内容哈希的资源副本、清单与预缓存列表")
+    parser.add_argument("--out", type=Path, default=DIST_DIR, help="输出目录（默认 dist/，vite build 之后运行）")
+    parser.add_argument("--workers", type=int, default=None, help="哈希线程数（默认 CPU 核数）")
+    args = parser.parse_args()
+
+    if not PUBLIC_DIR.is_dir():
+        print(f"[错误] 找不到 {PUBLIC_DIR}")
+        sys.exit(1)
+    out_dir = args.out if args.out.is_absolute() else ROOT / args.out
+    stats = build_manifest(out_dir, workers=args.workers)
+    print(f"资源 {stats['assets']} 个：新写入哈希副本 {stats['copied']}，删除过期副本 {stats['removed']}")
+    print(f"预缓存 {len(stats['precache'])} 个（{stats['precache_bytes'] / 1024:.0f} KB）:")
+    for name in stats["precache"]:
+        print(f"  {name}")
+    print(f"清单: {out_dir / MANIFEST_NAME}")
+
+
+if __name__ == "__main__":
+    profiled_main(main)
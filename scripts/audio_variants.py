@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+音频资源构建：用本机 ffmpeg 为 public/audio/*.mp3 生成低码率流式版本、片头分段与清单。
+
+每个源文件输出到 public/audio/variants/<名>/：
+    <名>.opus<码率>.webm      Opus（Chrome / Android WebView / Electron）
+    <名>.aac<码率>.m4a        AAC（Safari / iOS），moov 前置，边下边播
+    <名>.intro.opus32.webm / <名>.intro.aac48.m4a
+                              前 INTRO_SECONDS 秒的片头：先播片头，完整版后台加载好后从同一位置接上
+    <名>.json                 清单：源文件哈希/时长、各文件码率与大小、响度、循环点
+
+响度与循环点来自一次 ffmpeg 分析（loudnorm + silencedetect，不改动音频本身）：
+    loudness.integrated_lufs / true_peak_db / lra，gain_db = TARGET_LUFS - integrated，由播放端调音量
+    loop.start / loop.end：去掉首尾静音后的循环区间（秒）
+
+每个源文件是构建图中的一个节点（audio:<名>），只有源文件内容或编码参数变化才重建；
+各码率的编码在线程池里并行（每个线程驱动一个 ffmpeg 进程）。
+
+用法:
+    python scripts/audio_variants.py                 # 全部 public/audio/*.mp3
+    python scripts/audio_variants.py main_bgm --force
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from buildgraph import BuildGraph, file_digest
+from common import ROOT
+from encoder import write_atomic
+from profiling import profiled_main, span
+
+AUDIO_DIR = ROOT / "public" / "audio"
+VARIANTS_DIR = AUDIO_DIR / "variants"
+
+# 源 mp3 约 64kbps；Opus 32kbps 立体声对背景音乐已足够，24 给弱网，AAC 只给不支持 Opus 的 Safari
+OPUS_KBPS = (24, 32, 48)
+AAC_KBPS = (48,)
+INTRO_SECONDS = 8
+INTRO_OPUS_KBPS = 32
+INTRO_AAC_KBPS = 48
+SAMPLE_RATE_AAC = 44100  # Opus 固定 48kHz
+
+TARGET_LUFS = -18.0      # 背景音乐的目标响度
+SILENCE_DB = -50         # 低于该电平视为静音
+SILENCE_MIN = 0.05       # 至少持续这么久（秒）才算静音段
+
+CODECS = {
+    "opus": {"ext": "webm", "args": ["-c:a", "libopus", "-vbr", "on", "-application", "audio"]},
+    "aac": {"ext": "m4a", "args": ["-c:a", "aac", "-ar", str(SAMPLE_RATE_AAC), "-movflags", "+faststart"]},
+}
+
+
+def ffmpeg_path() -> str | None:
+    return shutil.which(os.environ.get("FFMPEG", "ffmpeg"))
+
+
+def list_sources(names=None) -> list[Path]:
+    files = sorted(AUDIO_DIR.glob("*.mp3"))
+    if names:
+        files = [f for f in files if f.stem in names]
+    return files
+
+
+def variant_specs(stem: str) -> list[dict]:
+    """全部输出文件：[{file, codec, kbps, intro}]。"""
+    specs = [{"file": f"{stem}.opus{k}.webm", "codec": "opus", "kbps": k, "intro": False} for k in OPUS_KBPS]
+    specs += [{"file": f"{stem}.aac{k}.m4a", "codec": "aac", "kbps": k, "intro": False} for k in AAC_KBPS]
+    specs += [
+        {"file": f"{stem}.intro.opus{INTRO_OPUS_KBPS}.webm", "codec": "opus", "kbps": INTRO_OPUS_KBPS, "intro": True},
+        {"file": f"{stem}.intro.aac{INTRO_AAC_KBPS}.m4a", "codec": "aac", "kbps": INTRO_AAC_KBPS, "intro": True},
+    ]
+    return specs
+
+
+def output_dir(src: Path) -> Path:
+    return VARIANTS_DIR / src.stem
+
+
+def manifest_path(src: Path) -> Path:
+    return output_dir(src) / f"{src.stem}.json"
+
+
+# ============================================================
+#  ffmpeg
+# ============================================================
+
+def _run(args: list[str]) -> subprocess.CompletedProcess:
+    result = subprocess.run(args, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"ffmpeg 失败（{result.returncode}）: {tail}")
+    return result
+
+
+def analyze(ffmpeg: str, src: Path) -> dict:
+    """一次解码同时得到 响度（loudnorm 第一遍）、首尾静音（silencedetect）与时长。"""
+    with span("analyze", file=src.name):
+        result = _run([
+            ffmpeg, "-hide_banner", "-nostats", "-i", str(src),
+            "-af", f"silencedetect=n={SILENCE_DB}dB:d={SILENCE_MIN},loudnorm=I={TARGET_LUFS}:print_format=json",
+            "-f", "null", "-",
+        ])
+    log = result.stderr
+    match = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", log)
+    duration = int(match[1]) * 3600 + int(match[2]) * 60 + float(match[3]) if match else None
+    stats = json.loads(log[log.rindex("{"):log.rindex("}") + 1])
+    integrated = float(stats["input_i"])
+
+    starts = [max(0.0, float(v)) for v in re.findall(r"silence_start:\s*(-?[\d.]+)", log)]
+    ends = [float(v) for v in re.findall(r"silence_end:\s*([\d.]+)", log)]
+    # 有的 ffmpeg 版本在文件结尾处不输出最后一段的 silence_end
+    segments = list(zip(starts, ends + [duration or 0.0] * (len(starts) - len(ends))))
+    loop_start, loop_end = 0.0, duration
+    if segments and segments[0][0] <= 0.01:
+        loop_start = segments[0][1]  # 开头的静音段
+    if segments and duration and segments[-1][1] >= duration - SILENCE_MIN and segments[-1][0] > loop_start:
+        loop_end = segments[-1][0]  # 一直持续到结尾的静音段
+    return {
+        "duration": round(duration, 3) if duration else None,
+        "loudness": {
+            "integrated_lufs": integrated,
+            "true_peak_db": float(stats["input_tp"]),
+            "lra": float(stats["input_lra"]),
+            "target_lufs": TARGET_LUFS,
+            "gain_db": round(TARGET_LUFS - integrated, 2),
+        },
+        "loop": {"start": round(loop_start, 3), "end": round(loop_end, 3) if loop_end else None},
+    }
+
+
+def encode_variant(ffmpeg: str, src: Path, out: Path, spec: dict) -> dict:
+    codec = CODECS[spec["codec"]]
+    args = [ffmpeg, "-hide_banner", "-nostats", "-y", "-i", str(src), "-vn", "-map_metadata", "-1"]
+    if spec["intro"]:
+        args += ["-t", str(INTRO_SECONDS)]
+    tmp = out.with_name(out.stem + ".tmp" + out.suffix)  # 保留扩展名，ffmpeg 据此选封装格式
+    args += codec["args"] + ["-b:a", f"{spec['kbps']}k", str(tmp)]
+    with span("encode", file=out.name):
+        _run(args)
+    os.replace(tmp, out)
+    return {**spec, "bytes": out.stat().st_size}
+
+
+def build_source(src: Path, workers: int | None = None) -> list[Path]:
+    """分析 + 并行编码全部版本，写清单。返回写出的文件。"""
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        raise RuntimeError("找不到 ffmpeg（安装后加入 PATH，或用环境变量 FFMPEG 指定路径）")
+    out_dir = output_dir(src)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    specs = variant_specs(src.stem)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+        info = pool.submit(analyze, ffmpeg, src)
+        encoded = [pool.submit(encode_variant, ffmpeg, src, out_dir / s["file"], s) for s in specs]
+        info = info.result()
+        files = [future.result() for future in encoded]
+
+    manifest = {
+        "source": {"file": src.relative_to(AUDIO_DIR).as_posix(), "sha256": file_digest(src),
+                   "bytes": src.stat().st_size, "duration": info["duration"]},
+        "loudness": info["loudness"],
+        "loop": info["loop"],
+        "intro": {"seconds": INTRO_SECONDS, "files": [f for f in files if f["intro"]]},
+        "variants": [f for f in files if not f["intro"]],
+    }
+    write_atomic(manifest_path(src), (json.dumps(manifest, ensure_ascii=False, indent=2) + "\n").encode("utf-8"))
+    smallest = min(f["bytes"] for f in manifest["variants"])
+    intro = min(f["bytes"] for f in manifest["intro"]["files"])
+    print(f"  [写入] {src.name}: {len(files)} 个文件，最小版本 {smallest / 1024:.0f} KB"
+          f"（源 {src.stat().st_size / 1024:.0f} KB），片头 {intro / 1024:.0f} KB，"
+          f"响度 {info['loudness']['integrated_lufs']:.1f} LUFS")
+    return [out_dir / s["file"] for s in specs] + [manifest_path(src)]
+
+
+# ============================================================
+#  构建图
+# ============================================================
+
+def build_nodes(graph, names=None):
+    if ffmpeg_path() is None:
+        print("  [跳过] audio: 未安装 ffmpeg")
+        return
+    for src in list_sources(names):
+        graph.add(
+            f"audio:{src.stem}",
+            lambda src=src: build_source(src),
+            inputs=[src],
+            outputs=[output_dir(src) / s["file"] for s in variant_specs(src.stem)] + [manifest_path(src)],
+            params={
+                "opus": list(OPUS_KBPS), "aac": list(AAC_KBPS), "aac_rate": SAMPLE_RATE_AAC,
+                "intro": [INTRO_SECONDS, INTRO_OPUS_KBPS, INTRO_AAC_KBPS],
+                "codecs": CODECS, "loudness": TARGET_LUFS, "silence": [SILENCE_DB, SILENCE_MIN],
+            },
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用 ffmpeg 生成 Opus/AAC 多码率版本、片头与清单")
+    parser.add_argument("names", nargs="*", help="只处理这些文件（不含扩展名，如 main_bgm）")
+    parser.add_argument("--force", action="store_true", help="忽略构建记录，全部重新编码")
+    args = parser.parse_args()
+
+    if ffmpeg_path() is None:
+        print("[错误] 找不到 ffmpeg，请先安装（https://ffmpeg.org/download.html）并加入 PATH，"
+              "或用环境变量 FFMPEG 指定路径")
+        sys.exit(1)
+    graph = BuildGraph()
+    build_nodes(graph, args.names or None)
+    if not graph.nodes:
+        print(f"[错误] 在 {AUDIO_DIR} 下未找到 mp3")
+        sys.exit(1)
+    results = graph.build(force=args.force)
+    fresh = sorted(name for name, status in results.items() if status == "fresh")
+    if fresh:
+        print(f"  源文件未变化，跳过: {', '.join(fresh)}")
+    if "failed" in results.values():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    profiled_main(main)
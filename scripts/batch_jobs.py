@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+离线批处理任务（Gemini Batch API）的提交、轮询与断点续跑。
+
+批量生成内容时不需要交互式延迟，走 Batch API 吞吐更高、费用更低。
+流程：
+    1. 把所有请求序列化为 JSONL（每行 {"key": ..., "request": {...}}）
+    2. 提交任务，把任务名和 JSONL 路径写进 scripts/.cache/batch/<kind>.json
+    3. 轮询直到结束；中途 Ctrl-C 后再次以 --batch 运行会接着轮询同一个任务
+    4. 逐条产出结果，交给调用方走原有的校验/写入流程；已处理的 key 会记进
+       状态文件，重跑时不会重复追加
+任务以 FAILED / CANCELLED / EXPIRED 结束时不再续跑，下次运行重新提交。
+
+用法:
+    run_batch("generate_csv", model, build_requests, handle_result, backend)
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+from common import cache_path
+from genai_backend import BATCH_SUCCEEDED, BATCH_TERMINAL
+
+POLL_INTERVAL = float(os.environ.get("GEMINI_BATCH_POLL", "30"))
+
+
+def text_request(prompt: str, system_instruction: str | None = None, **generation_config) -> dict:
+    """构建一条纯文本请求（REST 格式）。"""
+    request = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+    if system_instruction:
+        request["system_instruction"] = {"parts": [{"text": system_instruction}]}
+    if generation_config:
+        request["generation_config"] = generation_config
+    return request
+
+
+def _state_path(kind: str):
+    return cache_path("batch", f"{kind}.json")
+
+
+def load_state(kind: str) -> dict | None:
+    path = _state_path(kind)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_state(kind: str, state: dict):
+    path = _state_path(kind)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def submit(kind: str, model: str, requests: list[tuple[str, dict]], backend) -> dict:
+    """写出 JSONL 并提交任务，返回新的状态。"""
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    jsonl_path = cache_path("batch", f"{kind}-{stamp}.jsonl")
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for key, request in requests:
+            f.write(json.dumps({"key": key, "request": request}, ensure_ascii=False) + "\n")
+    job_name = backend.submit_batch(model, jsonl_path, f"{kind}-{stamp}")
+    state = {
+        "kind": kind,
+        "model": model,
+        "job": job_name,
+        "jsonl": str(jsonl_path),
+        "keys": [key for key, _ in requests],
+        "done": [],
+        "status": "SUBMITTED",
+        "submitted_at": stamp,
+    }
+    save_state(kind, state)
+    print(f"  [批处理] 已提交 {len(requests)} 条请求: {job_name}")
+    return state
+
+
+def _resumable(state: dict) -> bool:
+    """还在排队/运行，或已成功但结果没处理完；失败、取消、过期的任务没有可续跑的结果。"""
+    status = state["status"]
+    return status != "CONSUMED" and (status not in BATCH_TERMINAL or status == BATCH_SUCCEEDED)
+
+
+def run_batch(kind: str, model: str, build_requests, handle_result, backend,
+              poll_interval: float = POLL_INTERVAL) -> bool:
+    """
+    提交（或续跑）批处理任务并把结果逐条交给 handle_result(key, response_dict)。
+    build_requests() 只在需要新提交时调用，返回 [(key, request), ...]。
+    返回是否全部处理完毕。
+    """
+    state = load_state(kind)
+    if state and _resumable(state):
+        print(f"  [批处理] 续跑未完成的任务 {state['job']}（已处理 {len(state['done'])}/{len(state['keys'])}）")
+    else:
+        if state and state["status"] != "CONSUMED":
+            print(f"  [批处理] 上次任务 {state['job']} 结束于 {state['status']}，重新提交")
+        requests = build_requests()
+        if not requests:
+            print("  [批处理] 没有需要提交的请求")
+            return True
+        state = submit(kind, model, requests, backend)
+
+    # 轮询
+    while state["status"] not in BATCH_TERMINAL:
+        status = backend.batch_state(state["job"])
+        if status != state["status"]:
+            print(f"  [批处理] {state['job']}: {status}")
+            state["status"] = status
+            save_state(kind, state)
+        if status not in BATCH_TERMINAL:
+            time.sleep(poll_interval)
+
+    if state["status"] != BATCH_SUCCEEDED:
+        print(f"  [错误] 批处理任务结束于 {state['status']}，下次运行会重新提交")
+        return False
+
+    # 逐条回流结果；每条处理完立即落盘，中断后不会重复写入
+    done = set(state["done"])
+    for key, response in backend.batch_results(state["job"], state["keys"]):
+        if key in done:
+            continue
+        if response is None:
+            print(f"  [跳过] {key}: 批处理中该请求失败")
+        else:
+            handle_result(key, response)
+        done.add(key)
+        state["done"].append(key)
+        save_state(kind, state)
+
+    state["status"] = "CONSUMED"
+    save_state(kind, state)
+    print(f"  [批处理] 完成，共处理 {len(done)} 条结果")
+    return True
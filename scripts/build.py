@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+资源/数据统一增量构建入口。
+
+各脚本通过 build_nodes(graph) 向构建图注册自己的节点，每个输出都记录其输入
+（源图、提示词、Logo、布局模型、规范参数等）的内容哈希；只重建过期的节点，
+按依赖顺序并行执行。
+
+用法:
+    python scripts/build.py                  # 构建全部本地分组（不含 REMOTE_GROUPS）
+    python scripts/build.py images compose   # 调用远程 API 的分组需要显式指定
+    python scripts/build.py icons taptap     # 只构建指定分组（或节点名，如 taptap:screen1）
+    python scripts/build.py --dry-run        # 只列出过期节点，不执行
+    python scripts/build.py --force          # 忽略记录，全部重建
+    python scripts/build.py -j 8             # 并行度（默认 CPU 核数）
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+from buildgraph import BuildGraph
+from profiling import profiled_main
+
+# 分组 → 注册节点的脚本模块（按需导入）
+GROUPS = {
+    "images": "generate_images",
+    "compose": "smart_compose",
+    "icons": "generate_icons",
+    "atlas": "sprite_atlas",
+    "fonts": "subset_fonts",
+    "taptap": "taptap_crop_screenshots",
+    "stores": "store_export",
+    "audio": "audio_variants",
+    "db": "design_db",
+}
+# 调用付费图像 API / AI 布局分析的分组：不在默认构建中，需显式指定分组或节点名
+REMOTE_GROUPS = {"images", "compose"}
+
+
+def make_graph(groups) -> BuildGraph:
+    graph = BuildGraph()
+    for group in groups:
+        importlib.import_module(GROUPS[group]).build_nodes(graph)
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量构建资源与数据")
+    parser.add_argument("targets", nargs="*", help=f"分组或节点名（分组: {', '.join(GROUPS)}）")
+    parser.add_argument("--dry-run", action="store_true", help="只列出过期节点")
+    parser.add_argument("--force", action="store_true", help="忽略构建记录，全部重建")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 4, help="并行度")
+    args = parser.parse_args()
+
+    groups = {t.split(":", 1)[0] for t in args.targets} or set(GROUPS) - REMOTE_GROUPS
+    unknown = groups - set(GROUPS)
+    if unknown:
+        print(f"[错误] 未知分组: {', '.join(sorted(unknown))}，支持: {', '.join(GROUPS)}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    if not args.targets:
+        print(f"[提示] 默认跳过调用远程 API 的分组: {', '.join(sorted(REMOTE_GROUPS))}（需要时显式指定）")
+    graph = make_graph(g for g in GROUPS if g in groups)
+    results = graph.build(args.targets or None, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+
+    counts = {}
+    for status in results.values():
+        counts[status] = counts.get(status, 0) + 1
+    summary = ", ".join(f"{k} {v}" for k, v in sorted(counts.items())) or "无节点"
+    print(f"\n构建结束（{time.perf_counter() - start:.2f}s）: {summary}")
+    if counts.get("failed"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    profiled_main(main)
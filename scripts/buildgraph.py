@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Make 风格的增量构建图。
+
+每个节点声明 输入文件 + 参数 → 输出文件，以及生成输出的 action。构建时：
+- 节点签名 = 所有输入文件的内容哈希 + 参数哈希；签名与上次成功构建时记录的
+  一致且输出都在，则跳过
+- 一个节点的输入若是另一个节点的输出，自动形成依赖；按依赖顺序、用线程池并行执行
+- 文件哈希按 (size, mtime_ns) 缓存在 scripts/.cache/hash_cache.json，
+  未改动的文件不会重新读取，空构建在一秒内完成
+
+用法:
+    graph = BuildGraph()
+    graph.add("icons:android", action, inputs=[src], outputs=[...], params={...})
+    graph.build(jobs=4)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from common import ROOT, cache_path
+
+HASH_CACHE_FILE = cache_path("hash_cache.json")
+BUILD_STATE_FILE = cache_path("build_state.json")
+
+
+# ============================================================
+#  内容哈希（带 mtime 缓存）
+# ============================================================
+
+class HashCache:
+    """按 (size, mtime_ns) 缓存文件 sha256，线程安全。"""
+
+    def __init__(self, path: Path = HASH_CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = False
+        try:
+            self.entries = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def digest(self, file: Path) -> str | None:
+        """返回文件内容的 sha256；文件不存在返回 None。"""
+        try:
+            st = os.stat(file)
+        except FileNotFoundError:
+            return None
+        key = str(Path(file).resolve())
+        stamp = [st.st_size, st.st_mtime_ns]
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[:2] == stamp:
+                return entry[2]
+        h = hashlib.sha256()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        value = h.hexdigest()
+        with self.lock:
+            self.entries[key] = stamp + [value]
+            self.dirty = True
+        return value
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.entries), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self.dirty = False
+
+
+_HASH_CACHE: HashCache | None = None
+
+
+def hash_cache() -> HashCache:
+    """进程内共享的哈希缓存。"""
+    global _HASH_CACHE
+    if _HASH_CACHE is None:
+        _HASH_CACHE = HashCache()
+    return _HASH_CACHE
+
+
+def file_digest(path: Path) -> str | None:
+    return hash_cache().digest(path)
+
+
+def value_digest(value) -> str:
+    """参数（任意可 JSON 序列化的值）的稳定哈希。"""
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+# ============================================================
+#  构建图
+# ============================================================
+
+@dataclass
+class Node:
+    name: str
+    action: Callable[[], object]
+    inputs: list[Path] = field(default_factory=list)
+    outputs: list[Path] = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    # 没有构建记录但输出已存在时直接认领（用于昂贵且不确定的节点，如 AI 生图）
+    adopt_existing: bool = False
+    deps: set[str] = field(default_factory=set)
+
+    def signature(self) -> str:
+        parts = {
+            "inputs": {_rel(p): file_digest(p) for p in self.inputs},
+            "params": value_digest(self.params),
+        }
+        return value_digest(parts)
+
+
+def _rel(path: Path) -> str:
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(ROOT).as_posix()
+    except ValueError:
+        return str(path)
+
+
+class BuildGraph:
+    def __init__(self, state_file: Path = BUILD_STATE_FILE):
+        self.nodes: dict[str, Node] = {}
+        self.state_file = state_file
+        try:
+            self.state = json.loads(state_file.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.state = {}
+        self.lock = threading.Lock()
+        self.teardowns = []
+
+    def add(self, name: str, action, inputs=(), outputs=(), params=None, adopt_existing=False) -> Node:
+        node = Node(
+            name,
+            action,
+            [Path(p) for p in inputs],
+            [Path(p) for p in outputs],
+            params or {},
+            adopt_existing,
+        )
+        self.nodes[name] = node
+        return node
+
+    def add_teardown(self, fn):
+        """build() 结束后（无论成败）调用 fn()，用于关闭节点共享的进程池等资源。"""
+        if fn not in self.teardowns:
+            self.teardowns.append(fn)
+
+    # ---------------- 依赖与过期判断 ----------------
+
+    def _link(self):
+        producers = {_rel(out): node.name for node in self.nodes.values() for out in node.outputs}
+        for node in self.nodes.values():
+            node.deps = {producers[_rel(p)] for p in node.inputs if _rel(p) in producers} - {node.name}
+
+    def stale_reason(self, node: Node, signature: str) -> str | None:
+        """返回节点需要重建的原因；不需要重建返回 None。"""
+        record = self.state.get(node.name)
+        outputs = record["outputs"] if record else [_rel(p) for p in node.outputs]
+        missing = [o for o in outputs if not (ROOT / o).exists()]
+        if record is None:
+            if node.adopt_existing and not missing:
+                self._record(node, signature, outputs)
+                return None
+            return "无构建记录"
+        if missing:
+            return f"缺少输出 {missing[0]}"
+        if record["signature"] != signature:
+            return "输入或参数已变化"
+        return None
+
+    def _record(self, node: Node, signature: str, outputs: list[str]):
+        with self.lock:
+            self.state[node.name] = {"signature": signature, "outputs": outputs, "built_at": time.time()}
+
+    def _save(self):
+        hash_cache().save()
+        with self.lock:
+            tmp = self.state_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.state, ensure_ascii=False, indent=1), encoding="utf-8")
+            os.replace(tmp, self.state_file)
+
+    # ---------------- 执行 ----------------
+
+    def _run_node(self, node: Node, force: bool, dry_run: bool) -> str:
+        """执行单个节点，返回 'fresh' | 'built' | 'would-build' | 'failed'。"""
+        signature = node.signature()
+        reason = "--force" if force else self.stale_reason(node, signature)
+        if reason is None:
+            return "fresh"
+        if dry_run:
+            print(f"  [过期] {node.name}: {reason}")
+            return "would-build"
+        print(f"  [构建] {node.name}: {reason}")
+        try:
+            produced = node.action()
+        except Exception as e:
+            print(f"  [失败] {node.name}: {e}")
+            return "failed"
+        outputs = [_rel(p) for p in produced] if isinstance(produced, (list, tuple)) else \
+            [_rel(p) for p in node.outputs]
+        missing = [o for o in outputs if not (ROOT / o).exists()]
+        if missing:
+            print(f"  [失败] {node.name}: 未生成 {missing[0]}")
+            return "failed"
+        self._record(node, signature, outputs)
+        return "built"
+
+    def build(self, targets=None, jobs: int = os.cpu_count() or 4, force=False, dry_run=False) -> dict:
+        """按依赖顺序并行构建；targets 为节点名前缀列表（如 ["icons", "taptap:screen1"]）。"""
+        # design_db 等只用 file_digest 的模块导入本文件时不必加载线程池
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        self._link()
+        selected = set(self.nodes)
+        if targets:
+            selected = {
+                name for name in self.nodes
+                if any(name == t or name.startswith(t + ":") for t in targets)
+            }
+            # 连带选中依赖
+            stack = list(selected)
+            while stack:
+                for dep in self.nodes[stack.pop()].deps:
+                    if dep not in selected:
+                        selected.add(dep)
+                        stack.append(dep)
+
+        results: dict[str, str] = {}
+        pending = {name: set(self.nodes[name].deps) & selected for name in selected}
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                running = {}
+                while pending or running:
+                    ready = [name for name, deps in pending.items() if not deps]
+                    for name in sorted(ready):
+                        del pending[name]
+                        running[pool.submit(self._run_node, self.nodes[name], force, dry_run)] = name
+                    if not running:
+                        # 剩下的节点有环
+                        for name in pending:
+                            print(f"  [失败] {name}: 依赖成环")
+                            results[name] = "failed"
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        results[name] = future.result()
+                        for other, deps in list(pending.items()):
+                            if other in pending and name in deps:
+                                if results[name] == "failed":
+                                    print(f"  [跳过] {other}: 依赖 {name} 失败")
+                                    results[other] = "failed"
+                                    del pending[other]
+                                    # 级联：依赖 other 的节点会在其 deps 中永远等待，这里一并移除
+                                    self._drop_dependents(other, pending, results)
+                                else:
+                                    deps.discard(name)
+        finally:
+            for fn in self.teardowns:
+                fn()
+        if not dry_run:
+            self._save()
+        return results
+
+    def _drop_dependents(self, name: str, pending: dict, results: dict):
+        for other, deps in list(pending.items()):
+            if name in deps:
+                results[other] = "failed"
+                del pending[other]
+                self._drop_dependents(other, pending, results)
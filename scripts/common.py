@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+scripts/ 下各脚本共享的路径常量。
+所有路径都相对仓库根目录解析，不依赖当前工作目录。
+"""
+
+from pathlib import Path
+
+# 项目根目录（本文件在 scripts/ 下）
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = ROOT / "scripts"
+
+# 运行期缓存/状态文件目录（不入库）
+CACHE_DIR = SCRIPTS_DIR / ".cache"
+
+
+def cache_path(*parts: str) -> Path:
+    """返回 .cache 下的路径，并确保其父目录存在。"""
+    path = CACHE_DIR.joinpath(*parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
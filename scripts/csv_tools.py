@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+csv/ 配置表的读取、校验与统计（只依赖标准库，启动快）。
+
+parse_table() 与 constants.ts 里的 parseCSV 语义一致：
+| 分隔、首行表头、'null'/'true'/'false' 转换、数字转换、含逗号的值拆成数组。
+
+用法:
+    python -m scripts validate            # 校验全部表（列数、重复 id）
+    python -m scripts validate weapons    # 只校验指定表
+    python -m scripts stats               # 各表行数/列数/单元格数
+"""
+
+import sys
+from pathlib import Path
+
+from common import ROOT
+
+CSV_DIR = ROOT / "csv"
+
+
+def table_names() -> list[str]:
+    """csv/ 下所有表名（不含 .bak 备份）。"""
+    return sorted(p.stem for p in CSV_DIR.glob("*.csv"))
+
+
+def table_path(name: str) -> Path:
+    return CSV_DIR / f"{name}.csv"
+
+
+def read_table(name: str) -> tuple[list[str], list[list[str]]]:
+    """返回 (表头, 原始字符串行)。"""
+    text = table_path(name).read_text(encoding="utf-8").strip()
+    lines = text.split("\n")
+    header = [h.strip() for h in lines[0].split("|")]
+    rows = [[v.strip() for v in line.split("|")] for line in lines[1:]]
+    return header, rows
+
+
+def parse_value(raw: str | None):
+    """与 parseCSV 相同的单元格转换规则。"""
+    if raw is None:
+        return None
+    if raw == "null":
+        return None
+    if raw == "true":
+        return True
+    if raw == "false":
+        return False
+    number = _to_number(raw)
+    if number is not None:
+        return number
+    if "," in raw:
+        return [v if (n := _to_number(v)) is None else n for v in raw.split(",")]
+    return raw
+
+
+def _to_number(raw: str) -> int | float | None:
+    """JS Number() 能解析的十进制数字；否则返回 None。"""
+    if raw == "" or raw.lower().lstrip("+-") in ("nan", "inf", "infinity"):
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def parse_table(name: str) -> list[dict]:
+    """解析为 dict 列表；缺失的尾列为 None（与 TS 中的 undefined 对应）。"""
+    header, rows = read_table(name)
+    return [
+        {h: parse_value(row[i] if i < len(row) else None) for i, h in enumerate(header)}
+        for row in rows
+    ]
+
+
+def validate_table(name: str) -> list[str]:
+    """返回该表的问题列表：列数多于表头（数据错位）、空行、重复 id。"""
+    header, rows = read_table(name)
+    problems = []
+    seen = {}
+    for lineno, row in enumerate(rows, start=2):
+        if row == [""]:
+            problems.append(f"{name}.csv:{lineno}: 空行")
+            continue
+        if len(row) > len(header):
+            problems.append(f"{name}.csv:{lineno}: 列数 {len(row)} 多于表头 {len(header)}")
+        if header[0] == "id":
+            if row[0] in seen:
+                problems.append(f"{name}.csv:{lineno}: id '{row[0]}' 与第 {seen[row[0]]} 行重复")
+            seen.setdefault(row[0], lineno)
+    return problems
+
+
+def validate_main():
+    names = sys.argv[1:] or table_names()
+    total = 0
+    for name in names:
+        if not table_path(name).exists():
+            print(f"[错误] 找不到 {table_path(name)}")
+            total += 1
+            continue
+        for problem in validate_table(name):
+            print(f"  {problem}")
+            total += 1
+    print(f"校验 {len(names)} 张表，发现 {total} 个问题")
+    if total:
+        sys.exit(1)
+
+
+def stats_main():
+    names = sys.argv[1:] or table_names()
+    print(f"{'表':<28}{'行':>6}{'列':>5}{'单元格':>8}{'字节':>9}")
+    rows_total = cells_total = bytes_total = 0
+    for name in names:
+        header, rows = read_table(name)
+        cells = sum(min(len(r), len(header)) for r in rows)
+        size = table_path(name).stat().st_size
+        print(f"{name:<28}{len(rows):>6}{len(header):>5}{cells:>8}{size:>9}")
+        rows_total += len(rows)
+        cells_total += cells
+        bytes_total += size
+    print(f"{'合计':<28}{rows_total:>6}{'':>5}{cells_total:>8}{bytes_total:>9}")
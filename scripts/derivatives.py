@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+成品图的派生文件流水线（进程池，用满全部核心）。
+
+每张源图在工作进程里只解码一次，然后输出：
+    <名>.webp            全尺寸 WebP
+    <名>.avif            全尺寸 AVIF（当前 Pillow 不支持 AVIF 时跳过）
+    <名>_w<宽>.webp      固定宽度缩略图（THUMB_WIDTHS，不放大）
+    <名>.json            元数据 sidecar：源文件哈希/尺寸/格式、各派生文件信息、调用方附带的元数据
+
+sidecar 记录源文件 sha256；源图未变且派生文件齐全时直接跳过。
+
+用法:
+    python scripts/derivatives.py                      # docs/images/*.png → docs/images/derived/
+    python scripts/derivatives.py a.png b.png --out d  # 指定文件与输出目录
+    python scripts/derivatives.py --workers 4 --force
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from buildgraph import file_digest, hash_cache
+from common import ROOT
+from encoder import encode, write_atomic
+from profiling import profiled_main, span
+
+IMAGES_DIR = ROOT / "docs" / "images"
+DERIVED_DIR = IMAGES_DIR / "derived"
+
+THUMB_WIDTHS = (320, 640)
+WEBP_QUALITY = 85
+AVIF_QUALITY = 60
+AVIF_SPEED = 6  # 0 最慢最小 ~ 10 最快
+
+
+def avif_supported() -> bool:
+    from PIL import features
+
+    return bool(features.check("avif"))
+
+
+def output_names(stem: str, avif: bool) -> list[str]:
+    names = [f"{stem}.webp"] + [f"{stem}_w{w}.webp" for w in THUMB_WIDTHS]
+    if avif:
+        names.append(f"{stem}.avif")
+    return names
+
+
+def sidecar_path(src: Path, out_dir: Path) -> Path:
+    return out_dir / f"{src.stem}.json"
+
+
+def is_fresh(src: Path, out_dir: Path, digest: str, avif: bool) -> bool:
+    """sidecar 中的源哈希与当前一致，且记录的派生文件都还在。"""
+    try:
+        meta = json.loads(sidecar_path(src, out_dir).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return False
+    if meta.get("source", {}).get("sha256") != digest:
+        return False
+    recorded = {d["file"] for d in meta.get("derivatives", [])}
+    # 用不同 AVIF 支持情况的环境生成的也算过期，保证产物一致
+    return recorded == set(output_names(src.stem, avif)) and all((out_dir / n).exists() for n in recorded)
+
+
+def _write(img, path: Path, fmt: str, **params) -> dict:
+    data = encode(img, fmt, **params)
+    write_atomic(path, data)
+    return {"file": path.name, "format": fmt, "width": img.width, "height": img.height,
+            "bytes": len(data)}
+
+
+def derive_one(src: str, out_dir: str, digest: str, meta: dict, avif: bool) -> dict:
+    """在工作进程中执行：解码一次，写出全部派生文件与 sidecar，返回 sidecar 内容。"""
+    from PIL import Image
+
+    src, out_dir = Path(src), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with Image.open(src) as img:
+        img.load()
+        source = {"file": src.name, "sha256": digest, "format": img.format, "mode": img.mode,
+                  "width": img.width, "height": img.height, "bytes": src.stat().st_size}
+        # WebP/AVIF 只支持 RGB(A)；调色板图按是否带透明转换
+        if img.mode not in ("RGB", "RGBA"):
+            has_alpha = img.mode in ("LA", "PA") or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha else "RGB")
+        else:
+            img = img.copy()
+
+    derivatives = [_write(img, out_dir / f"{src.stem}.webp", "WEBP", quality=WEBP_QUALITY, method=4)]
+    if avif:
+        derivatives.append(_write(img, out_dir / f"{src.stem}.avif", "AVIF", quality=AVIF_QUALITY, speed=AVIF_SPEED))
+    # 从大到小缩放，小图在上一级结果上再缩，减少重采样的像素量
+    current = img
+    for width in sorted(THUMB_WIDTHS, reverse=True):
+        target = min(width, img.width)
+        height = max(1, round(img.height * target / img.width))
+        if current.size != (target, height):
+            current = current.resize((target, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        derivatives.append(_write(current, out_dir / f"{src.stem}_w{width}.webp", "WEBP",
+                                  quality=WEBP_QUALITY, method=4))
+
+    sidecar = {"source": source, "derivatives": sorted(derivatives, key=lambda d: d["file"]), "meta": meta}
+    write_atomic(sidecar_path(src, out_dir), json.dumps(sidecar, ensure_ascii=False, indent=2).encode("utf-8"))
+    return sidecar
+
+
+def derive_all(jobs, out_dir: Path = DERIVED_DIR, workers: int | None = None, force: bool = False) -> dict:
+    """
+    jobs: [(源图路径, 元数据 dict), ...]。过期的源图分发到进程池处理。
+    返回 {"built": n, "fresh": n, "failed": n}。
+    """
+    avif = avif_supported()
+    pending = []
+    counts = {"built": 0, "fresh": 0, "failed": 0}
+    with span("hash", files=len(jobs)):
+        for src, meta in jobs:
+            digest = file_digest(src)
+            if digest is None:
+                print(f"[跳过] 找不到 {src}")
+                continue
+            if not force and is_fresh(src, out_dir, digest, avif):
+                counts["fresh"] += 1
+                continue
+            pending.append((src, digest, meta or {}))
+    hash_cache().save()
+    if not pending:
+        return counts
+
+    workers = min(workers or os.cpu_count() or 4, len(pending))
+    print(f"派生文件: {len(pending)} 张待处理，{workers} 个进程" + ("" if avif else "（Pillow 不支持 AVIF，跳过）"))
+    with span("derive", files=len(pending)), ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(derive_one, str(src), str(out_dir), digest, meta, avif): src
+            for src, digest, meta in pending
+        }
+        for future in as_completed(futures):
+            src = futures[future]
+            try:
+                sidecar = future.result()
+            except Exception as e:
+                print(f"  [错误] {src.name}: {e}")
+                counts["failed"] += 1
+                continue
+            total = sum(d["bytes"] for d in sidecar["derivatives"])
+            print(f"  [写入] {src.name} → {len(sidecar['derivatives'])} 个派生文件（{total / 1024:.0f} KB）")
+            counts["built"] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成 WebP/AVIF/缩略图/元数据派生文件")
+    parser.add_argument("files", nargs="*", type=Path, help="源图（默认 docs/images/*.png）")
+    parser.add_argument("--out", type=Path, default=DERIVED_DIR, help="输出目录")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--force", action="store_true", help="忽略 sidecar，全部重新生成")
+    args = parser.parse_args()
+
+    files = args.files or sorted(IMAGES_DIR.glob("*.png"))
+    counts = derive_all([(f, None) for f in files], args.out, workers=args.workers, force=args.force)
+    print(f"完成: 生成 {counts['built']}，未变 {counts['fresh']}，失败 {counts['failed']}")
+
+
+if __name__ == "__main__":
+    profiled_main(main)
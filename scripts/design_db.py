@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+csv/ 配置表 → 带类型与索引的 SQLite 设计数据库（scripts/.cache/design.db）。
+
+每张表一张同名 SQLite 表，单元格按 csv_tools.parse_value（与 constants.ts 的 parseCSV 一致）转换，
+列类型按整列推断：
+    INTEGER / REAL / BOOLEAN(0/1) / TEXT
+    JSON     含逗号数组的列（如 hpMod "5,15"、preferredTraits "strong,tough"），
+             整列存为 JSON 数组，可用 json_each 查询
+空单元格与 'null' 为 NULL；另有 _line 列记录原始 csv 行号。
+id、*Id、*Class、*Type、rarity、tier、difficulty、region、biome、faction、category 列建索引
+（id 无重复时为唯一索引）。
+
+增量：_tables 记录每张表对应 csv 的内容哈希，只重建内容变化的表，删除 csv 已不存在的表。
+
+查询:
+    from design_db import query
+    query("SELECT id, name FROM weapons WHERE rarity = ? AND twoHanded AND weaponClass = ? AND value < ?",
+          ("RARE", "polearm", 1000))
+    query("SELECT b.id FROM backgrounds b, json_each(b.preferredTraits) t WHERE t.value = ?", ("strong",))
+首次查询时检查并增量更新数据库；之后复用同一个只读连接，写 csv 后调用 invalidate()。
+
+用法:
+    python -m scripts db                     # 增量构建并列出各表
+    python -m scripts db --force             # 全部重建
+    python -m scripts db "SELECT id, value FROM weapons WHERE rarity = 'RARE' ORDER BY value"
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from buildgraph import file_digest
+from common import cache_path
+from csv_tools import parse_value, read_table, table_names, table_path
+from profiling import profiled_main, span
+
+DB_PATH = cache_path("design.db")
+SCHEMA_VERSION = 1  # 类型推断或表结构规则变化时加一，触发全部重建
+
+INDEX_RE = re.compile(r"^(id|.*Id|.*Class|type|.*Type|rarity|tier|difficulty|region|biome|faction|category)$")
+
+_conn: sqlite3.Connection | None = None
+_checked = False
+_lock = threading.Lock()
+
+
+# ============================================================
+#  类型推断
+# ============================================================
+
+def _cell(raw: str | None):
+    return None if raw in (None, "") else parse_value(raw)
+
+
+def infer_type(values: list) -> str:
+    present = [v for v in values if v is not None]
+    if any(isinstance(v, list) for v in present):
+        return "JSON"
+    if not present:
+        return "TEXT"
+    if all(isinstance(v, bool) for v in present):
+        return "BOOLEAN"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "INTEGER"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "REAL"
+    return "TEXT"
+
+
+def _store(value, raw: str | None, col_type: str):
+    if value is None:
+        return None
+    if col_type == "JSON":
+        return json.dumps(value if isinstance(value, list) else [value], ensure_ascii=False)
+    if col_type == "BOOLEAN":
+        return int(value)
+    if col_type == "TEXT":
+        return raw  # 混合列保留原文（如 "1.0" 不变成 1.0）
+    return value
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# ============================================================
+#  构建
+# ============================================================
+
+def load_table(db: sqlite3.Connection, name: str, digest: str) -> int:
+    """(重新)建表并写入全部行，返回行数。调用方负责事务。"""
+    header, rows = read_table(name)
+    raws = [[row[i] if i < len(row) else None for i in range(len(header))] for row in rows if row != [""]]
+    lines = [lineno for lineno, row in enumerate(rows, start=2) if row != [""]]
+    values = [[_cell(raw) for raw in row] for row in raws]
+    types = [infer_type([row[i] for row in values]) for i in range(len(header))]
+
+    db.execute(f"DROP TABLE IF EXISTS {_q(name)}")
+    columns = ", ".join(f"{_q(col)} {col_type}" for col, col_type in zip(header, types))
+    db.execute(f"CREATE TABLE {_q(name)} (_line INTEGER NOT NULL, {columns})")
+    placeholders = ", ".join("?" * (len(header) + 1))
+    db.executemany(
+        f"INSERT INTO {_q(name)} VALUES ({placeholders})",
+        ([line] + [_store(v, r, t) for v, r, t in zip(vrow, rrow, types)]
+         for line, vrow, rrow in zip(lines, values, raws)),
+    )
+    for col in header:
+        if not INDEX_RE.match(col):
+            continue
+        unique = col == "id" and len({row[header.index(col)] for row in raws}) == len(raws)
+        db.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {_q(f'ix_{name}_{col}')} "
+                   f"ON {_q(name)} ({_q(col)})")
+    db.execute(
+        "INSERT OR REPLACE INTO _tables (name, sha256, rows, columns, built_at) VALUES (?, ?, ?, ?, ?)",
+        (name, digest, len(raws), json.dumps(dict(zip(header, types))), time.time()),
+    )
+    return len(raws)
+
+
+def build_db(force: bool = False) -> dict:
+    """增量构建，返回 {"rebuilt": [...], "dropped": [...], "fresh": n}。"""
+    # 自动提交模式 + 显式 BEGIN/COMMIT：sqlite3 模块不会在 DDL 前隐式开启事务，
+    # 否则 DROP/CREATE 会各自提交，读者或中途失败时会看到缺表、空表
+    db = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        db.execute("CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS _tables "
+                   "(name TEXT PRIMARY KEY, sha256 TEXT, rows INTEGER, columns TEXT, built_at REAL)")
+        version = db.execute("SELECT value FROM _meta WHERE key = 'schema'").fetchone()
+        if force or version is None or int(version[0]) != SCHEMA_VERSION:
+            force = True
+        built = dict(db.execute("SELECT name, sha256 FROM _tables"))
+
+        names = table_names()
+        digests = {name: file_digest(table_path(name)) for name in names}
+        stale = [name for name in names if force or built.get(name) != digests[name]]
+        dropped = [name for name in built if name not in digests]
+        if stale or dropped or force:
+            # 一个事务：读者要么看到旧库，要么看到完整的新库
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for name in dropped:
+                    db.execute(f"DROP TABLE IF EXISTS {_q(name)}")
+                    db.execute("DELETE FROM _tables WHERE name = ?", (name,))
+                for name in stale:
+                    with span("load", table=name):
+                        load_table(db, name, digests[name])
+                db.execute("INSERT OR REPLACE INTO _meta VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            db.execute("ANALYZE")
+        return {"rebuilt": stale, "dropped": dropped, "fresh": len(names) - len(stale)}
+    finally:
+        db.close()
+
+
+def _build_node() -> list:
+    stats = build_db()
+    print(f"  [写入] design.db: 重建 {len(stats['rebuilt'])} 张表，{stats['fresh']} 张未变化")
+    return [DB_PATH]
+
+
+def build_nodes(graph):
+    graph.add(
+        "db:design",
+        _build_node,
+        inputs=[table_path(name) for name in table_names()],
+        outputs=[DB_PATH],
+        params={"schema": SCHEMA_VERSION},
+    )
+
+
+# ============================================================
+#  查询
+# ============================================================
+
+def invalidate():
+    """csv 改动后调用：下一次查询前重新检查并增量更新。"""
+    global _checked
+    _checked = False
+
+
+def connect() -> sqlite3.Connection:
+    """共享的只读连接（行为 sqlite3.Row）；需要时先增量更新数据库。"""
+    global _conn, _checked
+    with _lock:
+        if not _checked:
+            stats = build_db()
+            _checked = True
+            if (stats["rebuilt"] or stats["dropped"]) and _conn is not None:
+                _conn.close()
+                _conn = None
+        if _conn is None:
+            _conn = sqlite3.connect(f"file:{DB_PATH.as_posix()}?mode=ro", uri=True, check_same_thread=False)
+            _conn.row_factory = sqlite3.Row
+        return _conn
+
+
+def query(sql: str, params=()) -> list[dict]:
+    return [dict(row) for row in connect().execute(sql, params)]
+
+
+def scalar(sql: str, params=()):
+    row = connect().execute(sql, params).fetchone()
+    return row[0] if row else None
+
+
+def ids(table: str, column: str = "id") -> set:
+    return {row[0] for row in connect().execute(f"SELECT {_q(column)} FROM {_q(table)}")}
+
+
+# ============================================================
+#  命令行
+# ============================================================
+
+def print_rows(rows: list[dict], limit: int = 50):
+    if not rows:
+        print("  （无结果）")
+        return
+    columns = list(rows[0])
+    widths = {c: min(30, max(len(str(c)), *(len(str(r[c])) for r in rows[:limit]))) for c in columns}
+    print("  " + "  ".join(str(c).ljust(widths[c]) for c in columns))
+    for row in rows[:limit]:
+        print("  " + "  ".join(str(row[c])[:30].ljust(widths[c]) for c in columns))
+    if len(rows) > limit:
+        print(f"  ... 共 {len(rows)} 行")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="csv/ → 带类型与索引的 SQLite 设计数据库")
+    parser.add_argument("sql", nargs="?", help="要执行的查询（不填则只构建并列出各表）")
+    parser.add_argument("--force", action="store_true", help="全部重建")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = build_db(force=args.force)
+    elapsed = (time.perf_counter() - start) * 1000
+    if stats["rebuilt"]:
+        print(f"  [写入] 重建 {len(stats['rebuilt'])} 张表: {', '.join(stats['rebuilt'])}")
+    for name in stats["dropped"]:
+        print(f"  [删除] {name}: csv 已不存在")
+    print(f"  {stats['fresh']} 张表未变化（{elapsed:.0f} ms）: {DB_PATH}")
+
+    if args.sql:
+        try:
+            query(args.sql)  # 预热：建立连接、准备语句
+            start = time.perf_counter()
+            rows = query(args.sql)
+            elapsed = (time.perf_counter() - start) * 1e6
+        except sqlite3.Error as e:
+            print(f"[错误] {e}")
+            sys.exit(1)
+        print_rows(rows)
+        print(f"  {len(rows)} 行，{elapsed:.0f} µs")
+        return
+
+    print(f"\n  {'表':<28}{'行':>6}  列类型")
+    for row in query("SELECT name, rows, columns FROM _tables ORDER BY name"):
+        types = json.loads(row["columns"])
+        summary = ", ".join(f"{c}:{t}" for c, t in types.items() if t != "TEXT")
+        print(f"  {row['name']:<28}{row['rows']:>6}  {summary[:100]}")
+
+
+if __name__ == "__main__":
+    profiled_main(main)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+图片脚本共用的内存编码器：在 BytesIO 里找满足字节预算的最佳编码，最后只写一次文件。
+
+encode_under_budget() 的搜索顺序：
+1. 无损格式（PNG）先编码一次，放得下就直接用；放不下改用 JPEG（不落盘）
+2. 有损格式先试最高质量，放得下即结束（大多数图只需编码 1 次）
+3. 否则在 [q_min, q_max] 内二分质量；用"log(大小) 与 log(100 - 质量) 近似线性"的模型
+   预测下一个质量（首步用经验斜率，之后用已测点插值），通常 1~3 次额外编码就能收敛到
+   放得下的（近似）最高质量
+4. 最低质量仍超出预算时，按"字节数 ∝ 像素数"预测缩放比例，再在
+   [放得下, 放不下] 的比例区间内二分，直到用满预算的 SCALE_FILL 以上；不会缩到 min_size 以下
+
+用法:
+    result = encode_under_budget(img, 4 * 1024 * 1024, "JPEG")
+    write_atomic(out_path.with_suffix(result.suffix), result.data)
+"""
+
+import io
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from profiling import span
+
+Q_MAX = 92
+Q_MIN = 60
+SCALE_QUALITY = 80   # 需要缩小尺寸时使用的质量
+QUALITY_AIM = 0.98   # 质量插值瞄准的预算比例（略低于 1，让预测点大概率落在放得下的一侧）
+QUALITY_FILL = 0.96  # 放得下且用满预算的该比例即停止质量搜索
+QUALITY_SLOPE = -0.63  # d log(大小) / d log(100 - 质量) 的经验值，用于第一步预测
+SCALE_FILL = 0.9     # 缩放搜索的目标：用满预算的比例
+SCALE_STEPS = 6
+
+SUFFIXES = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "AVIF": ".avif"}
+LOSSY = {"JPEG", "WEBP", "AVIF"}
+
+
+@dataclass
+class EncodeResult:
+    data: bytes
+    format: str
+    quality: int | None
+    size: tuple[int, int]
+    encodes: int
+    fits: bool
+
+    @property
+    def suffix(self) -> str:
+        return SUFFIXES[self.format]
+
+
+def encode(img, fmt: str, **params) -> bytes:
+    """编码到内存，返回字节。JPEG 自动去掉 alpha。"""
+    if fmt == "JPEG" and img.mode not in ("RGB", "L", "CMYK"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, fmt, **params)
+    return buf.getvalue()
+
+
+def write_atomic(path: Path, data) -> Path:
+    """先写临时文件再改名，中断时不会留下半个文件。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(memoryview(data))
+    os.replace(tmp, path)
+    return path
+
+
+def _lossy_params(fmt: str, quality: int) -> dict:
+    if fmt == "JPEG":
+        return {"quality": quality, "optimize": True}
+    if fmt == "WEBP":
+        return {"quality": quality, "method": 4}
+    return {"quality": quality}
+
+
+def _predict(lo, s_lo, hi, s_hi, target):
+    """log(size) 对参数线性插值，预测恰好达到 target 的参数值。"""
+    if s_hi <= s_lo:
+        return (lo + hi) / 2
+    t = (math.log(target) - math.log(s_lo)) / (math.log(s_hi) - math.log(s_lo))
+    return lo + t * (hi - lo)
+
+
+def _quality_x(q):
+    return math.log(100 - q)
+
+
+def _search_quality(img, fmt, budget, q_min, q_max, s_max, counter):
+    """
+    已知 q_max 放不下；返回放得下的最高质量及其数据，q_min 也放不下时返回 (None, q_min 的数据)。
+    第一步用经验斜率 QUALITY_SLOPE 从 q_max 的大小直接预测，之后用已测的两点做割线插值。
+    """
+    encoded = {}
+
+    def size_at(q):
+        counter[0] += 1
+        encoded[q] = encode(img, fmt, **_lossy_params(fmt, q))
+        return len(encoded[q])
+
+    target = math.log(budget * QUALITY_AIM)
+    lo = s_lo = None
+    hi, s_hi = q_max, s_max
+    q = round(100 - math.exp(_quality_x(q_max) + (target - math.log(s_max)) / QUALITY_SLOPE))
+    halve = False
+    while True:
+        q = min(max(q, q_min if lo is None else lo + 1), hi - 1)
+        width = hi - (q_min - 1 if lo is None else lo)
+        size = size_at(q)
+        if size <= budget:
+            lo, s_lo = q, size
+        else:
+            hi, s_hi = q, size
+        if lo is None:
+            if hi <= q_min:
+                return None, encoded[hi]
+        elif hi - lo <= 1 or s_lo >= budget * QUALITY_FILL:
+            return lo, encoded[lo]  # 已收敛，或已经用满预算、再提高质量收益可以忽略
+        if halve and lo is not None:
+            q = (lo + hi) // 2
+        else:
+            # log(size) 与 log(100 - q) 近似线性：用最近的两个测量点插值/外推
+            if lo is not None:
+                x = _predict(_quality_x(lo), s_lo, _quality_x(hi), s_hi, budget * QUALITY_AIM)
+            else:
+                x = _quality_x(hi) + (target - math.log(s_hi)) / QUALITY_SLOPE
+            q = round(100 - math.exp(x))
+        # 插值这一步没把区间缩小一半，下一步退回普通二分，保证最坏 O(log n)
+        halve = (hi - (q_min - 1 if lo is None else lo)) * 2 > width
+
+
+def _search_scale(img, fmt, budget, quality, min_size, full_size, counter):
+    """按像素数预测缩放比例，并在 [放得下, 放不下] 区间内二分。返回 (数据, 尺寸, 是否放得下)。"""
+    from PIL import Image
+
+    w, h = img.size
+    floor = max(min_size[0] / w, min_size[1] / h, 1e-3)
+    params = _lossy_params(fmt, quality)
+    fit_scale, fit = None, None
+    over_scale, s_over = 1.0, full_size
+    scale = min(1.0, math.sqrt(budget * SCALE_FILL / full_size))
+    last = None
+    for _ in range(SCALE_STEPS):
+        scale = max(scale, floor)
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        with span("resize", size=f"{size[0]}x{size[1]}"):
+            small = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        counter[0] += 1
+        data = encode(small, fmt, **params)
+        last = (data, size)
+        if len(data) <= budget:
+            if fit is None or scale > fit_scale:
+                fit_scale, fit = scale, (data, size)
+            if len(data) >= budget * SCALE_FILL:
+                break
+        else:
+            over_scale, s_over = scale, len(data)
+            if scale <= floor:
+                break
+        if fit_scale is None:
+            # 还没有放得下的点：按面积比例外推
+            scale = scale * math.sqrt(budget * SCALE_FILL / len(data))
+        else:
+            # 面积 ∝ scale²：在 [fit, over] 之间按 log(size) 对 scale² 插值，夹在区间内
+            guess = math.sqrt(max(_predict(fit_scale ** 2, len(fit[0]), over_scale ** 2, s_over, budget * 0.97), 0))
+            mid = (fit_scale + over_scale) / 2
+            scale = guess if fit_scale < guess < over_scale else mid
+            if over_scale - fit_scale < 0.01:
+                break
+    if fit is not None:
+        return fit[0], fit[1], True
+    return last[0], last[1], False
+
+
+def encode_under_budget(img, max_bytes: int, fmt: str = "JPEG", q_min: int = Q_MIN, q_max: int = Q_MAX,
+                        min_size: tuple[int, int] = (1, 1), fallback: str = "JPEG", **lossless_params) -> EncodeResult:
+    """
+    在不超过 max_bytes 的前提下，以尽量高的质量、尽量大的尺寸编码 img。
+    fmt 为 PNG 等无损格式时，超出预算改用 fallback（有损）格式继续搜索。
+    """
+    counter = [0]
+    with span("encode_under_budget", fmt=fmt, budget=max_bytes):
+        if fmt not in LOSSY:
+            counter[0] += 1
+            data = encode(img, fmt, **lossless_params)
+            if len(data) <= max_bytes:
+                return EncodeResult(data, fmt, None, img.size, counter[0], True)
+            fmt = fallback
+
+        counter[0] += 1
+        data = encode(img, fmt, **_lossy_params(fmt, q_max))
+        if len(data) <= max_bytes:
+            return EncodeResult(data, fmt, q_max, img.size, counter[0], True)
+
+        s_max = len(data)
+        quality, data = _search_quality(img, fmt, max_bytes, q_min, q_max, s_max, counter)
+        if quality is not None:
+            return EncodeResult(data, fmt, quality, img.size, counter[0], True)
+
+        # 全尺寸在 SCALE_QUALITY 下的大小用同一模型估算，省掉一次全尺寸编码；缩放搜索会自行校正
+        full_size = math.exp(math.log(s_max) + QUALITY_SLOPE * (_quality_x(SCALE_QUALITY) - _quality_x(q_max)))
+        data, size, fits = _search_scale(img, fmt, max_bytes, SCALE_QUALITY, min_size, full_size, counter)
+        return EncodeResult(data, fmt, SCALE_QUALITY, size, counter[0], fits)
@@ -1,24 +1,455 @@
-# -*- coding: utf-8 -*-
-import zipfile
-import xml.etree.ElementTree as ET
-import sys
+#!/usr/bin/env python3
+"""
+.docx → Markdown 文本提取（流式、保留结构、批量）。
+
+word/document.xml 通过 iterparse 直接从 zip 成员流里逐段解析，每处理完一个段落/表格就
+清掉对应的元素，内存占用与文档大小无关；输出同样边解析边写入。保留的结构：
+    标题        样式名为 heading N / 标题 N / Title，或带大纲级别 → #、## ...
+    列表        w:numPr → 按 numbering.xml 的编号格式渲染（"1."、"一、"、"(a)"），项目符号 → "- "
+    表格        Markdown 表格；单元格内的多个段落以 <br> 连接
+    换行/制表   w:br → 换行，w:tab → 制表符
+修订记录中已删除的文字（w:delText）与域代码（w:instrText）不输出。
+
+批量模式下每个 .docx 是构建图中的一个节点（docx:<相对输入目录的路径>），输入内容哈希与输出格式版本
+都没变时跳过；需要转换的文件在进程池中并行处理。--out 下按同样的相对路径输出。
+输出为 Markdown（<名>.md）；旧版脚本的纯文本输出 docs/privacy-policy-template-extracted.txt 不再生成。
+
+用法:
+    python -m scripts docx                              # docs/ 下全部 .docx → 同目录 <名>.md
+    python -m scripts docx docs/privacy-policy-template.docx --print
+    python -m scripts docx path/to/dir --out build/docs -j 4 --force
+"""
+
+import argparse
 import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from buildgraph import BuildGraph
+from common import ROOT
+from profiling import profiled_main, span
+
+DOCS_DIR = ROOT / "docs"
+FORMAT_VERSION = 1  # 输出格式变化时加一，已转换的文件会全部重建
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+HEADING_NAME_RE = re.compile(r"^(?:heading|标题)\s*(\d)$", re.I)
+NO_LIST = "0"  # numId 为 0 表示显式取消编号
+
+
+# ============================================================
+#  styles.xml / numbering.xml
+# ============================================================
+
+def _val(elem) -> str | None:
+    return elem.get(f"{W}val")
+
+
+def read_styles(z: zipfile.ZipFile) -> dict[str, int]:
+    """段落样式 id → 标题级别（1 起）；非标题样式不在结果里。"""
+    if "word/styles.xml" not in z.namelist():
+        return {}
+    styles = {}  # id → (名, basedOn, outlineLvl)
+    with z.open("word/styles.xml") as f:
+        current = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == "start" and elem.tag == f"{W}style":
+                current = {"id": elem.get(f"{W}styleId"), "name": "", "based": None, "outline": None}
+            elif event == "end" and current is not None:
+                if elem.tag == f"{W}name":
+                    current["name"] = _val(elem) or ""
+                elif elem.tag == f"{W}basedOn":
+                    current["based"] = _val(elem)
+                elif elem.tag == f"{W}outlineLvl":
+                    current["outline"] = int(_val(elem) or 9)
+                elif elem.tag == f"{W}style":
+                    styles[current["id"]] = current
+                    current = None
+                    elem.clear()
+
+    def level(style_id, seen=()):
+        style = styles.get(style_id)
+        if style is None or style_id in seen:
+            return None
+        name = style["name"].strip()
+        if match := HEADING_NAME_RE.match(name):
+            return int(match[1])
+        if name.lower() == "title":
+            return 1
+        if style["outline"] is not None and style["outline"] < 9:
+            return style["outline"] + 1
+        return level(style["based"], seen + (style_id,))
+
+    return {sid: lvl for sid in styles if (lvl := level(sid)) is not None}
+
+
+def read_numbering(z: zipfile.ZipFile) -> dict[str, dict[int, tuple[str, str, int]]]:
+    """numId → {ilvl: (numFmt, lvlText, start)}。"""
+    if "word/numbering.xml" not in z.namelist():
+        return {}
+    abstract, nums = {}, {}
+    with z.open("word/numbering.xml") as f:
+        abs_id = num_id = lvl = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == f"{W}abstractNum":
+                    abs_id = elem.get(f"{W}abstractNumId")
+                    abstract[abs_id] = {}
+                elif tag == f"{W}lvl" and abs_id is not None:
+                    lvl = int(elem.get(f"{W}ilvl") or 0)
+                    abstract[abs_id][lvl] = ["decimal", f"%{lvl + 1}.", 1]
+                elif tag == f"{W}num":
+                    num_id = elem.get(f"{W}numId")
+                continue
+            if lvl is not None and tag == f"{W}numFmt":
+                abstract[abs_id][lvl][0] = _val(elem) or "decimal"
+            elif lvl is not None and tag == f"{W}lvlText":
+                abstract[abs_id][lvl][1] = _val(elem) or ""
+            elif lvl is not None and tag == f"{W}start":
+                abstract[abs_id][lvl][2] = int(_val(elem) or 1)
+            elif tag == f"{W}lvl":
+                lvl = None
+            elif tag == f"{W}abstractNum":
+                abs_id = None
+                elem.clear()
+            elif tag == f"{W}abstractNumId" and num_id is not None:
+                nums[num_id] = _val(elem)
+            elif tag == f"{W}num":
+                num_id = None
+                elem.clear()
+    return {num: {i: tuple(v) for i, v in abstract.get(abs_id, {}).items()} for num, abs_id in nums.items()}
+
+
+# ============================================================
+#  编号渲染
+# ============================================================
+
+CN_DIGITS = "零一二三四五六七八九"
+TIANGAN = "甲乙丙丁戊己庚辛壬癸"
+
+
+def _chinese(n: int) -> str:
+    if n < 10:
+        return CN_DIGITS[n]
+    if n < 100:
+        tens, ones = divmod(n, 10)
+        return ("" if tens == 1 else CN_DIGITS[tens]) + "十" + (CN_DIGITS[ones] if ones else "")
+    return str(n)
+
+
+def _roman(n: int) -> str:
+    out = ""
+    for value, numeral in ((1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"),
+                           (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")):
+        count, n = divmod(n, value)
+        out += numeral * count
+    return out
+
+
+def _letter(n: int) -> str:
+    return chr(ord("a") + (n - 1) % 26) * ((n - 1) // 26 + 1)
+
+
+def format_number(n: int, fmt: str) -> str:
+    if fmt in ("chineseCounting", "chineseCountingThousand", "chineseLegalSimplified", "ideographDigital"):
+        return _chinese(n)
+    if fmt == "ideographTraditional":
+        return TIANGAN[(n - 1) % 10]
+    if fmt == "lowerLetter":
+        return _letter(n)
+    if fmt == "upperLetter":
+        return _letter(n).upper()
+    if fmt == "lowerRoman":
+        return _roman(n)
+    if fmt == "upperRoman":
+        return _roman(n).upper()
+    if fmt == "decimalZero":
+        return f"{n:02d}"
+    return str(n)
+
+
+class ListCounter:
+    """按 numId 维护各级计数；某级出现新项时更深的级别重新计数。"""
+
+    def __init__(self, numbering: dict):
+        self.numbering = numbering
+        self.counts: dict[str, list[int]] = {}
+
+    def marker(self, num_id: str, ilvl: int) -> str | None:
+        levels = self.numbering.get(num_id)
+        if not levels or ilvl not in levels:
+            return None
+        fmt, text, start = levels[ilvl]
+        if fmt == "bullet":
+            return "-"
+        if fmt == "none":
+            return text or None
+        counts = self.counts.setdefault(num_id, [0] * 9)
+        counts[ilvl] = counts[ilvl] + 1 if counts[ilvl] else start
+        for deeper in range(ilvl + 1, 9):
+            counts[deeper] = 0
+
+        def sub(match):
+            i = int(match[1]) - 1
+            level_fmt, _, level_start = levels.get(i, ("decimal", "", 1))
+            return format_number(counts[i] or level_start, level_fmt)
+
+        return re.sub(r"%(\d)", sub, text)
+
+
+# ============================================================
+#  document.xml
+# ============================================================
+
+def _escape_cell(text: str) -> str:
+    return text.replace("|", "\\|").replace("\n", "<br>")
+
+
+def render_table(rows: list[list[str]]) -> str:
+    width = max(len(r) for r in rows)
+    rows = [r + [""] * (width - len(r)) for r in rows]
+    lines = ["| " + " | ".join(_escape_cell(c) for c in rows[0]) + " |",
+             "|" + " --- |" * width]
+    lines += ["| " + " | ".join(_escape_cell(c) for c in row) + " |" for row in rows[1:]]
+    return "\n".join(lines)
+
+
+def iter_blocks(z: zipfile.ZipFile):
+    """逐个产出 (类型, 文本)：类型为 heading / list / para / table。"""
+    headings = read_styles(z)
+    lists = ListCounter(read_numbering(z))
+
+    paras: list[dict] = []        # 段落栈（文本框里可以嵌套段落）
+    tables: list[list] = []       # 表格栈：每层是行列表
+    rows: list[list[str]] = []    # 各层表格的当前行
+    cells: list[list[str]] = []   # 各层表格的当前单元格（段落文本）
+    change = 0                    # 修订记录（pPrChange 等）里的旧属性不计
+    tab_stops = 0                 # w:tabs 里的 w:tab 是制表位定义，不是文字
+    body = None
+
+    with z.open("word/document.xml") as f:
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == f"{W}p":
+                    paras.append({"text": [], "style": None, "outline": None, "num": None, "ilvl": 0})
+                elif tag == f"{W}tbl":
+                    tables.append([])
+                elif tag == f"{W}tr":
+                    rows.append([])
+                elif tag == f"{W}tc":
+                    cells.append([])
+                elif tag in (f"{W}pPrChange", f"{W}rPrChange"):
+                    change += 1
+                elif tag == f"{W}tabs":
+                    tab_stops += 1
+                elif tag == f"{W}body":
+                    body = elem
+                continue
+
+            para = paras[-1] if paras else None
+            if tag == f"{W}t" and para is not None:
+                para["text"].append(elem.text or "")
+            elif tag == f"{W}tab" and para is not None and not tab_stops:
+                para["text"].append("\t")
+            elif tag == f"{W}tabs":
+                tab_stops -= 1
+            elif tag in (f"{W}br", f"{W}cr") and para is not None:
+                para["text"].append("\n")
+            elif tag in (f"{W}pPrChange", f"{W}rPrChange"):
+                change -= 1
+            elif change or para is None:
+                pass
+            elif tag == f"{W}pStyle":
+                para["style"] = _val(elem)
+            elif tag == f"{W}outlineLvl":
+                para["outline"] = int(_val(elem) or 9)
+            elif tag == f"{W}numId":
+                para["num"] = _val(elem)
+            elif tag == f"{W}ilvl":
+                para["ilvl"] = int(_val(elem) or 0)
+
+            if tag == f"{W}p":
+                para = paras.pop()
+                text = "".join(para["text"]).strip()
+                elem.clear()
+                if paras:  # 文本框里的段落并入外层段落
+                    if text:
+                        paras[-1]["text"].append(text + "\n")
+                    continue
+                if cells:
+                    if text:
+                        cells[-1].append(text)
+                    continue
+                if not text:
+                    continue
+                level = headings.get(para["style"])
+                if level is None and para["outline"] is not None and para["outline"] < 9:
+                    level = para["outline"] + 1
+                if level is not None:
+                    yield "heading", "#" * min(level, 6) + " " + text
+                    continue
+                marker = lists.marker(para["num"], para["ilvl"]) if para["num"] not in (None, NO_LIST) else None
+                if marker is not None:
+                    indent = "  " * min(para["ilvl"], 8)
+                    yield "list", f"{indent}{marker} {text}"
+                else:
+                    yield "para", text
+            elif tag == f"{W}tc" and cells:
+                rows[-1].append("\n".join(cells.pop()))
+            elif tag == f"{W}tr" and rows:
+                tables[-1].append(rows.pop())
+            elif tag == f"{W}tbl" and tables:
+                table = [r for r in tables.pop() if any(c.strip() for c in r)]
+                elem.clear()
+                if not table:
+                    continue
+                if cells:  # 嵌套表格：按行展开到外层单元格
+                    cells[-1].extend(" / ".join(c for c in row if c) for row in table)
+                else:
+                    yield "table", render_table(table)
+            if body is not None and tag in (f"{W}p", f"{W}tbl", f"{W}sectPr") and not paras and not tables:
+                body.clear()  # 已输出的顶层元素不再保留引用
+
+
+def convert(src: Path, out: Path) -> dict:
+    """把一个 .docx 转成 Markdown，边解析边写入临时文件，完成后原子替换。返回统计。"""
+    start = time.perf_counter()
+    counts = {"heading": 0, "list": 0, "para": 0, "table": 0}
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    with zipfile.ZipFile(src) as z, open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        previous = None
+        for kind, text in iter_blocks(z):
+            if previous is not None:
+                f.write("\n" if kind == previous == "list" else "\n\n")
+            f.write(text)
+            counts[kind] += 1
+            previous = kind
+        f.write("\n")
+    os.replace(tmp, out)
+    counts["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return counts
+
+
+# ============================================================
+#  批量
+# ============================================================
+
+def collect_inputs(paths: list[Path]) -> dict[Path, Path]:
+    """文件 → 相对所在输入目录的路径（直接给出的文件为文件名本身）。"""
+    files = {}
+    for path in paths:
+        path = path.resolve()
+        if path.is_dir():
+            found = [(f, f.relative_to(path)) for f in sorted(path.rglob("*.docx"))]
+        elif path.suffix.lower() == ".docx":
+            found = [(path, Path(path.name))]
+        else:
+            print(f"  [跳过] {path}: 不是 .docx")
+            continue
+        for src, rel in found:
+            # Word 打开文件时留下的 ~$ 锁文件
+            if not src.name.startswith("~$"):
+                files.setdefault(src, rel)
+    return files
+
+
+def node_name(rel: Path) -> str:
+    return f"docx:{rel.with_suffix('').as_posix()}"
+
+
+def output_path(src: Path, rel: Path, out_dir: Path | None) -> Path:
+    return out_dir / rel.with_suffix(".md") if out_dir else src.with_suffix(".md")
+
+
+class _LazyPool:
+    """第一次需要转换时才启动进程池；全部跳过时不付出启动开销。"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.pool = None
+
+    def run(self, src: Path, out: Path) -> dict:
+        if self.workers <= 1:
+            return convert(src, out)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self.pool.submit(convert, src, out).result()
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def _convert_node(pool: _LazyPool, src: Path, out: Path) -> list[Path]:
+    with span("convert", file=src.name):
+        stats = pool.run(src, out)
+    print(f"  [写入] {_display(out)}: 标题 {stats['heading']}，段落 {stats['para']}，列表项 {stats['list']}，"
+          f"表格 {stats['table']}（{stats['ms']} ms）")
+    return [out]
+
+
+def _display(path: Path) -> str:
+    try:
+        return path.relative_to(ROOT).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 .docx 提取保留结构的 Markdown 文本")
+    parser.add_argument("paths", nargs="*", type=Path, help="文件或目录（默认 docs/）")
+    parser.add_argument("--out", type=Path, default=None, help="输出目录（默认与源文件同目录）")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 4, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--force", action="store_true", help="忽略构建记录，全部重新转换")
+    parser.add_argument("--print", action="store_true", help="转换后输出前 3000 字")
+    args = parser.parse_args()
+
+    files = collect_inputs(args.paths or [DOCS_DIR])
+    if not files:
+        print("[错误] 没有找到 .docx 文件")
+        sys.exit(1)
+    out_dir = args.out.resolve() if args.out else None
+
+    # 不同输入目录下相对路径相同的文件：节点名（以及 --out 下的输出）会互相覆盖
+    by_name = {}
+    for src, rel in files.items():
+        other = by_name.setdefault(node_name(rel), src)
+        if other != src:
+            print(f"[错误] {_display(other)} 与 {_display(src)} 相对各自输入目录的路径相同（{rel.as_posix()}），"
+                  f"请分开转换")
+            sys.exit(1)
+
+    pool = _LazyPool(args.jobs)
+    graph = BuildGraph()
+    for src, rel in files.items():
+        out = output_path(src, rel, out_dir)
+        graph.add(node_name(rel), lambda src=src, out=out: _convert_node(pool, src, out),
+                  inputs=[src], outputs=[out], params={"format": FORMAT_VERSION, "out": _display(out)})
+    try:
+        results = graph.build(jobs=args.jobs, force=args.force)
+    finally:
+        pool.shutdown()
+
+    fresh = sorted(name for name, status in results.items() if status == "fresh")
+    if fresh:
+        print(f"  未变化，跳过 {len(fresh)} 个: {', '.join(fresh)}")
+    if args.print:
+        for src, rel in files.items():
+            out = output_path(src, rel, out_dir)
+            if out.exists():
+                print(f"\n===== {_display(out)} =====")
+                print(out.read_text(encoding="utf-8")[:3000])
+    if "failed" in results.values():
+        sys.exit(1)
+
 
-path = os.path.join(os.path.dirname(__file__), '..', 'docs', 'privacy-policy-template.docx')
-with zipfile.ZipFile(path, 'r') as z:
-    xml_content = z.read('word/document.xml').decode('utf-8')
-
-root = ET.fromstring(xml_content)
-ns = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
-parts = []
-for e in root.iter('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'):
-    if e.text:
-        parts.append(e.text)
-    if e.tail:
-        parts.append(e.tail)
-text = ''.join(parts)
-out_path = os.path.join(os.path.dirname(__file__), '..', 'docs', 'privacy-policy-template-extracted.txt')
-with open(out_path, 'w', encoding='utf-8') as f:
-    f.write(text)
-print('Written to', out_path)
-print(text[:3000])
+if __name__ == "__main__":
+    profiled_main(main)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Gemini 调用后端。
+
+脚本通过 get_backend() 拿到后端对象，而不是直接创建 genai.Client：
+- GeminiBackend：真实 API（交互式调用经 ratelimit 共享限流；另支持 Batch API）
+- FakeBackend：离线替身，GEMINI_BACKEND=fake 时启用，不需要网络和 API Key。
+  文本请求按提示词里的表头生成列数正确的假数据，JSON 请求返回一个固定布局，图片请求返回一张小 PNG，
+  延迟由 GEMINI_FAKE_LATENCY（秒）设置，GEMINI_FAKE_MODEL_LATENCY="模型=秒,..." 可按模型覆盖，
+  批处理任务按 PENDING → RUNNING → SUCCEEDED 的生命周期推进（状态落盘，可跨进程）
+
+批处理结果统一为 REST 风格的 dict（{"candidates": [{"content": {"parts": [...]}}]}），
+用 response_text() / response_image_bytes() 取内容。
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+import zlib
+from pathlib import Path
+from types import SimpleNamespace
+
+from common import cache_path
+
+# 批处理任务的归一化状态
+BATCH_PENDING = "PENDING"
+BATCH_RUNNING = "RUNNING"
+BATCH_SUCCEEDED = "SUCCEEDED"
+BATCH_FAILED = "FAILED"
+BATCH_TERMINAL = {BATCH_SUCCEEDED, BATCH_FAILED, "CANCELLED", "EXPIRED"}
+
+
+# ============================================================
+#  响应解析（REST dict 格式）
+# ============================================================
+
+def _parts(response: dict) -> list[dict]:
+    candidates = response.get("candidates") or []
+    if not candidates:
+        return []
+    return (candidates[0].get("content") or {}).get("parts") or []
+
+
+def response_text(response: dict) -> str:
+    """拼接响应里所有文本 part。"""
+    return "".join(p.get("text", "") for p in _parts(response))
+
+
+def response_image_bytes(response: dict) -> bytes | None:
+    """取响应里第一张内联图片的原始字节。"""
+    for p in _parts(response):
+        inline = p.get("inlineData") or p.get("inline_data")
+        if inline and inline.get("data"):
+            return base64.b64decode(inline["data"])
+    return None
+
+
+# ============================================================
+#  真实后端
+# ============================================================
+
+class GeminiBackend:
+    """google-genai SDK 的薄封装。"""
+
+    def __init__(self, api_key: str):
+        from google import genai
+
+        from ratelimit import gemini_limiter
+
+        self.client = genai.Client(api_key=api_key)
+        self.limiter = gemini_limiter()
+
+    def generate(self, model: str, contents, config=None):
+        """交互式调用，经共享限流器。返回 SDK 原生 response。"""
+        return self.limiter.call(
+            self.client.models.generate_content,
+            model=model,
+            contents=contents,
+            config=config,
+        )
+
+    def generate_stream(self, model: str, contents, config=None, on_start=None):
+        """
+        流式调用，经共享限流器（租约覆盖整个迭代）。返回 SDK 原生 chunk 的迭代器（最后一个 chunk 带 usage_metadata）。
+        on_start 在拿到限流租约、真正发出请求时调用，用于把排队时间排除在测速之外。
+        """
+        return self.limiter.stream(
+            self.client.models.generate_content_stream,
+            model=model,
+            contents=contents,
+            config=config,
+            on_start=on_start,
+        )
+
+    def submit_batch(self, model: str, jsonl_path: Path, display_name: str) -> str:
+        """上传 JSONL 请求文件并创建批处理任务，返回任务名。"""
+        from google.genai import types
+
+        uploaded = self.client.files.upload(
+            file=str(jsonl_path),
+            config=types.UploadFileConfig(display_name=display_name, mime_type="jsonl"),
+        )
+        job = self.client.batches.create(
+            model=model,
+            src=uploaded.name,
+            config={"display_name": display_name},
+        )
+        return job.name
+
+    def batch_state(self, job_name: str) -> str:
+        job = self.client.batches.get(name=job_name)
+        state = getattr(job.state, "name", str(job.state))
+        return state.replace("JOB_STATE_", "").replace("BATCH_STATE_", "")
+
+    def batch_results(self, job_name: str, keys: list[str]):
+        """
+        逐行产出 (key, response_dict)；失败的请求产出 (key, None)。
+        keys 为提交时的请求 key（按提交顺序）：内联结果不带 key 时按位置对应。
+        """
+        job = self.client.batches.get(name=job_name)
+        if job.dest and job.dest.file_name:
+            content = self.client.files.download(file=job.dest.file_name)
+            for line in content.decode("utf-8").splitlines():
+                if line.strip():
+                    item = json.loads(line)
+                    yield item.get("key"), item.get("response")
+        elif job.dest and job.dest.inlined_responses:
+            for key, item in zip(keys, job.dest.inlined_responses):
+                key = (getattr(item, "metadata", None) or {}).get("key", key)
+                resp = item.response.model_dump(mode="json", by_alias=True) if item.response else None
+                yield key, resp
+
+
+# ============================================================
+#  离线替身后端
+# ============================================================
+
+def _tiny_png(seed: str) -> bytes:
+    """生成一张 8x8 纯色 PNG（颜色由 seed 决定），不依赖 PIL。"""
+    r, g, b = hashlib.md5(seed.encode("utf-8")).digest()[:3]
+    raw = b"".join(b"\x00" + bytes((r, g, b)) * 8 for _ in range(8))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", 8, 8, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _fake_csv_rows(prompt: str, count: int = 3) -> str:
+    """按提示词里"表头格式："后的表头，生成列数正确的假数据行。"""
+    match = re.search(r"表头格式：\s*\n(.+)", prompt)
+    if not match:
+        return "{}"
+    columns = match.group(1).strip().split("|")
+    tag = hashlib.md5(prompt.encode("utf-8")).hexdigest()[:6]
+    rows = []
+    for i in range(count):
+        cells = [f"fake_{tag}_{i}"] + ["1"] * (len(columns) - 1)
+        rows.append("|".join(cells))
+    return "\n".join(rows)
+
+
+FAKE_LAYOUT = {"position_description": "fake", "bounding_box": [60, 150, 260, 850]}
+
+
+def _parse_model_latency(spec: str) -> dict[str, float]:
+    """"gemini-2.5-flash=0.3,gemini-2.0-flash=0.1" → {模型: 秒}。"""
+    latency = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            latency[name.strip()] = float(value)
+    return latency
+
+
+class FakeBackend:
+    """离线替身：模拟交互式调用、流式调用与批处理生命周期。
+
+    latency 为每次调用的固定延迟；model_latency 可按模型覆盖（用于离线测试模型测速与选择）。
+    """
+
+    def __init__(self, latency: float = 0.0, model_latency: dict[str, float] | None = None):
+        self.latency = latency
+        self.model_latency = model_latency or {}
+
+    def _delay(self, model: str | None) -> float:
+        return self.model_latency.get(model, self.latency)
+
+    def _respond(self, prompt: str, want_image: bool, want_json: bool = False, model: str | None = None) -> dict:
+        if self._delay(model):
+            time.sleep(self._delay(model))
+        if want_image:
+            data = base64.b64encode(_tiny_png(prompt)).decode("ascii")
+            parts = [{"inlineData": {"mimeType": "image/png", "data": data}}]
+        elif want_json:
+            parts = [{"text": json.dumps(FAKE_LAYOUT)}]
+        else:
+            parts = [{"text": _fake_csv_rows(prompt)}]
+        return {"candidates": [{"content": {"role": "model", "parts": parts}}]}
+
+    @staticmethod
+    def _wants_json(config) -> bool:
+        if config is None:
+            return False
+        if isinstance(config, dict):
+            mime = config.get("response_mime_type") or config.get("responseMimeType")
+        else:
+            mime = getattr(config, "response_mime_type", None)
+        return mime == "application/json"
+
+    @staticmethod
+    def _wants_image(config) -> bool:
+        if config is None:
+            return False
+        if isinstance(config, dict):
+            modalities = config.get("response_modalities") or config.get("responseModalities") or []
+        else:
+            modalities = getattr(config, "response_modalities", None) or []
+        return "IMAGE" in modalities
+
+    def generate(self, model: str, contents, config=None):
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        resp = self._respond(prompt, self._wants_image(config), self._wants_json(config), model)
+        parts = []
+        for p in _parts(resp):
+            inline = p.get("inlineData")
+            parts.append(SimpleNamespace(
+                text=p.get("text"),
+                inline_data=SimpleNamespace(
+                    data=base64.b64decode(inline["data"]), mime_type=inline["mimeType"]
+                ) if inline else None,
+            ))
+        return SimpleNamespace(
+            text=response_text(resp),
+            candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))],
+        )
+
+    def generate_stream(self, model: str, contents, config=None, on_start=None):
+        """首个 chunk 前等待一次延迟，之后按行分块产出文本。"""
+        if on_start is not None:
+            on_start()
+        text = self.generate(model, contents, config).text
+        lines = text.splitlines(keepends=True) or [text]
+        for i, line in enumerate(lines):
+            last = i == len(lines) - 1
+            yield SimpleNamespace(
+                text=line,
+                usage_metadata=SimpleNamespace(candidates_token_count=max(1, len(text) // 2)) if last else None,
+            )
+
+    def _job_path(self, job_name: str) -> Path:
+        return cache_path("fake_batches", f"{job_name.replace('/', '_')}.json")
+
+    def submit_batch(self, model: str, jsonl_path: Path, display_name: str) -> str:
+        job_name = f"batches/fake-{hashlib.md5(jsonl_path.read_bytes()).hexdigest()[:12]}"
+        self._job_path(job_name).write_text(
+            json.dumps({"src": str(jsonl_path), "model": model, "polls": 0}), encoding="utf-8"
+        )
+        return job_name
+
+    def batch_state(self, job_name: str) -> str:
+        path = self._job_path(job_name)
+        job = json.loads(path.read_text(encoding="utf-8"))
+        job["polls"] += 1
+        path.write_text(json.dumps(job), encoding="utf-8")
+        if job["polls"] <= 1:
+            return BATCH_PENDING
+        if job["polls"] == 2:
+            return BATCH_RUNNING
+        return BATCH_SUCCEEDED
+
+    def batch_results(self, job_name: str, keys: list[str]):
+        job = json.loads(self._job_path(job_name).read_text(encoding="utf-8"))
+        with open(job["src"], encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                request = item["request"]
+                prompt = "".join(
+                    p.get("text", "") for c in request.get("contents", []) for p in c.get("parts", [])
+                )
+                yield item["key"], self._respond(prompt, self._wants_image(request.get("generation_config")))
+
+
+def use_fake_backend() -> bool:
+    return os.environ.get("GEMINI_BACKEND", "").lower() == "fake"
+
+
+def get_backend(api_key: str | None = None):
+    """按环境选择后端：GEMINI_BACKEND=fake 时返回离线替身。"""
+    if use_fake_backend():
+        return FakeBackend(
+            latency=float(os.environ.get("GEMINI_FAKE_LATENCY", "0")),
+            model_latency=_parse_model_latency(os.environ.get("GEMINI_FAKE_MODEL_LATENCY", "")),
+        )
+    return GeminiBackend(api_key)
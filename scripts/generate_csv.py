@@ -14,6 +14,10 @@
        python generate_csv.py elite_quests # 生成高声望任务描述模板
        python generate_csv.py weapons events backgrounds  # 指定多个类型
        python generate_csv.py --dry-run    # 干跑模式，只打印 prompt 不调用 API
+       python generate_csv.py --batch      # 批处理模式：走 Gemini Batch API，更便宜，可断点续跑
+                                           # （中断后再次 --batch 运行会继续轮询同一个任务）
+
+    离线调试: 设置 GEMINI_BACKEND=fake 使用替身后端，不访问网络
 """
 
 import os
@@ -23,6 +27,9 @@ import json
 import shutil
 from pathlib import Path
 
+# design_db / genai_backend / batch_jobs / list_models 在用到时才导入，--dry-run 等轻量命令不必加载
+from profiling import profiled_main, span
+
 # ============================================================
 #  配置区：API Key 从 api_key.txt 读取，也支持环境变量
 # ============================================================
@@ -43,9 +50,15 @@ def _load_api_key() -> str:
 
 API_KEY = _load_api_key()
 
-# Gemini 模型名称
+# 默认 Gemini 模型；python -m scripts models 测速后，按结果自动选用最快的合格模型
 MODEL_NAME = "gemini-2.5-flash"
 
+
+def model_name() -> str:
+    from list_models import pick_model
+
+    return pick_model("csv", MODEL_NAME)
+
 # CSV 目录（相对于本脚本）
 CSV_DIR = Path(__file__).parent.parent / "csv"
 
@@ -140,9 +153,52 @@ def append_to_csv(filename: str, new_lines: list[str]):
     existing = filepath.read_text(encoding="utf-8").rstrip()
     new_content = existing + "\n" + "\n".join(new_lines) + "\n"
     filepath.write_text(new_content, encoding="utf-8")
+    from design_db import invalidate
+
+    invalidate()
     print(f"  [写入] 向 {filename} 追加了 {len(new_lines)} 条数据")
 
 
+def filter_existing_ids(filename: str, lines: list[str], header: str) -> list[str]:
+    """去掉 id 已存在于表中（或本批内重复）的行；表的首列不是 id 时原样返回"""
+    if header.split("|")[0].strip() != "id":
+        return lines
+    from design_db import ids
+
+    seen = ids(Path(filename).stem)
+    kept = []
+    for line in lines:
+        row_id = line.split("|")[0].strip()
+        if row_id in seen:
+            print(f"  [跳过] id 已存在: {row_id}")
+            continue
+        seen.add(row_id)
+        kept.append(line)
+    return kept
+
+
+def class_distribution(table: str, column: str) -> str:
+    """某一类别列 × 稀有度的现有条目数，供提示词引导 AI 补齐空缺"""
+    from design_db import query
+
+    rows = query(
+        f'SELECT "{column}" AS c, rarity, COUNT(*) AS n FROM "{table}" GROUP BY c, rarity ORDER BY c, rarity'
+    )
+    groups: dict[str, list[str]] = {}
+    for row in rows:
+        groups.setdefault(row["c"], []).append(f"{row['rarity']} {row['n']}")
+    return "\n".join(f"- {c}: {', '.join(parts)}" for c, parts in groups.items())
+
+
+def refresh_font_subset():
+    """新数据写入后更新字体子集（字表没有新增字符时直接跳过）"""
+    from subset_fonts import build_subset
+
+    print("\n  检查字体子集...")
+    with span("fonts"):
+        build_subset()
+
+
 def call_gemini(prompt: str, dry_run: bool = False) -> str:
     """调用 Gemini API"""
     if dry_run:
@@ -153,21 +209,27 @@ def call_gemini(prompt: str, dry_run: bool = False) -> str:
         print("=" * 60 + "\n")
         return ""
 
-    try:
-        from google import genai
-    except ImportError:
-        print("[错误] 请先安装依赖: pip install -r requirements.txt")
-        sys.exit(1)
-
-    if API_KEY == "YOUR_API_KEY_HERE" or not API_KEY:
-        print("[错误] 请设置 GEMINI_API_KEY 环境变量，或在脚本顶部填写 API_KEY")
-        sys.exit(1)
-
-    client = genai.Client(api_key=API_KEY)
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=prompt,
-        config={
+    from genai_backend import get_backend, use_fake_backend
+
+    if use_fake_backend():
+        backend = get_backend()
+    else:
+        try:
+            from google import genai  # noqa: F401
+        except ImportError:
+            print("[错误] 请先安装依赖: pip install -r requirements.txt")
+            sys.exit(1)
+
+        if API_KEY == "YOUR_API_KEY_HERE" or not API_KEY:
+            print("[错误] 请设置 GEMINI_API_KEY 环境变量，或在脚本顶部填写 API_KEY")
+            sys.exit(1)
+        backend = get_backend(API_KEY)
+
+    # GeminiBackend 内部经共享限流器调用：令牌桶 + 429/503 自动退避重试
+    response = backend.generate(
+        model_name(),
+        prompt,
+        {
             "system_instruction": SYSTEM_PROMPT,
             "temperature": 0.8,
         },
@@ -207,6 +269,9 @@ def prompt_weapons() -> tuple[str, str, int]:
 已有数据（请参考数值范围和风格，不要重复这些条目）：
 {csv_content}
 
+现有各武器类别的稀有度分布：
+{class_distribution("weapons", "weaponClass")}
+
 请补充以下缺失的武器类型，每种生成 2~3 个品质档次（低/中/高）：
 1. 匕首类 (w_dagger_1/2/3) — 轻便(weight 3~6)、低伤害、高穿甲(armorPen 0.3~0.5)、低疲劳消耗(fatigueCost 6~10)、名称需含"匕"字
 2. 砍刀类 (w_cleaver_1/2/3) — 中等、造成流血、名称需含"刀"字
@@ -331,6 +396,8 @@ def prompt_shields() -> tuple[str, str, int]:
 
 def prompt_backgrounds() -> tuple[str, str, int]:
     """构建角色背景生成提示词"""
+    from design_db import scalar
+
     csv_content = read_csv("backgrounds.csv")
     header = get_header(csv_content)
     col_count = count_columns(header)
@@ -357,7 +424,7 @@ def prompt_backgrounds() -> tuple[str, str, int]:
 
 注意：所有 xxxMod 字段的格式必须是"数字,数字"（如 5,15 或 -10,0），代表随机范围。
 
-已有数据（共32个背景）：
+已有数据（共{scalar('SELECT COUNT(*) FROM backgrounds')}个背景）：
 {csv_content}
 
 请生成 5~8 个新背景，填补职业多样性，例如：
@@ -974,23 +1041,31 @@ def update_stories_in_constants(stories_dict: dict):
 #  主逻辑
 # ============================================================
 
-def generate_type(gen_type: str, dry_run: bool = False):
-    """生成指定类型的数据（CSV 或 任务模板 JSON）"""
-    print(f"\n{'=' * 50}")
-    print(f"  正在生成: {gen_type}")
-    print(f"{'=' * 50}")
+# CSV 类型 → (Prompt 构建函数, CSV 文件名)
+CSV_TYPES = {
+    "weapons": (prompt_weapons, "weapons.csv"),
+    "armor": (prompt_armor, "armor.csv"),
+    "helmets": (prompt_helmets, "helmets.csv"),
+    "shields": (prompt_shields, "shields.csv"),
+    "backgrounds": (prompt_backgrounds, "backgrounds.csv"),
+    "events": (prompt_events, "events.csv"),
+}
 
-    # ---- 任务模板类型：走 JSON → TypeScript 流程 ----
-    if gen_type in ("quests", "elite_quests"):
-        if gen_type == "quests":
-            prompt = prompt_quests()
-        else:
-            prompt = prompt_elite_quests()
 
-        response = call_gemini(prompt, dry_run=dry_run)
-        if dry_run or not response:
-            return
+def build_prompt(gen_type: str) -> str:
+    """构建指定类型的提示词"""
+    if gen_type == "quests":
+        return prompt_quests()
+    if gen_type == "elite_quests":
+        return prompt_elite_quests()
+    prompt, _, _ = CSV_TYPES[gen_type][0]()
+    return prompt
+
 
+def handle_response(gen_type: str, response: str, dry_run: bool = False):
+    """校验 AI 返回内容并写入 CSV / constants.ts（交互式与批处理共用）"""
+    # ---- 任务模板类型：走 JSON → TypeScript 流程 ----
+    if gen_type in ("quests", "elite_quests"):
         cleaned = clean_ai_response(response)
         try:
             data = json.loads(cleaned)
@@ -1007,40 +1082,31 @@ def generate_type(gen_type: str, dry_run: bool = False):
                 for templates in biome_data.values()
             )
             print(f"  [解析] 获得 {total} 个任务模板")
-            update_quest_templates_in_constants(data)
+            with span("write", file="constants.ts"):
+                update_quest_templates_in_constants(data)
         else:
             total = sum(len(templates) for templates in data.values())
             print(f"  [解析] 获得 {total} 个高声望任务模板")
-            update_elite_templates_in_constants(data)
+            with span("write", file="constants.ts"):
+                update_elite_templates_in_constants(data)
         return
 
     # ---- CSV 类型：原有流程 ----
-    prompt_funcs = {
-        "weapons": prompt_weapons,
-        "armor": prompt_armor,
-        "helmets": prompt_helmets,
-        "shields": prompt_shields,
-        "backgrounds": prompt_backgrounds,
-        "events": prompt_events,
-    }
-
-    if gen_type not in prompt_funcs:
-        print(f"  [错误] 未知的生成类型: {gen_type}")
-        print(f"  支持的类型: {', '.join(ALL_TYPES)}")
-        return
-
-    prompt, csv_file, expected_cols = prompt_funcs[gen_type]()
-
-    # 调用 Gemini
-    response = call_gemini(prompt, dry_run=dry_run)
-    if dry_run or not response:
-        return
+    csv_file = CSV_TYPES[gen_type][1]
 
     # 清理和校验
-    cleaned = clean_ai_response(response)
-    lines = cleaned.split("\n")
-    header = get_header(read_csv(csv_file))
-    valid_lines = validate_and_filter_lines(lines, expected_cols, header)
+    with span("validate", type=gen_type):
+        cleaned = clean_ai_response(response)
+        lines = cleaned.split("\n")
+        header = get_header(read_csv(csv_file))
+        expected_cols = count_columns(header)
+        valid_lines = validate_and_filter_lines(lines, expected_cols, header)
+        valid_lines = filter_existing_ids(csv_file, valid_lines, header)
+    if gen_type == "backgrounds" and valid_lines:
+        from recruit_sim import review_new_backgrounds  # 依赖 numpy，只在生成背景时加载
+
+        with span("review", type=gen_type):
+            valid_lines = review_new_backgrounds(header, valid_lines)
 
     if not valid_lines:
         print("  [错误] AI 返回的数据全部不合法，请检查并重试")
@@ -1050,7 +1116,8 @@ def generate_type(gen_type: str, dry_run: bool = False):
     print(f"  [校验] 通过 {len(valid_lines)}/{len(lines)} 条数据")
 
     # 写入 CSV
-    append_to_csv(csv_file, valid_lines)
+    with span("write", file=csv_file):
+        append_to_csv(csv_file, valid_lines)
 
     # 对于 backgrounds，额外生成 stories
     if gen_type == "backgrounds":
@@ -1076,6 +1143,54 @@ def generate_type(gen_type: str, dry_run: bool = False):
                     print(f"  原始返回:\n{stories_cleaned[:500]}")
 
 
+def generate_type(gen_type: str, dry_run: bool = False):
+    """生成指定类型的数据（CSV 或 任务模板 JSON）"""
+    print(f"\n{'=' * 50}")
+    print(f"  正在生成: {gen_type}")
+    print(f"{'=' * 50}")
+
+    if gen_type not in ALL_TYPES:
+        print(f"  [错误] 未知的生成类型: {gen_type}")
+        print(f"  支持的类型: {', '.join(ALL_TYPES)}")
+        return
+
+    with span("prompt_build", type=gen_type):
+        prompt = build_prompt(gen_type)
+
+    # 调用 Gemini
+    with span("call", type=gen_type):
+        response = call_gemini(prompt, dry_run=dry_run)
+    if dry_run or not response:
+        return
+
+    handle_response(gen_type, response, dry_run=dry_run)
+
+
+def generate_batch(types_to_generate: list[str]):
+    """批处理模式：所有提示词打包成一个 Batch 任务提交，结果逐条走原有校验/写入流程"""
+    print(f"\n{'=' * 50}")
+    print(f"  批处理模式: {', '.join(types_to_generate)}")
+    print(f"{'=' * 50}")
+    from batch_jobs import run_batch, text_request
+    from genai_backend import get_backend, response_text
+
+    def build_requests():
+        return [
+            (gen_type, text_request(build_prompt(gen_type), SYSTEM_PROMPT, temperature=0.8))
+            for gen_type in types_to_generate
+        ]
+
+    def handle_result(gen_type: str, response: dict):
+        print(f"\n  ---- 批处理结果: {gen_type} ----")
+        text = response_text(response)
+        if text:
+            handle_response(gen_type, text)
+        else:
+            print(f"  [错误] {gen_type} 的批处理结果为空")
+
+    run_batch("generate_csv", model_name(), build_requests, handle_result, get_backend(API_KEY))
+
+
 def main():
     args = sys.argv[1:]
 
@@ -1084,6 +1199,11 @@ def main():
     if dry_run:
         args.remove("--dry-run")
 
+    # 检查是否批处理模式
+    batch = "--batch" in args
+    if batch:
+        args.remove("--batch")
+
     # 确定要生成的类型
     types_to_generate = args if args else ALL_TYPES
 
@@ -1096,19 +1216,29 @@ def main():
     print("=" * 50)
     print("  《战国·与伍同行》配置数据生成器")
     print("=" * 50)
-    print(f"  模型: {MODEL_NAME}")
+    print(f"  模型: {model_name()}")
     print(f"  CSV 目录: {CSV_DIR}")
     print(f"  待生成: {', '.join(types_to_generate)}")
     print(f"  Dry-run: {'是' if dry_run else '否'}")
+    print(f"  批处理: {'是' if batch else '否'}")
+
+    if not dry_run:
+        from genai_backend import use_fake_backend
 
-    if not dry_run and (API_KEY == "YOUR_API_KEY_HERE" or not API_KEY):
-        print("\n[错误] 请设置 GEMINI_API_KEY 环境变量:")
-        print("  export GEMINI_API_KEY=\"your-api-key-here\"")
-        print("  或在脚本顶部修改 API_KEY 变量")
-        sys.exit(1)
+        if not use_fake_backend() and (API_KEY == "YOUR_API_KEY_HERE" or not API_KEY):
+            print("\n[错误] 请设置 GEMINI_API_KEY 环境变量:")
+            print("  export GEMINI_API_KEY=\"your-api-key-here\"")
+            print("  或在脚本顶部修改 API_KEY 变量")
+            sys.exit(1)
+
+    if batch and not dry_run:
+        generate_batch(types_to_generate)
+    else:
+        for gen_type in types_to_generate:
+            generate_type(gen_type, dry_run=dry_run)
 
-    for gen_type in types_to_generate:
-        generate_type(gen_type, dry_run=dry_run)
+    if not dry_run:
+        refresh_font_subset()
 
     print(f"\n{'=' * 50}")
     print("  全部完成！")
@@ -1116,4 +1246,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    profiled_main(main)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+全平台应用图标流水线：一张 logo 源图 → Android / Electron / Web 全部图标。
+
+源图只解码一次，预乘 alpha 后逐级减半（reduce(2)）建成金字塔；每个目标尺寸从
+不小于它的最小一级做一次 LANCZOS 缩放，大图不会被反复从全尺寸缩放。
+圆形遮罩按 MASK_SUPERSAMPLE 倍超采样绘制再缩小，边缘抗锯齿，并按尺寸缓存。
+像素完全相同的输出（如 Web 192 与 xxxhdpi ic_launcher）只编码一次，字节复用。
+
+平台（构建图节点 icons:<平台>，源图哈希与尺寸表不变时整体跳过）:
+    android   mipmap-*/ic_launcher.png、ic_launcher_round.png（48dp），
+              ic_launcher_foreground.png（自适应图标前景层，108dp，logo 占中间 72dp），
+              values/ic_launcher_background.xml（背景层颜色取源图边缘颜色）
+    electron  build/icon.png（1024）、build/icon.ico、build/icons/<n>x<n>.png（Linux）
+    web       public/favicon.ico、public/icons/（apple-touch-icon、192/512、maskable）
+
+用法:
+    python scripts/generate_icons.py                        # 全部平台
+    python scripts/generate_icons.py android web --force
+    python scripts/generate_icons.py --source docs/final_image/xxx.png
+"""
+
+import argparse
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    print("请先安装 Pillow: pip install Pillow")
+    sys.exit(1)
+
+from buildgraph import BuildGraph, file_digest
+from common import ROOT
+from encoder import encode, write_atomic
+from profiling import profiled_main, span
+
+SOURCE_LOGO = ROOT / "docs" / "final_image" / "2._游戏图标_-_方案_A_极简符号.png"
+ANDROID_RES = ROOT / "android" / "app" / "src" / "main" / "res"
+ELECTRON_DIR = ROOT / "build"
+WEB_DIR = ROOT / "public"
+
+# 各密度相对 mdpi 的倍数；传统图标 48dp，自适应图标图层 108dp（可见区域 72dp）
+DENSITIES = {
+    "mipmap-mdpi": 1,
+    "mipmap-hdpi": 1.5,
+    "mipmap-xhdpi": 2,
+    "mipmap-xxhdpi": 3,
+    "mipmap-xxxhdpi": 4,
+}
+LAUNCHER_DP = 48
+ADAPTIVE_DP = 108
+ADAPTIVE_SAFE_DP = 72
+
+ELECTRON_ICON = 1024
+ELECTRON_SIZES = (16, 32, 48, 64, 128, 256, 512)
+ICO_SIZES = (16, 24, 32, 48, 64, 128, 256)
+FAVICON_SIZES = (16, 32, 48)
+WEB_SIZES = (192, 512)
+APPLE_TOUCH = 180
+MASKABLE_SAFE = 0.8  # W3C maskable 图标的安全区为直径 80% 的圆
+
+MASK_SUPERSAMPLE = 4
+# 图标随安装包分发、只在源图变化时重新编码：所有尺寸都用最高压缩
+PNG_LEVEL = 9
+
+
+# ============================================================
+#  目标表：(输出路径, 尺寸, 形态)
+#  形态: square 满幅方图 / round 圆形 / inset 按比例缩小后放在背景色上（或透明）
+# ============================================================
+
+def android_targets():
+    targets = []
+    for folder, scale in DENSITIES.items():
+        size, layer = round(LAUNCHER_DP * scale), round(ADAPTIVE_DP * scale)
+        out_dir = ANDROID_RES / folder
+        targets += [
+            (out_dir / "ic_launcher.png", size, ("square",)),
+            (out_dir / "ic_launcher_round.png", size, ("round",)),
+            (out_dir / "ic_launcher_foreground.png", layer, ("inset", ADAPTIVE_SAFE_DP / ADAPTIVE_DP, False)),
+        ]
+    return targets
+
+
+def electron_targets():
+    return [(ELECTRON_DIR / "icon.png", ELECTRON_ICON, ("square",))] + [
+        (ELECTRON_DIR / "icons" / f"{n}x{n}.png", n, ("square",)) for n in ELECTRON_SIZES
+    ]
+
+
+def web_targets():
+    icons = WEB_DIR / "icons"
+    return [(icons / f"icon-{n}.png", n, ("square",)) for n in WEB_SIZES] + [
+        (icons / "apple-touch-icon.png", APPLE_TOUCH, ("square",)),
+        (icons / "icon-maskable-512.png", 512, ("inset", MASKABLE_SAFE, True)),
+    ]
+
+
+# 多尺寸 .ico：(输出路径, 尺寸表)
+ICO_TARGETS = {
+    "electron": [(ELECTRON_DIR / "icon.ico", ICO_SIZES)],
+    "web": [(WEB_DIR / "favicon.ico", FAVICON_SIZES)],
+}
+PLATFORMS = {"android": android_targets, "electron": electron_targets, "web": web_targets}
+BACKGROUND_XML = ANDROID_RES / "values" / "ic_launcher_background.xml"
+
+
+def platform_outputs(platform: str) -> list[Path]:
+    outputs = [path for path, _, _ in PLATFORMS[platform]()] + [path for path, _ in ICO_TARGETS.get(platform, [])]
+    if platform == "android":
+        outputs.append(BACKGROUND_XML)
+    return outputs
+
+
+# ============================================================
+#  金字塔与遮罩
+# ============================================================
+
+class Pyramid:
+    """预乘 alpha（RGBa）的逐级减半金字塔，levels[0] 为正方形全尺寸。"""
+
+    def __init__(self, image: Image.Image, min_side: int):
+        w, h = image.size
+        side = min(w, h)
+        left, top = (w - side) // 2, (h - side) // 2
+        base = image.convert("RGBA").crop((left, top, left + side, top + side)).convert("RGBa")
+        self.levels = [base]
+        while self.levels[-1].width // 2 >= min_side:
+            self.levels.append(self.levels[-1].reduce(2))
+        self.background = edge_color(self.levels[-1])
+
+    def get(self, size: int) -> Image.Image:
+        """从不小于 size 的最小一级缩放到 size x size（RGBA）。"""
+        level = next((lv for lv in reversed(self.levels) if lv.width >= size), self.levels[0])
+        if level.width != size:
+            level = level.resize((size, size), Image.Resampling.LANCZOS)
+        return level.convert("RGBA")
+
+
+def edge_color(img: Image.Image) -> tuple[int, int, int]:
+    """取一圈边缘像素的中位数颜色，作为自适应图标背景层/maskable 底色。"""
+    rgba = img.convert("RGBA")
+    w, h = rgba.size
+    pixels = [rgba.getpixel((x, y)) for x in range(w) for y in (0, h - 1)]
+    pixels += [rgba.getpixel((x, y)) for y in range(1, h - 1) for x in (0, w - 1)]
+    opaque = [p for p in pixels if p[3] >= 128] or [(255, 255, 255, 255)]
+    return tuple(sorted(p[c] for p in opaque)[len(opaque) // 2] for c in range(3))
+
+
+@lru_cache(maxsize=None)
+def round_mask(size: int) -> Image.Image:
+    """超采样绘制的圆形遮罩（L），边缘抗锯齿。"""
+    big = size * MASK_SUPERSAMPLE
+    mask = Image.new("L", (big, big), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, big - 1, big - 1), fill=255)
+    return mask.reduce(MASK_SUPERSAMPLE)
+
+
+_pyramids = {}
+_pyramid_lock = threading.Lock()
+
+
+def load_pyramid(source: Path) -> Pyramid:
+    """同一进程内按源图哈希缓存，多个平台节点共用一次解码。"""
+    digest = file_digest(source)
+    with _pyramid_lock:
+        if digest not in _pyramids:
+            with span("decode", file=source.name):
+                with Image.open(source) as img:
+                    img.load()
+                    smallest = min(FAVICON_SIZES + ICO_SIZES + ELECTRON_SIZES)
+                    _pyramids[digest] = Pyramid(img, smallest)
+        return _pyramids[digest]
+
+
+# ============================================================
+#  渲染与编码（相同像素只编码一次）
+# ============================================================
+
+def render(pyramid: Pyramid, size: int, shape: tuple) -> Image.Image:
+    kind = shape[0]
+    if kind == "square":
+        return pyramid.get(size)
+    if kind == "round":
+        out = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        out.paste(pyramid.get(size), (0, 0), mask=round_mask(size))
+        return out
+    # inset: logo 缩到 ratio 放在中间；opaque 时铺背景色（maskable），否则透明（前景层）
+    _, ratio, opaque = shape
+    inner = round(size * ratio)
+    fill = pyramid.background + (255,) if opaque else (0, 0, 0, 0)
+    out = Image.new("RGBA", (size, size), fill)
+    logo = pyramid.get(inner)
+    offset = (size - inner) // 2
+    out.alpha_composite(logo, (offset, offset))
+    return out
+
+
+class EncodeCache:
+    """(尺寸, 形态) → PNG 字节；线程安全，同一键只编码一次。"""
+
+    def __init__(self, pyramid: Pyramid):
+        self.pyramid = pyramid
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def png(self, size: int, shape: tuple) -> bytes:
+        key = (size, shape)
+        with self.lock:
+            entry = self.entries.setdefault(key, {"lock": threading.Lock(), "data": None})
+        with entry["lock"]:
+            if entry["data"] is None:
+                with span("resize", size=size, shape=shape[0]):
+                    img = render(self.pyramid, size, shape)
+                    # 不透明就存 RGB，体积更小
+                    if img.getchannel("A").getextrema() == (255, 255):
+                        img = img.convert("RGB")
+                with span("encode", size=size, shape=shape[0]):
+                    entry["data"] = encode(img, "PNG", optimize=True, compress_level=PNG_LEVEL)
+            return entry["data"]
+
+
+_encoders = {}
+
+
+def encode_cache(source: Path) -> EncodeCache:
+    pyramid = load_pyramid(source)
+    with _pyramid_lock:
+        return _encoders.setdefault(id(pyramid), EncodeCache(pyramid))
+
+
+def write_ico(cache: EncodeCache, path: Path, sizes) -> Path:
+    """多尺寸 .ico，每个尺寸都取自金字塔（不让 Pillow 自行从最大图缩放）。"""
+    frames = [Image.open(io.BytesIO(cache.png(n, ("square",)))) for n in sorted(sizes, reverse=True)]
+    with span("encode", file=path.name):
+        data = encode(frames[0], "ICO", sizes=[f.size for f in frames], append_images=frames[1:])
+    return write_atomic(path, data)
+
+
+def write_background_xml(color, path: Path = BACKGROUND_XML) -> Path:
+    hex_color = "#{:02X}{:02X}{:02X}".format(*color)
+    text = (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        "<resources>\n"
+        f'    <color name="ic_launcher_background">{hex_color}</color>\n'
+        "</resources>"
+    )
+    return write_atomic(path, text.encode("utf-8"))
+
+
+def generate_platform(platform: str, source: Path, workers: int | None = None) -> list[Path]:
+    """生成一个平台的全部图标，返回写出的文件列表。"""
+    cache = encode_cache(source)
+    targets = PLATFORMS[platform]()
+
+    def write(target):
+        path, size, shape = target
+        return write_atomic(path, cache.png(size, shape))
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+        written = list(pool.map(write, targets))
+    written += [write_ico(cache, path, sizes) for path, sizes in ICO_TARGETS.get(platform, [])]
+    if platform == "android":
+        written.append(write_background_xml(cache.pyramid.background))
+    print(f"  {platform}: {len(written)} 个文件")
+    return written
+
+
+def generate_icons(source: Path) -> list[Path]:
+    """生成全部平台的图标（不经过构建图，总是重写）。"""
+    return [p for platform in PLATFORMS for p in generate_platform(platform, source)]
+
+
+# ============================================================
+#  构建图
+# ============================================================
+
+def build_nodes(graph, source: Path = SOURCE_LOGO, platforms=None):
+    """每个平台一个节点；各节点在同一进程内共用一次解码与编码缓存。"""
+    for platform in platforms or PLATFORMS:
+        targets = PLATFORMS[platform]()
+        graph.add(
+            f"icons:{platform}",
+            lambda platform=platform: generate_platform(platform, source),
+            inputs=[source],
+            outputs=platform_outputs(platform),
+            params={
+                "targets": [[str(p.relative_to(ROOT)), n, list(s)] for p, n, s in targets],
+                "ico": [[str(p.relative_to(ROOT)), list(s)] for p, s in ICO_TARGETS.get(platform, [])],
+                "mask": MASK_SUPERSAMPLE,
+                "png": PNG_LEVEL,
+            },
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 logo 生成 Android / Electron / Web 图标")
+    parser.add_argument("platforms", nargs="*", help=f"平台（默认全部: {', '.join(PLATFORMS)}）")
+    parser.add_argument("--source", type=Path, default=SOURCE_LOGO, help="logo 源图（正方形最佳）")
+    parser.add_argument("--force", action="store_true", help="忽略构建记录，全部重新生成")
+    args = parser.parse_args()
+
+    unknown = set(args.platforms) - set(PLATFORMS)
+    if unknown:
+        print(f"[错误] 未知平台: {', '.join(sorted(unknown))}，支持: {', '.join(PLATFORMS)}")
+        sys.exit(1)
+    source = args.source if args.source.is_absolute() else ROOT / args.source
+    if not source.exists():
+        print(f"[错误] 找不到源图 {source}")
+        sys.exit(1)
+
+    print(f"源图: {source}")
+    graph = BuildGraph()
+    build_nodes(graph, source, args.platforms or None)
+    results = graph.build(force=args.force)
+    fresh = [name for name, status in results.items() if status == "fresh"]
+    if fresh:
+        print(f"  源图未变化，跳过: {', '.join(sorted(fresh))}")
+    if "failed" in results.values():
+        sys.exit(1)
+    print("完成。")
+
+
+if __name__ == "__main__":
+    profiled_main(main)
@@ -1,17 +1,23 @@
 import os
 import re
 import argparse
+import shutil
+import threading
 from pathlib import Path
-from google import genai
-from google.genai import types
-from PIL import Image
 import io
 
+# asyncio, the job queue, the backend and the encoder are imported where they are
+# used, so --dry-run and --pick start without loading them
+from common import cache_path
+from profiling import profiled_main, span
+
 # Setup
 BASE_DIR = Path(__file__).parent.parent
 DOCS_DIR = BASE_DIR / "docs"
 IMAGES_DIR = DOCS_DIR / "images"
-IMAGES_DIR.mkdir(exist_ok=True, parents=True)
+# --variants: near-duplicate takes are moved here, per-prompt review grids go here
+DUPLICATES_DIR = IMAGES_DIR / "duplicates"
+CONTACT_SHEETS_DIR = IMAGES_DIR / "contact_sheets"
 
 API_KEY_FILE = BASE_DIR / "scripts/api_key.txt"
 
@@ -62,7 +68,11 @@ def parse_prompts(md_file):
                 })
     return prompts
 
-def generate_image(client, prompt_data, dry_run=False):
+# Nano Banana Pro 使用 generate_content，不是 generate_images
+IMAGE_MODEL = "nano-banana-pro-preview"
+
+def prepare_prompt(prompt_data):
+    """Resolve output path, cleaned prompt text and aspect ratio for one prompt."""
     name = prompt_data["name"]
     prompt = prompt_data["prompt"]
     
@@ -71,13 +81,8 @@ def generate_image(client, prompt_data, dry_run=False):
     safe_name = re.sub(r'[\\/*?:"<>|]', "", name).replace(" ", "_")
     # Truncate if too long
     safe_name = safe_name[:100]
-    output_path = IMAGES_DIR / f"{safe_name}.png"
-    
-    if output_path.exists():
-        print(f"Skipping {name}: already exists at {output_path}")
-        return
-
-    print(f"Generating image for: {name}")
+    variant = prompt_data.get("variant")
+    output_path = IMAGES_DIR / (f"{safe_name}_v{variant}.png" if variant else f"{safe_name}.png")
     
     # Extract aspect ratio from prompt if present
     ar_match = re.search(r'--ar\s+(\d+:\d+)', prompt)
@@ -94,86 +99,350 @@ def generate_image(client, prompt_data, dry_run=False):
     # Midjourney parameters like --ar might confuse it slightly but often ignored.
     # Let's clean it up slightly to be safe.
     clean_prompt = re.sub(r'--\w+\s+[\w:.]+', '', prompt).replace("--no text", "").strip()
+
+    return {
+        "name": name,
+        "key": output_path.stem,
+        "safe_name": safe_name,
+        "output_path": output_path,
+        "clean_prompt": clean_prompt,
+        "aspect_ratio": aspect_ratio,
+    }
+
+# Containers written to disk as-is. The model has been returning JPEG payloads
+# under our .png names for a while (see docs/images); PIL and browsers sniff
+# content rather than trusting the extension, so those are kept byte-for-byte too.
+IMAGE_MAGIC = (
+    b"\x89PNG\r\n\x1a\n",  # PNG
+    b"\xff\xd8\xff",          # JPEG
+)
+
+def save_image_bytes(data, output_path):
+    """Persist model output. Known encoded containers are written as-is (no decode/re-encode)."""
+    from encoder import encode, write_atomic
+
+    view = memoryview(data)
+    # write_atomic goes through a temp name, so an interrupted run never leaves a
+    # truncated file that later runs would treat as "already exists"
+    if not any(view[:len(magic)] == magic for magic in IMAGE_MAGIC):
+        # Anything else (WebP, raw formats...): convert once to PNG
+        from PIL import Image
+
+        with span("decode", file=output_path.name):
+            image = Image.open(io.BytesIO(view))
+            image.load()
+        with span("encode", file=output_path.name):
+            view = memoryview(encode(image, "PNG"))
+    with span("write", file=output_path.name, bytes=len(view)):
+        write_atomic(output_path, view)
+    print(f"  Saved to {output_path}")
+
+def generate_image(client, prompt_data, dry_run=False, overwrite=False, raise_errors=False):
+    """Generate one image; returns the saved path, or None if skipped/failed.
+
+    With raise_errors=True API errors and empty responses raise instead of
+    just being printed, so a caller (the job queue) can retry them.
+    """
+    with span("prompt_build"):
+        job = prepare_prompt(prompt_data)
+    name = job["name"]
+    output_path = job["output_path"]
+    clean_prompt = job["clean_prompt"]
+    aspect_ratio = job["aspect_ratio"]
     
+    if output_path.exists() and not overwrite:
+        print(f"Skipping {name}: already exists at {output_path}")
+        return None
+
+    print(f"Generating image for: {name}")
     print(f"  Prompt: {clean_prompt[:60]}...")
     print(f"  Aspect Ratio: {aspect_ratio}")
 
     if dry_run:
         print("  [Dry Run] Would call API now.")
-        return
+        return None
+
+    output_path.parent.mkdir(exist_ok=True, parents=True)
 
-    # Nano Banana Pro 使用 generate_content，不是 generate_images
-    IMAGE_MODEL = "nano-banana-pro-preview"
     try:
         # Check if we need higher resolution for wallpapers (e.g. 21:9)
         # Note: image_size parameter caused validation error in current SDK version.
         # Removing it for now. Default resolution will be used.
         
-        config = types.GenerateContentConfig(
-            response_modalities=["TEXT", "IMAGE"],
-            image_config=types.ImageConfig(
-                aspect_ratio=aspect_ratio
-            ),
-        )
+        # Plain dict config: the SDK validates it into GenerateContentConfig itself
+        config = {
+            "response_modalities": ["TEXT", "IMAGE"],
+            "image_config": {
+                "aspect_ratio": aspect_ratio
+            },
+        }
         # print(f"  Config: AR={aspect_ratio}") # Optional debug
 
-        response = client.models.generate_content(
-            model=IMAGE_MODEL,
-            contents=clean_prompt,
-            config=config,
-        )
+        # Backend calls go through the shared rate limiter (token bucket + 429/503 backoff)
+        with span("call", name=name):
+            response = client.generate(IMAGE_MODEL, clean_prompt, config)
         # 从 response.parts 或 candidates[0].content.parts 取图
         parts = response.candidates[0].content.parts if response.candidates else []
         saved = False
         for part in parts:
-            if hasattr(part, "as_image"):
-                img = part.as_image()
-                if img is not None:
-                    img.save(output_path)
-                    print(f"  Saved to {output_path}")
-                    saved = True
-                    break
+            # Prefer the raw encoded bytes; as_image() is only a fallback for
+            # SDK objects that don't expose inline_data
             if getattr(part, "inline_data", None) is not None:
                 data = getattr(part.inline_data, "data", None) or getattr(
                     part.inline_data, "image_bytes", None
                 )
                 if data:
-                    image = Image.open(io.BytesIO(data))
-                    image.save(output_path)
+                    save_image_bytes(data, output_path)
+                    saved = True
+                    break
+            if hasattr(part, "as_image"):
+                img = part.as_image()
+                if img is not None:
+                    img.save(output_path)
                     print(f"  Saved to {output_path}")
                     saved = True
                     break
         if not saved:
             print(f"  No image in response for {name}")
+            if raise_errors:
+                raise RuntimeError(f"no image in response for {name}")
+            return None
+        return output_path
     except Exception as e:
         print(f"  Error generating {name}: {e}")
+        if raise_errors:
+            raise
+        return None
+
+def variant_prompts(prompts, variants):
+    """Expand each prompt into N numbered takes (stored as <safe_name>_v<i>.png)."""
+    return [{**p, "variant": i} for p in prompts for i in range(1, variants + 1)]
+
+def review_variants(prompts):
+    """Drop near-identical takes (aHash/dHash) and write one contact sheet per prompt."""
+    from image_variants import dedupe, load_variant, write_contact_sheet
+
+    for p in prompts:
+        job = prepare_prompt(p)
+        safe_name = job["safe_name"]
+        paths = sorted(IMAGES_DIR.glob(f"{glob_escape(safe_name)}_v*.png"),
+                       key=lambda path: int(path.stem.rsplit("_v", 1)[1]))
+        if not paths:
+            continue
+        kept, dupes = dedupe([load_variant(path) for path in paths])
+        for dupe, original in dupes:
+            DUPLICATES_DIR.mkdir(parents=True, exist_ok=True)
+            dupe.path.replace(DUPLICATES_DIR / dupe.path.name)
+            print(f"  Duplicate: {dupe.path.name} ~ {original.path.name} (moved to {DUPLICATES_DIR.name}/)")
+        sheet_path = CONTACT_SHEETS_DIR / f"{safe_name}.jpg"
+        write_contact_sheet(kept, sheet_path, title=job["name"])
+        print(f"  Contact sheet: {sheet_path.name} ({len(kept)} kept, {len(dupes)} duplicates)")
+
+def derive_images(prompts):
+    """WebP/AVIF copies, thumbnails and a JSON sidecar for every existing output (process pool, skips unchanged)."""
+    from derivatives import derive_all
+
+    jobs = []
+    for p in prompts:
+        job = prepare_prompt(p)
+        if job["output_path"].exists():
+            meta = {"name": job["name"], "prompt": job["clean_prompt"],
+                    "aspect_ratio": job["aspect_ratio"], "model": IMAGE_MODEL}
+            jobs.append((job["output_path"], meta))
+    counts = derive_all(jobs)
+    print(f"Derivatives: {counts['built']} built, {counts['fresh']} up to date, {counts['failed']} failed")
+
+def glob_escape(name):
+    return re.sub(r"([*?\[])", r"[\1]", name)
+
+def pick_variant(spec):
+    """--pick <safe_name>:<n>: copy a reviewed take over the canonical <safe_name>.png."""
+    safe_name, _, number = spec.rpartition(":")
+    source = IMAGES_DIR / f"{safe_name}_v{number}.png"
+    if not source.exists():
+        print(f"Error: {source} not found.")
+        return
+    target = IMAGES_DIR / f"{safe_name}.png"
+    shutil.copyfile(source, target)
+    print(f"Picked {source.name} -> {target.name}")
+
+def generate_queued(client, prompts, workers=4, resume=False, retries=3):
+    """Run prompts through a persistent job queue with a bounded async worker pool.
+
+    Queue state lives in scripts/.cache/generate_images_queue.sqlite. Without
+    --resume a fresh queue is built; with --resume jobs that were running when
+    the last run was interrupted (and jobs that failed) go back to pending.
+    """
+    import asyncio
+
+    from jobqueue import DONE, FAILED, PENDING, JobQueue, run_queue
+
+    queue = JobQueue(cache_path("generate_images_queue.sqlite"))
+    if resume:
+        recovered = queue.recover()
+        print(f"Resuming queue: {recovered} interrupted/failed jobs back to pending.")
+    else:
+        queue.reset()
+
+    for p in prompts:
+        job = prepare_prompt(p)
+        # Existing files (including takes moved aside as duplicates) count as done
+        # up front so they never occupy a worker
+        exists = job["output_path"].exists() or (DUPLICATES_DIR / job["output_path"].name).exists()
+        queue.enqueue(job["key"], p, DONE if exists else PENDING)
+    print(f"Queue: {queue.counts()}")
+
+    def work(key, prompt_data):
+        generate_image(client, prompt_data, raise_errors=True)
+
+    asyncio.run(run_queue(queue, work, workers=workers, max_attempts=retries))
+
+    counts = queue.counts()
+    print(f"\nQueue finished: {counts}")
+    for key, error in queue.failures():
+        print(f"  failed: {key}: {error}")
+    if counts.get(FAILED):
+        print("Re-run with --resume to retry failed jobs.")
+
+_client = {}
+_client_lock = threading.Lock()
+
+def _shared_client():
+    """Backend shared by all build-graph image nodes, created only when one is stale."""
+    from genai_backend import get_backend, use_fake_backend
+
+    with _client_lock:
+        if "backend" not in _client:
+            api_key = load_api_key()
+            if not api_key and not use_fake_backend():
+                raise RuntimeError("API Key not found in scripts/api_key.txt or GEMINI_API_KEY env var.")
+            _client["backend"] = get_backend(api_key)
+        return _client["backend"]
+
+def build_nodes(graph):
+    """Register one node per prompt; a node is stale when its prompt text or aspect ratio changes."""
+    prompts_file = DOCS_DIR / "art_design_prompts.md"
+    if not prompts_file.exists():
+        return
+    for p in parse_prompts(prompts_file):
+        job = prepare_prompt(p)
+
+        def action(p=p):
+            output_path = generate_image(_shared_client(), p, overwrite=True)
+            if output_path is None:
+                raise RuntimeError("no image saved")
+            return [output_path]
+
+        graph.add(
+            f"images:{job['safe_name']}",
+            action,
+            outputs=[job["output_path"]],
+            params={
+                "prompt": job["clean_prompt"],
+                "aspect_ratio": job["aspect_ratio"],
+                "model": IMAGE_MODEL,
+            },
+            # Existing images were generated before the graph existed; adopt rather than re-pay for them
+            adopt_existing=True,
+        )
+
+def generate_batch(backend, prompts):
+    """Submit every missing image as one Batch API job and save results as they come back."""
+    from batch_jobs import run_batch, text_request
+    from genai_backend import response_image_bytes
+
+    jobs = {}
+    for p in prompts:
+        job = prepare_prompt(p)
+        if job["output_path"].exists():
+            print(f"Skipping {job['name']}: already exists at {job['output_path']}")
+            continue
+        jobs[job["key"]] = job
+
+    def build_requests():
+        return [
+            (key, text_request(
+                job["clean_prompt"],
+                response_modalities=["TEXT", "IMAGE"],
+                image_config={"aspect_ratio": job["aspect_ratio"]},
+            ))
+            for key, job in jobs.items()
+        ]
+
+    def handle_result(key, response):
+        data = response_image_bytes(response)
+        if not data:
+            print(f"  No image in batch response for {key}")
+            return
+        output_path = IMAGES_DIR / f"{key}.png"
+        if output_path.exists():
+            print(f"Skipping {key}: already exists at {output_path}")
+            return
+        save_image_bytes(data, output_path)
+
+    run_batch("generate_images", IMAGE_MODEL, build_requests, handle_result, backend)
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--dry-run", action="store_true", help="Don't call API")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all prompts as one Batch API job (cheaper, resumable)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent generation workers")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the previous queue instead of starting a new one")
+    parser.add_argument("--retries", type=int, default=3, help="Attempts per image before marking it failed")
+    parser.add_argument("--variants", type=int, default=0,
+                        help="Generate N takes per prompt, drop near-duplicates and write contact sheets")
+    parser.add_argument("--pick", metavar="SAFE_NAME:N",
+                        help="Copy take N over the canonical image for SAFE_NAME (no API call)")
+    parser.add_argument("--no-derivatives", action="store_true",
+                        help="Skip WebP/AVIF/thumbnail/sidecar generation after the run")
     args = parser.parse_args()
 
-    api_key = load_api_key()
-    if not api_key:
-        print("Error: API Key not found in scripts/api_key.txt or GEMINI_API_KEY env var.")
-        return
+    # Dry runs only parse prompts; no key, SDK import or client needed
+    client = None
+    if not args.dry_run and not args.pick:
+        from genai_backend import get_backend, use_fake_backend
 
-    try:
-        client = genai.Client(api_key=api_key)
-    except Exception as e:
-        print(f"Error initializing client: {e}")
-        return
+        api_key = load_api_key()
+        if not api_key and not use_fake_backend():
+            print("Error: API Key not found in scripts/api_key.txt or GEMINI_API_KEY env var.")
+            return
+
+        try:
+            client = get_backend(api_key)
+        except Exception as e:
+            print(f"Error initializing client: {e}")
+            return
     
     prompts_file = DOCS_DIR / "art_design_prompts.md"
     if not prompts_file.exists():
         print(f"Error: {prompts_file} not found.")
         return
-
     prompts = parse_prompts(prompts_file)
     print(f"Found {len(prompts)} prompts.")
+
+    if args.pick:
+        pick_variant(args.pick)
+        return
+    base_prompts = prompts
+    if args.variants:
+        prompts = variant_prompts(prompts, args.variants)
     
-    for p in prompts:
-        generate_image(client, p, dry_run=args.dry_run)
+    if args.dry_run:
+        for p in prompts:
+            generate_image(client, p, dry_run=True)
+        return
+
+    if args.batch:
+        generate_batch(client, prompts)
+    else:
+        generate_queued(client, prompts, workers=args.workers, resume=args.resume, retries=args.retries)
+    if args.variants:
+        review_variants(base_prompts)
+    if not args.no_derivatives:
+        # After dedupe, so duplicates moved aside don't get derivatives
+        derive_images(prompts)
 
 if __name__ == "__main__":
-    main()
+    profiled_main(main)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+多版本出图的感知哈希去重与缩略图联系表（contact sheet）。
+
+每张图只解码一次：先缩成联系表用的缩略图，aHash/dHash 都在这张缩略图上用 NumPy 计算。
+两张图的 aHash 和 dHash 汉明距离都不超过阈值，就认为是近似重复。
+
+用法:
+    infos = [load_variant(p) for p in paths]
+    kept, dupes = dedupe(infos)
+    write_contact_sheet(kept, out_path, title)
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import groupby
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from encoder import encode, write_atomic
+from profiling import span
+
+HASH_SIZE = 8             # 8x8 = 64 位哈希
+DUPLICATE_DISTANCE = 5    # 汉明距离 <= 该值视为近似重复（64 位中）
+THUMB_SIZE = 320          # 联系表单元格边长
+LABEL_SIZE = 15           # 文件名标注字号
+TITLE_SIZE = 20           # 标题字号
+
+
+@dataclass
+class VariantInfo:
+    path: Path
+    size: tuple[int, int]
+    thumb: Image.Image
+    ahash: int
+    dhash: int
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def _gray(img: Image.Image, w: int, h: int) -> np.ndarray:
+    return np.asarray(img.convert("L").resize((w, h), Image.Resampling.BOX), dtype=np.float32)
+
+
+def ahash(img: Image.Image, size: int = HASH_SIZE) -> int:
+    """均值哈希：像素是否高于平均亮度。"""
+    g = _gray(img, size, size)
+    return _bits_to_int(g > g.mean())
+
+
+def dhash(img: Image.Image, size: int = HASH_SIZE) -> int:
+    """差值哈希：水平相邻像素的亮度梯度方向。"""
+    g = _gray(img, size + 1, size)
+    return _bits_to_int(g[:, 1:] > g[:, :-1])
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def load_variant(path: Path, thumb_size: int = THUMB_SIZE) -> VariantInfo:
+    """解码一次，生成缩略图并计算两种哈希。"""
+    with span("decode", file=path.name):
+        with Image.open(path) as img:
+            img.draft("RGB", (thumb_size, thumb_size))  # JPEG 可直接按 1/2^n 解码
+            size = img.size
+            thumb = img.convert("RGB")
+            thumb.thumbnail((thumb_size, thumb_size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    return VariantInfo(path, size, thumb, ahash(thumb), dhash(thumb))
+
+
+def dedupe(infos: list[VariantInfo], max_distance: int = DUPLICATE_DISTANCE):
+    """按顺序保留第一张，之后与任一已保留图近似的判为重复。返回 (kept, [(dupe, original)])。"""
+    kept, dupes = [], []
+    for info in infos:
+        match = next(
+            (k for k in kept
+             if hamming(info.ahash, k.ahash) <= max_distance and hamming(info.dhash, k.dhash) <= max_distance),
+            None,
+        )
+        if match is None:
+            kept.append(info)
+        else:
+            dupes.append((info, match))
+    return kept, dupes
+
+
+# ============================================================
+#  标注字体
+# ============================================================
+
+@lru_cache(maxsize=1)
+def _slice_fonts() -> tuple[tuple[frozenset, str], ...]:
+    """Noto Serif SC 分片（download-assets.js 下载）及各自覆盖的码位；没有分片时为空。"""
+    from subset_fonts import FONTS_DIR, SLICE_CSS, slice_ranges
+
+    if not SLICE_CSS.exists():
+        return ()
+    slices = []
+    for name, codes in slice_ranges(SLICE_CSS).items():
+        path = FONTS_DIR / "NotoSerifSC" / name
+        if path.exists():
+            slices.append((frozenset(codes), str(path)))
+    return tuple(slices)
+
+
+def _font_path_for(char: str) -> str | None:
+    code = ord(char)
+    return next((path for codes, path in _slice_fonts() if code in codes), None)
+
+
+@lru_cache(maxsize=None)
+def _font(path: str | None, size: int):
+    return ImageFont.truetype(path, size) if path else ImageFont.load_default()
+
+
+def draw_label(draw: ImageDraw.ImageDraw, xy: tuple[int, int], text: str, size: int, fill):
+    """
+    绘制可能含中文的标注。PIL 默认位图字体只有 ASCII，所以逐段选用覆盖该字的 Noto Serif SC 分片；
+    没有分片覆盖的非 ASCII 字符（或没下载分片时）画成 '?'，不出现空框。
+    """
+    x, y = xy
+    for path, run in groupby(text, key=_font_path_for):
+        run = "".join(run)
+        if path is None:
+            run = "".join(c if c.isascii() else "?" for c in run)
+        font = _font(path, size)
+        draw.text((x, y), run, font=font, fill=fill)
+        x += draw.textlength(run, font=font)
+
+
+def write_contact_sheet(infos: list[VariantInfo], out_path: Path, title: str = "", cols: int = 4,
+                        cell: int = THUMB_SIZE):
+    """把缩略图排成网格，每格下方标注文件名与原始分辨率，保存为 JPEG。"""
+    if not infos:
+        return
+    cols = min(cols, len(infos))
+    rows = (len(infos) + cols - 1) // cols
+    label_h, pad, header = 28, 8, 32 if title else 0
+    sheet = Image.new("RGB", (cols * (cell + pad) + pad, header + rows * (cell + label_h + pad) + pad), (24, 22, 20))
+    draw = ImageDraw.Draw(sheet)
+    if title:
+        draw_label(draw, (pad, 4), title, TITLE_SIZE, (230, 210, 160))
+    for i, info in enumerate(infos):
+        x = pad + (i % cols) * (cell + pad)
+        y = header + pad + (i // cols) * (cell + label_h + pad)
+        tw, th = info.thumb.size
+        sheet.paste(info.thumb, (x + (cell - tw) // 2, y + (cell - th) // 2))
+        draw_label(draw, (x, y + cell + 4), f"{info.path.stem[-24:]}  {info.size[0]}x{info.size[1]}", LABEL_SIZE,
+                   (200, 200, 200))
+    with span("encode", file=out_path.name):
+        write_atomic(out_path, encode(sheet, "JPEG", quality=85, optimize=True))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+持久化任务队列 + 有界异步 worker 池。
+
+队列状态存在一个小 SQLite 文件里，每个任务有 pending / running / done / failed 四种状态。
+进程被中断后，--resume 会把 running（中断时正在跑的）和 failed 的任务放回 pending，
+从断点继续；已 done 的任务不会重跑。
+
+用法:
+    queue = JobQueue(cache_path("xxx_queue.sqlite"))
+    queue.enqueue("key", {"任意": "JSON 负载"})
+    asyncio.run(run_queue(queue, work, workers=4))   # work(key, payload) 在线程里执行，抛异常即失败
+"""
+
+import asyncio
+import json
+import random
+import sqlite3
+import time
+from pathlib import Path
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    def __init__(self, path: Path):
+        self.path = path
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0,
+                error TEXT,
+                seq INTEGER NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+
+    def reset(self):
+        """清空队列（新一轮运行）。"""
+        self.db.execute("DELETE FROM jobs")
+
+    def enqueue(self, key: str, payload: dict, state: str = PENDING):
+        """加入任务；同 key 已存在时保持原状态不变。"""
+        seq = self.db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs").fetchone()[0]
+        self.db.execute(
+            "INSERT OR IGNORE INTO jobs (key, payload, state, seq, updated) VALUES (?, ?, ?, ?, ?)",
+            (key, json.dumps(payload, ensure_ascii=False), state, seq, time.time()),
+        )
+
+    def recover(self, retry_failed: bool = True) -> int:
+        """把中断时的 running（以及可选的 failed）任务放回 pending，返回数量。"""
+        states = (RUNNING, FAILED) if retry_failed else (RUNNING,)
+        cur = self.db.execute(
+            f"UPDATE jobs SET state = ?, not_before = 0, attempts = CASE WHEN state = ? THEN 0 ELSE attempts END "
+            f"WHERE state IN ({','.join('?' * len(states))})",
+            (PENDING, FAILED, *states),
+        )
+        return cur.rowcount
+
+    def claim(self) -> tuple[str, dict, int] | None:
+        """取出一个可执行的 pending 任务并标记为 running。"""
+        row = self.db.execute(
+            "SELECT key, payload, attempts FROM jobs WHERE state = ? AND not_before <= ? ORDER BY seq LIMIT 1",
+            (PENDING, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE jobs SET state = ?, updated = ? WHERE key = ?", (RUNNING, time.time(), row[0]))
+        return row[0], json.loads(row[1]), row[2]
+
+    def next_ready_in(self) -> float | None:
+        """距最近一个退避中的 pending 任务可执行还有多久；没有 pending 返回 None。"""
+        row = self.db.execute("SELECT MIN(not_before) FROM jobs WHERE state = ?", (PENDING,)).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def complete(self, key: str):
+        self.db.execute("UPDATE jobs SET state = ?, error = NULL, updated = ? WHERE key = ?", (DONE, time.time(), key))
+
+    def retry_later(self, key: str, error: str, delay: float):
+        self.db.execute(
+            "UPDATE jobs SET state = ?, attempts = attempts + 1, not_before = ?, error = ?, updated = ? WHERE key = ?",
+            (PENDING, time.time() + delay, error, time.time(), key),
+        )
+
+    def fail(self, key: str, error: str):
+        self.db.execute(
+            "UPDATE jobs SET state = ?, attempts = attempts + 1, error = ?, updated = ? WHERE key = ?",
+            (FAILED, error, time.time(), key),
+        )
+
+    def counts(self) -> dict[str, int]:
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def failures(self) -> list[tuple[str, str]]:
+        return self.db.execute("SELECT key, error FROM jobs WHERE state = ? ORDER BY seq", (FAILED,)).fetchall()
+
+
+async def run_queue(queue: JobQueue, work, workers: int = 4, max_attempts: int = 3, base_delay: float = 5.0):
+    """
+    用 workers 个协程消费队列；work(key, payload) 在线程池中执行。
+    失败后按指数退避（base_delay * 2^n，带抖动）重新排队，超过 max_attempts 次标记 failed。
+    """
+
+    async def worker():
+        while True:
+            job = queue.claim()
+            if job is None:
+                wait = queue.next_ready_in()
+                if wait is None:
+                    return
+                await asyncio.sleep(min(wait, 1.0) + 0.05)
+                continue
+            key, payload, attempts = job
+            try:
+                await asyncio.to_thread(work, key, payload)
+            except Exception as e:
+                error = f"{e.__class__.__name__}: {e}"
+                if attempts + 1 < max_attempts:
+                    delay = base_delay * (2 ** attempts) * random.uniform(0.8, 1.2)
+                    print(f"  [重试] {key}: {error}（{delay:.0f}s 后第 {attempts + 2} 次尝试）")
+                    queue.retry_later(key, error, delay)
+                else:
+                    print(f"  [失败] {key}: {error}")
+                    queue.fail(key, error)
+            else:
+                queue.complete(key)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
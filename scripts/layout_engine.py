@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+本地 Logo 布局引擎：在背景图里找最适合放 Logo 的留白区域（纯 NumPy，无网络）。
+
+1. 把背景缩到 ANALYSIS_SIZE 长边，计算代价图：
+   - 边缘能量（亮度梯度幅值）
+   - 局部对比度（积分图求 8x8 窗口标准差）
+   - 肤色密度（YCbCr 肤色范围 × 局部对比度 × 全图稀有度，经积分图盒式平滑），权重最高，避免盖住人脸
+2. 对代价图再做一次积分图，按 Logo 宽高比枚举不同尺寸、位置的候选框，
+   O(1) 求框内平均代价；分数 = 平均代价 - 尺寸奖励。
+3. 置信度主要看最佳框相对全图的干净程度（框内平均代价 / 全图平均代价）：
+   宣传图大多整幅都有笔触、雨丝、云层纹理，代价图又按全图 95 分位归一化，
+   绝对代价只适合排除"哪里都乱"的画面（超过 CLUTTER_OK 后逐渐降到 0）；
+   另有一小部分取决于和次优（不重叠）候选的分差。
+   置信度低于阈值时调用方再去问远程视觉模型。
+
+返回的 bounding_box 与 AI 布局一致：[ymin, xmin, ymax, xmax]，0-1000 归一化。
+"""
+
+import numpy as np
+
+ENGINE_VERSION = 2        # 算法或参数变化时递增，使缓存与构建记录失效
+ANALYSIS_SIZE = 256       # 分析用缩略图长边
+CONTRAST_WINDOW = 8
+SKIN_WINDOW = 9
+SKIN_WEIGHT = 3.0
+SIZE_BONUS = 0.3          # 越大越好，但不能以盖住细节为代价
+MARGIN = 0.04             # 候选框与画面边缘的最小距离（占边长比例）
+MAX_HEIGHT = 0.4          # Logo 高度不超过画面高度的比例
+WIDTHS = (0.85, 0.75, 0.65, 0.55, 0.45, 0.35, 0.28)
+RELATIVE_LIMIT = 1.0      # 框内平均代价与全图平均代价之比达到该值时相对干净度为 0
+CLUTTER_OK = 0.3          # 框内平均代价（绝对值）不超过该值时不扣分
+CLUTTER_LIMIT = 0.5       # 达到该值时视为完全不干净，置信度为 0
+SEPARATION_WEIGHT = 0.1   # 与次优候选分差在置信度中的权重
+MAX_SKIN = 0.02           # 框内肤色占比上限，超过则置信度为 0
+SKIN_COMMON = 0.5         # 全图肤色像素占比达到该值时肤色惩罚完全关闭
+
+
+def integral(a: np.ndarray) -> np.ndarray:
+    """带一圈 0 边的积分图：S[y, x] = a[:y, :x].sum()。"""
+    s = np.zeros((a.shape[0] + 1, a.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(a, axis=0), axis=1, out=s[1:, 1:])
+    return s
+
+
+def box_sums(s: np.ndarray, h: int, w: int) -> np.ndarray:
+    """所有 h x w 窗口的和，结果 [y, x] 为左上角在 (y, x) 的窗口。"""
+    return s[h:, w:] - s[:-h, w:] - s[h:, :-w] + s[:-h, :-w]
+
+
+def box_mean_same(a: np.ndarray, k: int) -> np.ndarray:
+    """k x k 盒式均值，输出与输入同尺寸（边缘复制填充）。"""
+    pad = k // 2
+    padded = np.pad(a, ((pad, k - 1 - pad), (pad, k - 1 - pad)), mode="edge")
+    return box_sums(integral(padded), k, k) / (k * k)
+
+
+def _normalize(a: np.ndarray) -> np.ndarray:
+    scale = np.percentile(a, 95)
+    return np.clip(a / scale, 0.0, 1.0) if scale > 0 else np.zeros_like(a)
+
+
+def skin_mask(rgb: np.ndarray) -> np.ndarray:
+    """经典 YCbCr 肤色范围（Cb 77-127，Cr 133-173），再排除过暗/过亮像素。"""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    y = 0.299 * r + 0.587 * g + 0.114 * b
+    cb = 128 - 0.168736 * r - 0.331264 * g + 0.5 * b
+    cr = 128 + 0.5 * r - 0.418688 * g - 0.081312 * b
+    return ((cb >= 77) & (cb <= 127) & (cr >= 133) & (cr <= 173) & (y > 40) & (y < 240)).astype(np.float32)
+
+
+def cost_maps(image) -> dict:
+    """背景图（PIL Image）→ 分析尺寸下的代价图与肤色密度图。"""
+    from PIL import Image
+
+    small = image.convert("RGB")
+    small.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE), Image.Resampling.BOX)
+    rgb = np.asarray(small, dtype=np.float32)
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    gx = np.zeros_like(gray)
+    gy = np.zeros_like(gray)
+    gx[:, 1:] = np.abs(np.diff(gray, axis=1))
+    gy[1:, :] = np.abs(np.diff(gray, axis=0))
+    edges = _normalize(box_mean_same(np.hypot(gx, gy), 3))
+
+    mean = box_mean_same(gray, CONTRAST_WINDOW)
+    var = np.maximum(box_mean_same(gray * gray, CONTRAST_WINDOW) - mean * mean, 0.0)
+    contrast = _normalize(np.sqrt(var))
+
+    # 只有带纹理细节的肤色区域才像人脸/手；暖色天空、沙地这类平滑区域不算。
+    # 整幅画都偏暖（肤色像素占比接近 SKIN_COMMON）时肤色不再有区分度，按比例降权
+    mask = skin_mask(rgb)
+    rarity = max(0.0, 1.0 - float(mask.mean()) / SKIN_COMMON)
+    skin = box_mean_same(mask * np.clip(2.0 * contrast, 0.0, 1.0), SKIN_WINDOW) * rarity
+    cost = 0.6 * edges + 0.4 * contrast + SKIN_WEIGHT * skin
+    return {"cost": cost, "skin": skin}
+
+
+def _candidates(cost_s, skin_s, h_img, w_img, logo_aspect):
+    """枚举候选框，返回 (分数, 平均代价, 肤色占比, y, x, h, w) 数组。"""
+    rows = []
+    margin_y, margin_x = int(h_img * MARGIN), int(w_img * MARGIN)
+    stride = max(1, max(h_img, w_img) // 64)
+    for frac in WIDTHS:
+        w = int(w_img * frac)
+        h = int(round(w / logo_aspect))
+        if h > h_img * MAX_HEIGHT:
+            h = int(h_img * MAX_HEIGHT)
+            w = int(round(h * logo_aspect))
+        if w < 8 or h < 4 or w > w_img - 2 * margin_x or h > h_img - 2 * margin_y:
+            continue
+        area = float(w * h)
+        mean_cost = box_sums(cost_s, h, w) / area
+        skin = box_sums(skin_s, h, w) / area
+        ys = np.arange(margin_y, h_img - h - margin_y + 1, stride)
+        xs = np.arange(margin_x, w_img - w - margin_x + 1, stride)
+        grid = np.ix_(ys, xs)
+        mc, sk = mean_cost[grid], skin[grid]
+        score = mc - SIZE_BONUS * (w / w_img)
+        yy, xx = np.meshgrid(ys, xs, indexing="ij")
+        n = score.size
+        rows.append(np.column_stack([
+            score.ravel(), mc.ravel(), sk.ravel(), yy.ravel(), xx.ravel(),
+            np.full(n, h), np.full(n, w),
+        ]))
+    return np.concatenate(rows) if rows else np.empty((0, 7))
+
+
+def _iou(a, b) -> float:
+    ay, ax, ah, aw = a
+    by, bx, bh, bw = b
+    ih = max(0.0, min(ay + ah, by + bh) - max(ay, by))
+    iw = max(0.0, min(ax + aw, bx + bw) - max(ax, bx))
+    inter = ih * iw
+    return inter / (ah * aw + bh * bw - inter)
+
+
+def _where(y, x, h, w, h_img, w_img) -> str:
+    cy, cx = (y + h / 2) / h_img, (x + w / 2) / w_img
+    vertical = "top" if cy < 0.38 else "bottom" if cy > 0.62 else "middle"
+    horizontal = "left" if cx < 0.38 else "right" if cx > 0.62 else "center"
+    return f"{vertical}-{horizontal}"
+
+
+def find_layout(image, logo_aspect: float) -> dict | None:
+    """
+    在背景图中找宽高比为 logo_aspect 的最佳留白框。
+    返回 {"bounding_box", "position_description", "confidence", "clutter", "source"}；
+    找不到任何候选返回 None。
+    """
+    maps = cost_maps(image)
+    cost, skin = maps["cost"], maps["skin"]
+    h_img, w_img = cost.shape
+    cands = _candidates(integral(cost), integral(skin), h_img, w_img, logo_aspect)
+    if not len(cands):
+        return None
+
+    order = np.argsort(cands[:, 0])
+    best = cands[order[0]]
+    best_box = best[3:7]
+    # 次优：与最佳框基本不重叠的最好候选
+    runner_up = next(
+        (cands[i] for i in order[1:] if _iou(best_box, cands[i][3:7]) < 0.2),
+        None,
+    )
+
+    relative = float(np.clip(1.0 - best[1] / max(float(cost.mean()), 1e-6) / RELATIVE_LIMIT, 0.0, 1.0))
+    busy = float(np.clip((CLUTTER_LIMIT - best[1]) / (CLUTTER_LIMIT - CLUTTER_OK), 0.0, 1.0))
+    gap = 0.0 if runner_up is None else float(runner_up[0] - best[0])
+    separation = float(np.clip(gap / 0.05, 0.0, 1.0)) if runner_up is not None else 1.0
+    confidence = ((1.0 - SEPARATION_WEIGHT) * relative + SEPARATION_WEIGHT * separation) * busy
+    if best[2] > MAX_SKIN:
+        confidence = 0.0
+
+    y, x, h, w = (float(v) for v in best_box)
+    return {
+        "bounding_box": [
+            round(1000 * y / h_img), round(1000 * x / w_img),
+            round(1000 * (y + h) / h_img), round(1000 * (x + w) / w_img),
+        ],
+        "position_description": (
+            f"Local saliency search: {_where(y, x, h, w, h_img, w_img)} negative space, "
+            f"clutter {best[1]:.2f}, skin {best[2]:.3f}"
+        ),
+        "confidence": round(confidence, 3),
+        "clutter": round(float(best[1]), 4),
+        "source": "local",
+    }
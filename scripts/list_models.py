@@ -1,9 +1,60 @@
+#!/usr/bin/env python3
+"""
+模型测速：为每类任务选出最快且输出合格的 Gemini 模型。
 
+对每个候选模型并发发送一组有代表性的提示词（与实际生成时相同的武器/事件 CSV 提示词、
+一个 JSON 布局查询），用流式调用测量：
+    ttfb_ms        首个 chunk 到达的时间
+    total_ms       完整响应的时间
+    tokens_per_s   输出 token / 首 chunk 之后的生成时间
+    yield          格式合格率（CSV 行列数与表头一致 / 布局是带 bounding_box 的 JSON）
+结果按后端（gemini / fake）写入 scripts/.cache/model_probe.json，PROBE_TTL 内有效。
+
+各脚本用 pick_model(任务, 默认模型) 取模型：有未过期的测速结果时取该任务合格率达标、
+total_ms 中位数最小的模型，否则用默认模型。
+
+用法:
+    python -m scripts models                 # 测速（结果未过期时直接显示缓存）
+    python -m scripts models --refresh       # 忽略缓存重新测速
+    python -m scripts models --models gemini-2.5-flash,gemini-2.0-flash --repeat 3
+    python -m scripts models --list          # 只列出账号可用的模型
+    GEMINI_BACKEND=fake GEMINI_FAKE_MODEL_LATENCY="gemini-2.5-flash=0.3" python -m scripts models --refresh
+"""
+
+import argparse
+import json
 import os
-from google import genai
+import re
+import sys
+import time
+
+from common import SCRIPTS_DIR, cache_path
+from profiling import profiled_main, span
+
+PROBE_CACHE_FILE = cache_path("model_probe.json")
+PROBE_TTL = 24 * 3600   # 秒
+PROBE_REPEAT = 2        # 每个模型每条提示词的次数
+PROBE_WORKERS = 4
+MIN_YIELD = 0.8         # 格式合格率低于该值的模型不参与选择
+
+DEFAULT_CANDIDATES = ["gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.0-flash"]
+
+LAYOUT_PROMPT = """
+A text-based game logo must be placed on a marketing image: a wide dusk battlefield, two armies facing
+each other in the lower half, a pale sky with light clouds across the top third, a general on horseback
+slightly left of centre.
+
+Find the best location and size for the logo: prominent and legible, using negative space,
+never covering faces or focal points.
+
+Return a JSON object with:
+- "position_description": "Why you chose this spot and size"
+- "bounding_box": [ymin, xmin, ymax, xmax] (values from 0 to 1000)
+"""
+
 
 def load_api_key():
-    key_file = "scripts/api_key.txt"
+    key_file = SCRIPTS_DIR / "api_key.txt"
     if os.path.exists(key_file):
         with open(key_file, "r") as f:
             lines = f.readlines()
@@ -13,26 +64,279 @@ def load_api_key():
                     return line
     return os.environ.get("GEMINI_API_KEY")
 
+
 def list_models():
+    from google import genai
+
     api_key = load_api_key()
     client = genai.Client(api_key=api_key)
     try:
         print("Listing models...")
-        # The SDK returns an iterator of Model objects
         for m in client.models.list():
             print(f"Name: {m.name}")
-            # Try to print other useful attributes if they exist
             if hasattr(m, 'display_name'):
                 print(f"  Display Name: {m.display_name}")
-            if hasattr(m, 'supported_generation_methods'):
-                 print(f"  Supported Methods: {m.supported_generation_methods}")
+            if hasattr(m, 'supported_actions'):
+                print(f"  Supported Actions: {m.supported_actions}")
             print("-" * 20)
-            
     except Exception as e:
         print(f"Error listing models: {e}")
-        # Print dir(m) if we failed inside loop to see what attributes exist
-        # But we can't access 'm' here easily if it failed before loop or we don't know which one.
-        # Let's just catch the error.
+
+
+def available_models(backend) -> set[str] | None:
+    """账号可用于 generateContent 的模型名（不带 models/ 前缀）；无法列出时返回 None。"""
+    client = getattr(backend, "client", None)
+    if client is None:
+        return None
+    try:
+        return {m.name.removeprefix("models/") for m in client.models.list()
+                if "generateContent" in (getattr(m, "supported_actions", None) or ["generateContent"])}
+    except Exception as e:
+        print(f"  [警告] 无法列出模型（{e}），按候选列表直接测速")
+        return None
+
+
+# ============================================================
+#  测速用例
+# ============================================================
+
+def _csv_validator(header: str, expected_cols: int):
+    from generate_csv import clean_ai_response
+
+    def validate(text: str) -> bool:
+        lines = [line.strip() for line in clean_ai_response(text).splitlines()
+                 if line.strip() and line.strip() != header.strip()]
+        return bool(lines) and all(len(line.split("|")) == expected_cols for line in lines)
+
+    return validate
+
+
+def _validate_layout(text: str) -> bool:
+    text = re.sub(r"^```(?:json)?|```$", "", text.strip()).strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return False
+    if isinstance(data, list):
+        data = data[0] if data else None
+    box = data.get("bounding_box") if isinstance(data, dict) else None
+    return isinstance(box, list) and len(box) == 4 and all(isinstance(v, (int, float)) for v in box)
+
+
+def probe_suite() -> list[dict]:
+    """[{name, task, prompt, config, validate}]；CSV 提示词与 generate_csv 实际使用的一致。"""
+    import generate_csv
+
+    suite = []
+    for name, builder in (("weapons", generate_csv.prompt_weapons), ("events", generate_csv.prompt_events)):
+        prompt, filename, expected_cols = builder()
+        header = generate_csv.get_header(generate_csv.read_csv(filename))
+        suite.append({
+            "name": name,
+            "task": "csv",
+            "prompt": prompt,
+            "config": {"system_instruction": generate_csv.SYSTEM_PROMPT, "temperature": 0.8},
+            "validate": _csv_validator(header, expected_cols),
+        })
+    suite.append({
+        "name": "layout",
+        "task": "layout",
+        "prompt": LAYOUT_PROMPT,
+        "config": {"response_mime_type": "application/json"},
+        "validate": _validate_layout,
+    })
+    return suite
+
+
+# ============================================================
+#  测速
+# ============================================================
+
+def run_probe(backend, model: str, case: dict) -> dict:
+    """一次流式调用；失败时返回 {"error": ...}。从拿到限流租约时开始计时，排队等待不算模型延迟。"""
+    start = None
+    first = None
+    chunks = []
+    tokens = None
+
+    def started():
+        nonlocal start
+        start = time.perf_counter()
+
+    try:
+        with span("probe", model=model, case=case["name"]):
+            for chunk in backend.generate_stream(model, case["prompt"], case["config"], on_start=started):
+                text = getattr(chunk, "text", None) or ""
+                if text and first is None:
+                    first = time.perf_counter()
+                chunks.append(text)
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage is not None and getattr(usage, "candidates_token_count", None):
+                    tokens = usage.candidates_token_count
+    except Exception as e:
+        return {"error": f"{e.__class__.__name__}: {e}"[:200]}
+    end = time.perf_counter()
+    text = "".join(chunks)
+    start = start or end
+    first = first or end
+    tokens = tokens or max(1, len(text) // 2)  # 没有 usage 时按约 2 字符/token 估计
+    return {
+        "ttfb_ms": (first - start) * 1000,
+        "total_ms": (end - start) * 1000,
+        "tokens": tokens,
+        "tokens_per_s": tokens / max(end - first, 1e-3),
+        "valid": case["validate"](text),
+    }
+
+
+def summarize(runs: list[dict]) -> dict:
+    import statistics
+
+    ok = [r for r in runs if "error" not in r]
+    summary = {
+        "runs": len(runs),
+        "errors": len(runs) - len(ok),
+        "yield": round(sum(r["valid"] for r in ok) / len(runs), 3) if runs else 0.0,
+    }
+    for key in ("ttfb_ms", "total_ms", "tokens_per_s"):
+        summary[key] = round(statistics.median(r[key] for r in ok), 1) if ok else None
+    if len(ok) < len(runs):
+        summary["last_error"] = next(r["error"] for r in reversed(runs) if "error" in r)
+    return summary
+
+
+def choose(results: dict[str, dict[str, dict]]) -> dict[str, str]:
+    """每个任务：合格率 ≥ MIN_YIELD 的模型里 total_ms 中位数最小的（其次 tokens/s 最大）。"""
+    best = {}
+    tasks = {task for per_model in results.values() for task in per_model}
+    for task in sorted(tasks):
+        ranked = sorted(
+            (s["total_ms"], -(s["tokens_per_s"] or 0), model)
+            for model, per_model in results.items()
+            if (s := per_model.get(task)) and s["yield"] >= MIN_YIELD and s["total_ms"] is not None
+        )
+        if ranked:
+            best[task] = ranked[0][2]
+    return best
+
+
+def probe_models(backend, models: list[str], repeat: int = PROBE_REPEAT, workers: int = PROBE_WORKERS) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+
+    suite = probe_suite()
+    # 各模型轮流排队，避免第一个模型用掉令牌桶的突发额度、后面的模型都排在它之后
+    jobs = [(model, case) for _ in range(repeat) for case in suite for model in models]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(lambda job: run_probe(backend, *job), jobs))
+
+    runs: dict[str, dict[str, list[dict]]] = {}
+    for (model, case), outcome in zip(jobs, outcomes):
+        runs.setdefault(model, {}).setdefault(case["task"], []).append(outcome)
+    results = {model: {task: summarize(task_runs) for task, task_runs in per_model.items()}
+               for model, per_model in runs.items()}
+    return {"probed_at": time.time(), "models": models, "results": results, "best": choose(results)}
+
+
+# ============================================================
+#  缓存与选择
+# ============================================================
+
+def _backend_kind() -> str:
+    from genai_backend import use_fake_backend
+
+    return "fake" if use_fake_backend() else "gemini"
+
+
+def load_probe_cache() -> dict:
+    try:
+        return json.loads(PROBE_CACHE_FILE.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_probe(entry: dict):
+    cache = load_probe_cache()
+    cache[_backend_kind()] = entry
+    tmp = PROBE_CACHE_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(cache, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, PROBE_CACHE_FILE)
+
+
+def fresh_probe() -> dict | None:
+    entry = load_probe_cache().get(_backend_kind())
+    if entry and time.time() - entry.get("probed_at", 0) <= PROBE_TTL:
+        return entry
+    return None
+
+
+def pick_model(task: str, default: str) -> str:
+    """测速结果未过期且该任务有合格模型时返回最快的模型，否则返回 default。"""
+    entry = fresh_probe()
+    return (entry or {}).get("best", {}).get(task) or default
+
+
+# ============================================================
+#  命令行
+# ============================================================
+
+def print_results(entry: dict):
+    age = (time.time() - entry["probed_at"]) / 60
+    print(f"\n测速结果（{age:.0f} 分钟前，后端 {_backend_kind()}）")
+    print(f"{'模型':<28}{'任务':<8}{'TTFB ms':>9}{'总耗时 ms':>11}{'tok/s':>8}{'合格率':>8}{'错误':>6}")
+    for model, per_model in entry["results"].items():
+        for task, s in sorted(per_model.items()):
+            fmt = lambda v: "-" if v is None else f"{v:.0f}"  # noqa: E731
+            mark = " *" if entry["best"].get(task) == model else ""
+            print(f"{model:<28}{task:<8}{fmt(s['ttfb_ms']):>9}{fmt(s['total_ms']):>11}{fmt(s['tokens_per_s']):>8}"
+                  f"{s['yield']:>8.0%}{s['errors']:>6}{mark}")
+            if s.get("last_error"):
+                print(f"    [错误] {s['last_error']}")
+    for task, model in sorted(entry["best"].items()):
+        print(f"  {task}: {model}")
+    if not entry["best"]:
+        print(f"  没有合格率达到 {MIN_YIELD:.0%} 的模型，各脚本将使用默认模型")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测速候选模型，按任务选出最快且输出合格的模型")
+    parser.add_argument("--list", action="store_true", help="只列出账号可用的模型")
+    parser.add_argument("--refresh", action="store_true", help="忽略缓存，重新测速")
+    parser.add_argument("--models", default=None, help=f"逗号分隔的候选模型（默认 {','.join(DEFAULT_CANDIDATES)}）")
+    parser.add_argument("--repeat", type=int, default=PROBE_REPEAT, help="每个模型每条提示词的次数")
+    parser.add_argument("--workers", type=int, default=PROBE_WORKERS, help="并发请求数")
+    args = parser.parse_args()
+
+    if args.list:
+        list_models()
+        return
+
+    entry = None if args.refresh or args.models else fresh_probe()
+    if entry is None:
+        from genai_backend import get_backend, use_fake_backend
+
+        if use_fake_backend():
+            backend = get_backend()
+        else:
+            api_key = load_api_key()
+            if not api_key:
+                print("[错误] 请设置 GEMINI_API_KEY 环境变量，或在 scripts/api_key.txt 中填写")
+                sys.exit(1)
+            backend = get_backend(api_key)
+        models = args.models.split(",") if args.models else DEFAULT_CANDIDATES
+        available = available_models(backend)
+        if available is not None:
+            missing = [m for m in models if m not in available]
+            for m in missing:
+                print(f"  [跳过] {m}: 账号不可用")
+            models = [m for m in models if m in available]
+        if not models:
+            print("[错误] 没有可测速的模型")
+            sys.exit(1)
+        print(f"测速 {len(models)} 个模型 × {args.repeat} 次 ...")
+        entry = probe_models(backend, models, repeat=args.repeat, workers=args.workers)
+        save_probe(entry)
+    print_results(entry)
+
 
 if __name__ == "__main__":
-    list_models()
+    profiled_main(main)
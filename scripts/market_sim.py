@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+城市商店库存与价格的蒙特卡洛模拟（纯 NumPy，按城市规模批量抽样）。
+
+按 mapGenerator.ts 的 generateCityMarket 逐项复刻，数据来自 market_config.csv 与各装备表：
+    武器   数量 U[weaponsMin, weaponsMax]；先随机取不同的 weaponClass 各一把，
+           数量超过类别数时再从全部武器里补（排除 UNIQUE 与战旗）
+    护甲 / 头盔 / 盾牌   数量 U[min, max]，每件独立抽（可重复），排除 UNIQUE
+    每件装备先按城市的品质权重抽品质，再从池中取该品质的随机一件；
+           池里没有该品质时依次降级，都没有则从全池随机（pickByRarity）
+    食物 / 药品   从对应消耗品中不重复地取 U[min, max] 种；修理包按 repairChance 出现一个
+    买价 = floor(value × 1.5 × 城市价格系数)，价格系数每次刷新为 0.80~1.20（两位小数）
+    商店每 MARKET_REFRESH_DAYS 天刷新一次
+游戏里打乱顺序用的是 sort(() => 0.5 - Math.random())，这里按均匀打乱处理。
+
+报告每种城市规模：
+    - 每次刷新各类别的件数、实际品质分布、买价分位数与库存总值
+    - 每件物品的出现概率、平均件数与"找到它"的期望天数（几何分布：刷新间隔 / 出现概率）
+    - 在任何城市都不会出现的物品（如品质权重为 0、池里被同品质挤掉）
+生成新装备后用 --save / --against 对比前后的商店变化，几秒内就能看出内容改动的影响。
+
+用法:
+    python -m scripts market                          # 各城市规模汇总
+    python -m scripts market --items weapons          # 某类物品逐件的出现概率与找到天数
+    python -m scripts market --ids w_sword_5 a_cloth  # 指定物品
+    python -m scripts market --save before.json       # 保存结果
+    python -m scripts market --against before.json    # 与保存的结果对比
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from design_db import query
+from profiling import profiled_main, span
+
+DEFAULT_ROLLS = 200_000   # 每种城市规模的刷新次数
+MARKET_REFRESH_DAYS = 3   # App.tsx：商店每 3 天刷新
+BUY_MULT = 1.5            # CityView.tsx getBuyPrice
+PRICE_MOD_RANGE = (0.8, 1.2)
+BANNER_WEAPON_ID = "w_banner_warflag"
+
+RARITY_ORDER = ("COMMON", "UNCOMMON", "RARE", "EPIC", "LEGENDARY")
+RARITY_COLUMNS = ("rarityCommon", "rarityUncommon", "rarityRare", "rarityEpic", "rarityLegendary")
+
+# 类别 → (表, 数量列前缀)
+EQUIPMENT = {
+    "weapons": ("weapons", "weapons"),
+    "armors": ("armor", "armors"),
+    "helmets": ("helmets", "helmets"),
+    "shields": ("shields", "shields"),
+}
+CONSUMABLES = {"food": "FOOD", "med": "MEDICINE"}
+CATEGORIES = list(EQUIPMENT) + list(CONSUMABLES) + ["repair"]
+PERCENTILES = (10, 50, 90)
+CHANGE_THRESHOLD = 0.01  # --against 中出现概率变化小于 1 个百分点的物品不列出
+
+
+# ============================================================
+#  数据
+# ============================================================
+
+def load_items() -> list[dict]:
+    """全部可能上架的物品（带 category），下标即模拟中的物品编号。"""
+    items = []
+    for category, (table, _) in EQUIPMENT.items():
+        extra = ", weaponClass" if table == "weapons" else ""
+        for row in query(f"SELECT id, name, value, rarity{extra} FROM {table} ORDER BY _line"):
+            if row["rarity"] == "UNIQUE" or row["id"] == BANNER_WEAPON_ID:
+                continue
+            items.append({**row, "category": category})
+    consumables = query("SELECT id, name, value, subType FROM consumables ORDER BY _line")
+    for category, sub_type in list(CONSUMABLES.items()) + [("repair", "REPAIR_KIT")]:
+        items.extend({**row, "rarity": None, "category": category}
+                     for row in consumables if row["subType"] == sub_type)
+    return items
+
+
+def load_config() -> dict[str, dict]:
+    return {row["cityType"]: row for row in query("SELECT * FROM market_config ORDER BY _line")}
+
+
+# ============================================================
+#  抽样
+# ============================================================
+
+def rarity_candidates(pool: list[int], items: list[dict], rarity_index: int) -> list[int]:
+    """pickByRarity：该品质的物品；没有则依次降级；都没有则全池。"""
+    for r in range(rarity_index, -1, -1):
+        matched = [i for i in pool if items[i]["rarity"] == RARITY_ORDER[r]]
+        if matched:
+            return matched
+    return pool
+
+
+class PickTable:
+    """(池, 品质) → 候选物品的定长查找表，一次向量化取出所有槽位的物品。"""
+
+    def __init__(self, pools: list[list[int]], items: list[dict]):
+        groups = [rarity_candidates(pool, items, r) for pool in pools for r in range(len(RARITY_ORDER))]
+        width = max(1, max(len(g) for g in groups))
+        self.table = np.full((len(groups), width), -1, dtype=np.int32)
+        self.counts = np.array([len(g) for g in groups], dtype=np.int64)
+        for row, group in enumerate(groups):
+            self.table[row, :len(group)] = group
+
+    def pick(self, rng, pool: np.ndarray, rarity: np.ndarray) -> np.ndarray:
+        group = pool * len(RARITY_ORDER) + rarity
+        counts = self.counts[group]
+        column = (rng.random(group.shape) * counts).astype(np.int64)
+        return np.where(counts > 0, self.table[group, np.minimum(column, self.table.shape[1] - 1)], -1)
+
+
+def roll_rarity(rng, weights: list[float], shape) -> np.ndarray:
+    """rollRarity：按权重抽品质下标（权重为 0 的品质不会出现）。"""
+    cum = np.cumsum(np.asarray(weights, dtype=np.float64))
+    return np.searchsorted(cum, rng.random(shape) * cum[-1], side="left").clip(max=len(weights) - 1)
+
+
+def roll_counts(rng, low: int, high: int, n: int) -> np.ndarray:
+    return rng.integers(low, high + 1, n)
+
+
+def distinct(rng, n: int, population: int, counts: np.ndarray) -> np.ndarray:
+    """每行从 population 个中不重复地取 counts 个（打乱后取前几个），多余位置为 -1。"""
+    width = int(counts.max(initial=0))
+    if population == 0 or width == 0:
+        return np.full((n, 0), -1, dtype=np.int64)
+    order = np.argsort(rng.random((n, population)), axis=1)[:, :width]
+    return np.where(np.arange(order.shape[1]) < np.minimum(counts, population)[:, None], order, -1)
+
+
+def _slots(counts: np.ndarray, width: int) -> np.ndarray:
+    return np.arange(width) < counts[:, None]
+
+
+def simulate_city(rng, city_type: str, config: dict, items: list[dict], rolls: int) -> dict:
+    """rolls 次刷新，返回 {"market": (rolls, 槽位) 物品编号矩阵（-1 为空）, "price_mod": (rolls,)}。"""
+    weights = [config[col] or 0 for col in RARITY_COLUMNS]
+    by_category = {c: [i for i, it in enumerate(items) if it["category"] == c] for c in CATEGORIES}
+    weapons = by_category["weapons"]
+    classes = list(dict.fromkeys(items[i]["weaponClass"] for i in weapons if items[i].get("weaponClass")))
+    pools = [[i for i in weapons if items[i].get("weaponClass") == cls] for cls in classes]
+    pools += [by_category[c] for c in EQUIPMENT]  # 全部武器、护甲、头盔、盾牌
+    picker = PickTable(pools, items)
+    all_pool = {c: len(classes) + k for k, c in enumerate(EQUIPMENT)}
+    columns = []
+
+    # 武器：不同类别各一把，超出类别数的部分从全部武器补
+    count = roll_counts(rng, config["weaponsMin"], config["weaponsMax"], rolls)
+    chosen = distinct(rng, rolls, len(classes), count)
+    picked = picker.pick(rng, np.maximum(chosen, 0), roll_rarity(rng, weights, chosen.shape))
+    columns.append(np.where(chosen >= 0, picked, -1))
+    extra = np.maximum(count - len(classes), 0)
+    if extra.any():
+        width = int(extra.max())
+        picked = picker.pick(rng, np.full((rolls, width), all_pool["weapons"]), roll_rarity(rng, weights, (rolls, width)))
+        columns.append(np.where(_slots(extra, width), picked, -1))
+
+    for category, (_, prefix) in EQUIPMENT.items():
+        if category == "weapons":
+            continue
+        count = roll_counts(rng, config[f"{prefix}Min"], config[f"{prefix}Max"], rolls)
+        width = int(count.max(initial=0))
+        picked = picker.pick(rng, np.full((rolls, width), all_pool[category]), roll_rarity(rng, weights, (rolls, width)))
+        columns.append(np.where(_slots(count, width), picked, -1))
+
+    for category in CONSUMABLES:
+        pool = np.array(by_category[category] + [-1], dtype=np.int64)
+        count = roll_counts(rng, config[f"{category}Min"], config[f"{category}Max"], rolls)
+        chosen = distinct(rng, rolls, len(pool) - 1, count)
+        columns.append(pool[chosen])  # -1 → 末尾的 -1
+
+    repair = np.array(by_category["repair"], dtype=np.int64)
+    if len(repair):
+        has = rng.random(rolls) < config["repairChance"]
+        columns.append(np.where(has, repair[rng.integers(0, len(repair), rolls)], -1)[:, None])
+
+    low, high = PRICE_MOD_RANGE
+    price_mod = np.round(low + rng.random(rolls) * (high - low), 2)
+    return {"market": np.hstack(columns).astype(np.int32), "price_mod": price_mod}
+
+
+# ============================================================
+#  统计
+# ============================================================
+
+def _percentiles(values: np.ndarray) -> list[int]:
+    return [int(v) for v in np.percentile(values, PERCENTILES)] if values.size else [0] * len(PERCENTILES)
+
+
+def summarize(items: list[dict], market: np.ndarray, price_mod: np.ndarray) -> dict:
+    rolls = len(market)
+    n_items = len(items)
+    filled = market >= 0
+    copies = np.bincount(market[filled], minlength=n_items)
+
+    # 出现概率：每次刷新里同一物品只算一次（行内排序后去掉相邻重复）
+    ordered = np.sort(market, axis=1)
+    first = (ordered >= 0) & np.concatenate([np.ones((rolls, 1), bool), ordered[:, 1:] != ordered[:, :-1]], axis=1)
+    present = np.bincount(ordered[first], minlength=n_items)
+
+    values = np.array([it["value"] or 0 for it in items], dtype=np.float64)
+    category = np.array([CATEGORIES.index(it["category"]) for it in items])
+    rarity = np.array([RARITY_ORDER.index(it["rarity"]) if it["rarity"] in RARITY_ORDER else -1 for it in items])
+    # 只处理有货的槽位：物品编号、所在刷新、买价
+    row, _ = np.nonzero(filled)
+    offered = market[filled]
+    prices = np.floor(values[offered] * BUY_MULT * price_mod[row] + 1e-9)
+    offered_category = category[offered]
+
+    categories = {}
+    for c, name in enumerate(CATEGORIES):
+        in_cat = offered_category == c
+        counts = np.bincount(rarity[offered[in_cat]] + 1, minlength=len(RARITY_ORDER) + 1)[1:]
+        categories[name] = {
+            "per_market": round(float(in_cat.sum()) / rolls, 3),
+            "rarity": [round(float(n) / max(int(in_cat.sum()), 1), 3) for n in counts],
+            "buy_price": _percentiles(prices[in_cat]),
+        }
+    stock_value = np.bincount(row, weights=prices, minlength=rolls)
+    return {
+        "rolls": rolls,
+        "categories": categories,
+        "stock_value": _percentiles(stock_value),
+        "items": {
+            it["id"]: {"offer": round(float(present[i]) / rolls, 5), "copies": round(float(copies[i]) / rolls, 5)}
+            for i, it in enumerate(items)
+        },
+    }
+
+
+def days_to_find(offer: float) -> float | None:
+    """每次刷新以概率 offer 出现时，首次见到它的期望天数（几何分布）。"""
+    return MARKET_REFRESH_DAYS / offer if offer > 0 else None
+
+
+def buy_price_range(value: float) -> list[int]:
+    low, high = PRICE_MOD_RANGE
+    return [int(np.floor(value * BUY_MULT * m + 1e-9)) for m in (low, high)]
+
+
+def run(rolls: int = DEFAULT_ROLLS, seed: int | None = None) -> dict:
+    rng = np.random.default_rng(seed)
+    items = load_items()
+    results = {}
+    for city_type, config in load_config().items():
+        with span("simulate", city=city_type, rolls=rolls):
+            sim = simulate_city(rng, city_type, config, items, rolls)
+            results[city_type] = summarize(items, sim["market"], sim["price_mod"])
+    return {"items": {it["id"]: {k: it[k] for k in ("name", "category", "rarity", "value")} for it in items},
+            "cities": results}
+
+
+# ============================================================
+#  报告
+# ============================================================
+
+def _fmt_days(offer: float) -> str:
+    days = days_to_find(offer)
+    return "—" if days is None else f"{days:.0f}" if days < 1000 else ">999"
+
+
+def print_summary(result: dict):
+    for city_type, city in result["cities"].items():
+        rarity_head = "/".join(r[0] for r in RARITY_ORDER)
+        pct = "/".join(f"p{p}" for p in PERCENTILES)
+        print(f"\n== {city_type}（{city['rolls']} 次刷新）==")
+        print(f"  {'类别':<9}{'件数':>6}  {'品质 ' + rarity_head + ' %':<26}买价 {pct}")
+        for name, cat in city["categories"].items():
+            if not cat["per_market"]:
+                continue
+            share = "/".join(f"{v * 100:.0f}" for v in cat["rarity"]) if name in EQUIPMENT else ""
+            print(f"  {name:<10}{cat['per_market']:>6.2f}  {share:<28}{'/'.join(map(str, cat['buy_price']))}")
+        print(f"  库存总价 {pct}: {'/'.join(map(str, city['stock_value']))}")
+
+    never = [item_id for item_id in result["items"]
+             if all(city["items"][item_id]["offer"] == 0 for city in result["cities"].values())]
+    if never:
+        print(f"\n  [警告] {len(never)} 件物品在任何城市都不会出现: {', '.join(never)}")
+
+
+def print_items(result: dict, ids: list[str]):
+    cities = list(result["cities"])
+    head = "".join(f"{c + ' 概率%':>14}{'天':>6}" for c in cities)
+    print(f"\n{'物品':<22}{'品质':<10}{'价值':>6}{'买价':>14}{head}")
+    for item_id in ids:
+        info = result["items"][item_id]
+        price = "~".join(map(str, buy_price_range(info["value"] or 0)))
+        cols = "".join(f"{result['cities'][c]['items'][item_id]['offer'] * 100:>14.2f}"
+                       f"{_fmt_days(result['cities'][c]['items'][item_id]['offer']):>6}" for c in cities)
+        print(f"{item_id:<22}{info['rarity'] or '-':<10}{info['value'] or 0:>6}{price:>14}{cols}")
+
+
+def print_diff(before: dict, after: dict):
+    """与保存的结果对比：类别件数、库存总价与出现概率变化明显的物品。"""
+    print("\n对比保存的结果:")
+    for city_type, city in after["cities"].items():
+        old = before["cities"].get(city_type)
+        if old is None:
+            print(f"  {city_type}: 新增城市规模")
+            continue
+        print(f"  {city_type}: 库存总价中位数 {old['stock_value'][1]} → {city['stock_value'][1]}")
+        for item_id, stats in city["items"].items():
+            prev = old["items"].get(item_id, {"offer": 0.0})["offer"]
+            if abs(stats["offer"] - prev) >= CHANGE_THRESHOLD:
+                tag = "（新物品）" if item_id not in old["items"] else ""
+                print(f"    {item_id:<22} {prev * 100:6.2f}% → {stats['offer'] * 100:6.2f}%  "
+                      f"找到 {_fmt_days(prev)} → {_fmt_days(stats['offer'])} 天{tag}")
+        for item_id in old["items"]:
+            if item_id not in city["items"] and old["items"][item_id]["offer"] > 0:
+                print(f"    {item_id:<22} 已移除")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="城市商店库存与价格蒙特卡洛模拟")
+    parser.add_argument("-n", "--rolls", type=int, default=DEFAULT_ROLLS, help="每种城市规模的刷新次数")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子（结果可复现）")
+    parser.add_argument("--items", nargs="?", const="all", choices=["all"] + CATEGORIES,
+                        help="逐件列出某类物品（默认全部）")
+    parser.add_argument("--ids", nargs="*", default=[], help="逐件列出指定物品")
+    parser.add_argument("--save", type=Path, help="把结果保存为 JSON")
+    parser.add_argument("--against", type=Path, help="与 --save 保存的结果对比")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = run(args.rolls, args.seed)
+    elapsed = time.perf_counter() - start
+
+    unknown = [i for i in args.ids if i not in result["items"]]
+    if unknown:
+        print(f"[错误] 不会上架或不存在的物品: {', '.join(unknown)}")
+        sys.exit(1)
+    print_summary(result)
+    ids = list(args.ids)
+    if args.items:
+        ids += [i for i, info in result["items"].items() if args.items in ("all", info["category"]) and i not in ids]
+    if ids:
+        print_items(result, ids)
+    if args.against:
+        if not args.against.exists():
+            print(f"[错误] 找不到 {args.against}")
+            sys.exit(1)
+        print_diff(json.loads(args.against.read_text(encoding="utf-8")), result)
+    if args.save:
+        args.save.write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+        print(f"\n  [写入] {args.save}")
+    print(f"\n{len(result['cities'])} 种城市规模 × {args.rolls} 次刷新，用时 {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    profiled_main(main)
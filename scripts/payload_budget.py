@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+冷启动下载量/解析量预算报告。
+
+统计游戏冷启动实际要下载和解析的内容，并与预算比较：
+    - constants.ts 以 ?raw 导入的 csv/ 表：打包进 JS，启动时全部解析。
+      记录字节数、gzip 后字节数，以及每张表的行数/单元格数（解析开销的估计）
+    - public/ 下的资源：按类别（字体/图片/图标/图集/音频/其他）统计，
+      并按 asset_manifest.FIRST_SCREEN 分成首屏与延后加载两部分（只用于构建的文件按 asset_manifest.EXCLUDE 排除）
+
+预算在 scripts/payload_budget.json 中配置（指标名 → 上限）。
+--record 把本次结果按提交写入 scripts/payload_history.jsonl（同一提交覆盖旧记录；被测量的
+constants.ts、csv/、public/ 有未提交改动时拒绝记录，保证每条记录都能由对应提交复现）；
+每次运行都会与上一个不同提交的记录比较，增长超过 growth_warn_pct 的指标给出警告，
+这样批量生成内容（新增 20 个事件、新图标等）带来的增长能在发布前被发现。
+
+用法:
+    python -m scripts budget                 # 报告 + 与上次记录比较
+    python -m scripts budget --record        # 同时写入历史
+    python -m scripts budget --check         # 超出预算时以非零状态退出（用于 CI）
+    python -m scripts budget --tables        # 列出每张表的解析开销
+"""
+
+import argparse
+import fnmatch
+import gzip
+import json
+import re
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from asset_manifest import FIRST_SCREEN, PUBLIC_DIR, list_assets
+from common import ROOT, SCRIPTS_DIR
+from csv_tools import read_table
+from profiling import profiled_main, span
+
+CONSTANTS_TS = ROOT / "constants.ts"
+BUDGET_FILE = SCRIPTS_DIR / "payload_budget.json"
+HISTORY_FILE = SCRIPTS_DIR / "payload_history.jsonl"
+GZIP_LEVEL = 6  # 与常见静态服务器的默认压缩级别一致
+
+CSV_IMPORT_RE = re.compile(r"""^import\s+\w+\s+from\s+['"]\./csv/([^'"?]+)\.csv\?raw['"]""", re.M)
+
+# 首屏（主菜单）就会请求的资源（与预缓存共用 asset_manifest.FIRST_SCREEN）；其余按需加载
+FIRST_SCREEN_PATTERNS = [pattern for group in FIRST_SCREEN for pattern in group]
+
+# public/ 下的顶层目录 → 类别
+CATEGORIES = {
+    "fonts": "fonts",
+    "images": "images",
+    "icons": "icons",
+    "assets": "atlas",
+    "audio": "audio",
+}
+
+
+def _rel(path: Path, base: Path) -> str:
+    return path.relative_to(base).as_posix()
+
+
+def csv_imports(constants: Path = CONSTANTS_TS) -> list[str]:
+    """constants.ts 里以 ?raw 导入的表名（按导入顺序）。"""
+    return CSV_IMPORT_RE.findall(constants.read_text(encoding="utf-8"))
+
+
+def category_of(logical: str) -> str:
+    top = logical.split("/", 1)[0] if "/" in logical else ""
+    return CATEGORIES.get(top, "other")
+
+
+def is_first_screen(logical: str) -> bool:
+    return any(fnmatch.fnmatch(logical, pat) for pat in FIRST_SCREEN_PATTERNS)
+
+
+# ============================================================
+#  测量
+# ============================================================
+
+def measure_tables(names: list[str]) -> list[dict]:
+    tables = []
+    for name in names:
+        path = ROOT / "csv" / f"{name}.csv"
+        if not path.exists():
+            print(f"  [警告] constants.ts 导入的 {name}.csv 不存在")
+            continue
+        header, rows = read_table(name)
+        data = path.read_bytes()
+        tables.append({
+            "name": name,
+            "rows": len(rows),
+            "columns": len(header),
+            "cells": sum(min(len(r), len(header)) for r in rows),
+            "bytes": len(data),
+            "gzip_bytes": len(gzip.compress(data, GZIP_LEVEL, mtime=0)),
+        })
+    return tables
+
+
+def measure_assets(public: Path = PUBLIC_DIR) -> list[dict]:
+    assets = []
+    for path in list_assets(public):
+        logical = _rel(path, public)
+        assets.append({
+            "file": logical,
+            "category": category_of(logical),
+            "first_screen": is_first_screen(logical),
+            "bytes": path.stat().st_size,
+        })
+    return assets
+
+
+def collect_metrics(tables: list[dict], assets: list[dict]) -> dict[str, int]:
+    """扁平的指标表：预算与历史记录都以这些名字为键。"""
+    metrics = {
+        "csv.tables": len(tables),
+        "csv.rows": sum(t["rows"] for t in tables),
+        "csv.cells": sum(t["cells"] for t in tables),
+        "csv.bytes": sum(t["bytes"] for t in tables),
+        "csv.gzip_bytes": sum(t["gzip_bytes"] for t in tables),
+    }
+    for stage in ("first", "deferred"):
+        for category in sorted(set(CATEGORIES.values()) | {"other"}):
+            metrics[f"{stage}.{category}_bytes"] = sum(
+                a["bytes"] for a in assets
+                if a["category"] == category and a["first_screen"] == (stage == "first"))
+    # 首屏合计：csv 以 gzip 后的体积随 JS 下载
+    metrics["first_screen_bytes"] = metrics["csv.gzip_bytes"] + sum(a["bytes"] for a in assets if a["first_screen"])
+    metrics["deferred_bytes"] = sum(a["bytes"] for a in assets if not a["first_screen"])
+    return metrics
+
+
+# ============================================================
+#  预算与历史
+# ============================================================
+
+def load_budget(path: Path = BUDGET_FILE) -> dict:
+    if not path.exists():
+        return {"limits": {}, "growth_warn_pct": None}
+    config = json.loads(path.read_text(encoding="utf-8"))
+    return {"limits": config.get("limits", {}), "growth_warn_pct": config.get("growth_warn_pct")}
+
+
+def check_budget(metrics: dict, limits: dict) -> list[str]:
+    problems = []
+    for name, limit in limits.items():
+        if name not in metrics:
+            problems.append(f"预算里的指标 {name} 不存在")
+        elif metrics[name] > limit:
+            problems.append(f"{name}: {_fmt(name, metrics[name])} 超出预算 {_fmt(name, limit)}")
+    return problems
+
+
+# 被测量的输入；这些路径下的改动（含未跟踪、被忽略的文件）都会让结果与提交不一致
+MEASURED_PATHS = ["constants.ts", "csv", "public"]
+
+
+def git_revision() -> tuple[str | None, bool]:
+    """(当前提交的短哈希, 被测量的输入是否有未提交改动)；不在 git 仓库中时返回 (None, False)。"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=all", "--ignored", "--",
+                                 *MEASURED_PATHS], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+
+def load_history(path: Path = HISTORY_FILE) -> list[dict]:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def record_history(entry: dict, path: Path = HISTORY_FILE):
+    history = [h for h in load_history(path) if h.get("commit") != entry["commit"]]
+    history.append(entry)
+    path.write_text("".join(json.dumps(h, ensure_ascii=False, sort_keys=True) + "\n" for h in history),
+                    encoding="utf-8")
+
+
+def previous_entry(history: list[dict], commit: str | None) -> dict | None:
+    for entry in reversed(history):
+        if entry.get("commit") != commit:
+            return entry
+    return None
+
+
+def _fmt(name: str, value: int) -> str:
+    if not name.endswith("bytes"):
+        return f"{value}"
+    return f"{value / 1024:.1f} KB" if abs(value) < 1024 * 1024 else f"{value / 1024 / 1024:.2f} MB"
+
+
+# ============================================================
+#  报告
+# ============================================================
+
+def print_tables(tables: list[dict]):
+    print(f"\n{'表':<28}{'行':>6}{'列':>5}{'单元格':>8}{'字节':>9}{'gzip':>8}")
+    for t in sorted(tables, key=lambda t: -t["cells"]):
+        print(f"{t['name']:<28}{t['rows']:>6}{t['columns']:>5}{t['cells']:>8}{t['bytes']:>9}{t['gzip_bytes']:>8}")
+
+
+def print_report(metrics: dict, limits: dict, previous: dict | None, growth_warn_pct: float | None) -> list[str]:
+    """打印各指标（预算、与上次记录的差值）；返回增长过快的警告。"""
+    warnings = []
+    base = previous["metrics"] if previous else {}
+    label = f"较 {previous['commit']}" if previous else ""
+    print(f"\n{'指标':<26}{'当前':>12}{'预算':>12}{label:>16}")
+    for name, value in metrics.items():
+        if value == 0 and not base.get(name):
+            continue
+        limit = _fmt(name, limits[name]) if name in limits else ""
+        delta = ""
+        if name in base and base[name] != value:
+            diff = value - base[name]
+            if base[name]:
+                pct = diff / base[name] * 100
+                delta = f"{'+' if diff > 0 else '-'}{_fmt(name, abs(diff))} ({pct:+.1f}%)"
+            else:
+                pct = float("inf")
+                delta = f"+{_fmt(name, diff)} (新增)"
+            if growth_warn_pct is not None and pct > growth_warn_pct:
+                warnings.append(f"{name} 较 {previous['commit']} 增长 {delta}（{_fmt(name, base[name])} → "
+                                f"{_fmt(name, value)}）")
+        flag = " !" if name in limits and value > limits[name] else ""
+        print(f"{name:<26}{_fmt(name, value):>12}{limit:>12}{delta:>16}{flag}")
+    return warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动下载量/解析量预算报告")
+    parser.add_argument("--record", action="store_true", help=f"把结果写入 {HISTORY_FILE.name}（按提交）")
+    parser.add_argument("--check", action="store_true", help="超出预算时以非零状态退出")
+    parser.add_argument("--tables", action="store_true", help="列出每张表的行数/单元格数")
+    parser.add_argument("--budget", type=Path, default=BUDGET_FILE, help="预算文件（默认 scripts/payload_budget.json）")
+    args = parser.parse_args()
+
+    if not CONSTANTS_TS.exists() or not PUBLIC_DIR.is_dir():
+        print(f"[错误] 找不到 {CONSTANTS_TS} 或 {PUBLIC_DIR}")
+        sys.exit(1)
+    with span("tables"):
+        tables = measure_tables(csv_imports())
+    with span("assets"):
+        assets = measure_assets()
+    metrics = collect_metrics(tables, assets)
+    budget = load_budget(args.budget)
+    commit, dirty = git_revision()
+    previous = previous_entry(load_history(), commit)
+
+    if args.tables:
+        print_tables(tables)
+    warnings = print_report(metrics, budget["limits"], previous, budget["growth_warn_pct"])
+    problems = check_budget(metrics, budget["limits"])
+    for warning in warnings:
+        print(f"  [警告] {warning}")
+    for problem in problems:
+        print(f"  [错误] {problem}")
+
+    if args.record:
+        if commit is None:
+            print("[错误] 不在 git 仓库中，无法按提交记录")
+            sys.exit(1)
+        if dirty:
+            print(f"[错误] {'、'.join(MEASURED_PATHS)} 有未提交改动，结果无法由 {commit} 复现；提交后再记录")
+            sys.exit(1)
+        record_history({"commit": commit, "date": datetime.now().isoformat(timespec="seconds"),
+                        "metrics": metrics})
+        print(f"  [写入] {HISTORY_FILE.name}: {commit}")
+    if problems and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    profiled_main(main)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+视觉模型上传用的预览代理图。
+
+图像理解类调用（布局分析等）只需要看清构图，返回的坐标又是 0-1000 归一化的，
+没必要上传原图。这里把源图等比缩到长边 PREVIEW_LONG_EDGE（不放大），编码成 JPEG/WebP，
+按源文件哈希 + 参数缓存在 scripts/.cache/preview/，同一张图只缩放编码一次。
+
+等比缩放不改变归一化坐标的含义，所以调用方拿到的 bounding_box 可以直接用于原图。
+
+长边可通过环境变量 GEMINI_PREVIEW_EDGE 调整（默认 768）。
+"""
+
+import os
+from pathlib import Path
+
+from buildgraph import file_digest
+from common import cache_path
+from encoder import encode, write_atomic
+from profiling import span
+
+PREVIEW_DIR = cache_path("preview")
+PREVIEW_LONG_EDGE = int(os.environ.get("GEMINI_PREVIEW_EDGE", "768"))
+PREVIEW_QUALITY = 82
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+SUFFIXES = {"JPEG": ".jpg", "WEBP": ".webp"}
+
+
+def preview_path(source: Path, long_edge: int = PREVIEW_LONG_EDGE, fmt: str = "JPEG",
+                 quality: int = PREVIEW_QUALITY) -> Path:
+    """确保预览图存在并返回其路径（缓存命中时不解码源图）。"""
+    digest = file_digest(source)
+    if digest is None:
+        raise FileNotFoundError(source)
+    out = PREVIEW_DIR / f"{digest[:24]}_{long_edge}_q{quality}{SUFFIXES[fmt]}"
+    if out.exists():
+        return out
+
+    from PIL import Image
+
+    with span("decode", file=source.name):
+        with Image.open(source) as img:
+            img.draft("RGB", (long_edge, long_edge))  # JPEG 源图直接按 1/2^n 解码
+            img = img.convert("RGB")
+    with span("resize", file=source.name):
+        img.thumbnail((long_edge, long_edge), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    with span("encode", file=out.name):
+        data = encode(img, fmt, quality=quality, optimize=fmt == "JPEG")
+    return write_atomic(out, data)
+
+
+def preview_bytes(source: Path, long_edge: int = PREVIEW_LONG_EDGE, fmt: str = "JPEG",
+                  quality: int = PREVIEW_QUALITY) -> tuple[bytes, str]:
+    """返回 (预览图字节, mime_type)，供 types.Part.from_bytes 使用。"""
+    path = preview_path(source, long_edge, fmt, quality)
+    return path.read_bytes(), MIME_TYPES[fmt]
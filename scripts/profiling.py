@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+脚本通用的性能剖析钩子。
+
+所有脚本都支持 --profile：
+    python scripts/generate_images.py --profile
+    python -m scripts compose --profile
+
+开启后整个运行包在 cProfile + tracemalloc 里，结束时在 scripts/.cache/profile/<脚本>-<时间>/ 下输出：
+    profile.pstats     cProfile 原始数据（可用 snakeviz / pstats 查看）
+    stacks.folded      采样得到的折叠调用栈，可直接喂给 flamegraph.pl / speedscope
+    alloc_top.txt      tracemalloc 内存分配 Top-N（按代码行）
+    trace.json         命名阶段的 Chrome Trace（chrome://tracing 或 Perfetto 打开）
+
+代码中用 span() 标注流水线阶段（prompt 构建、API 调用、校验、写入、解码、缩放、编码）：
+    with span("decode", file=path.name):
+        img = Image.open(path)
+未开启 --profile 时 span() 只是一个空的上下文管理器，开销可以忽略。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from common import CACHE_DIR
+
+PROFILE_FLAG = "--profile"
+SAMPLE_INTERVAL = 0.001  # 折叠栈采样间隔（秒）
+TOP_N = 25
+
+_events: list[dict] | None = None  # None 表示未开启
+_events_lock = threading.Lock()
+_t0 = time.perf_counter()
+
+
+@contextmanager
+def span(name: str, /, **args):
+    """记录一个命名阶段（Chrome Trace 的 complete event）。"""
+    if _events is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - _t0) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = {k: str(v) for k, v in args.items()}
+        with _events_lock:
+            _events.append(event)
+
+
+class _StackSampler(threading.Thread):
+    """定时采样所有线程的调用栈，累计成 flamegraph 的折叠格式（栈底为线程名）。"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            names_by_id = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                names.append(names_by_id.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(names))] += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def run_profiled(func, label: str):
+    """在 cProfile + tracemalloc + 栈采样下运行 func()，结束后写出报告。"""
+    global _events
+    import cProfile
+    import tracemalloc
+
+    out_dir = CACHE_DIR / "profile" / f"{label}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    _events = []
+    sampler = _StackSampler()
+    profiler = cProfile.Profile()
+    tracemalloc.start(25)
+    sampler.start()
+    profiler.enable()
+    try:
+        with span(label):
+            return func()
+    finally:
+        profiler.disable()
+        sampler.stopped.set()
+        sampler.join()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        profiler.dump_stats(out_dir / "profile.pstats")
+        sampler.write(out_dir / "stacks.folded")
+        with open(out_dir / "alloc_top.txt", "w", encoding="utf-8") as f:
+            f.write(f"峰值已跟踪内存: {peak / 1024 / 1024:.1f} MB\n\n")
+            for stat in snapshot.statistics("lineno")[:TOP_N]:
+                f.write(f"{stat.size / 1024:10.1f} KB  {stat.count:8d} 次  {stat.traceback[0]}\n")
+        with _events_lock:
+            trace = {"traceEvents": list(_events), "displayTimeUnit": "ms"}
+        (out_dir / "trace.json").write_text(json.dumps(trace), encoding="utf-8")
+        _events = None
+
+        import pstats
+
+        print(f"\n[profile] 报告已写入 {out_dir}")
+        pstats.Stats(str(out_dir / "profile.pstats")).sort_stats("cumulative").print_stats(15)
+
+
+def profiled_main(main, label: str | None = None):
+    """脚本入口包装：命令行带 --profile 时剖析运行，否则直接调用 main()。"""
+    if PROFILE_FLAG not in sys.argv:
+        return main()
+    sys.argv = [a for a in sys.argv if a != PROFILE_FLAG]
+    label = label or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    return run_profiled(main, label)
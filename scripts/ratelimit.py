@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+跨进程共享的 Gemini 调用限流器。
+
+generate_csv.py / generate_images.py / smart_compose.py 共用同一个 Gemini 配额，
+同时运行时互相并不知道对方的存在。这里把令牌桶状态放进 scripts/.cache 下一个
+加文件锁的小 JSON 里，所有进程共享同一份预算：
+
+- 令牌桶：按 GEMINI_RPM（每分钟请求数）匀速补充令牌，桶容量 GEMINI_BURST
+- AIMD 并发窗口：调用成功时窗口 +1/窗口（加性增），遇到 429/503 时窗口减半、
+  清空令牌并按服务端给出的 retryDelay 冷却（乘性减），然后自动重试
+
+用法:
+    from ratelimit import gemini_limiter
+    response = gemini_limiter().call(client.models.generate_content, model=..., contents=...)
+    for chunk in gemini_limiter().stream(client.models.generate_content_stream, model=..., contents=...): ...
+
+环境变量:
+    GEMINI_RPM              每分钟请求上限（默认 10）
+    GEMINI_BURST            令牌桶容量（默认 min(RPM, 5)）
+    GEMINI_MAX_CONCURRENCY  并发窗口上限（默认 4）
+    GEMINI_MAX_RETRIES      限流时的最大重试次数（默认 6）
+    非法值（非数字，RPM/BURST/并发 ≤ 0，重试次数 < 0）打印警告后使用默认值。
+"""
+
+import json
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from common import cache_path
+
+# 视为"配额/过载"的 HTTP 状态码与错误关键字
+THROTTLE_CODES = {429, 503}
+THROTTLE_MARKERS = ("429", "503", "RESOURCE_EXHAUSTED", "UNAVAILABLE", "overloaded")
+
+# 租约超时：进程崩溃时，占用的并发名额在此时间后自动回收
+LEASE_TIMEOUT = 600.0
+
+
+def is_throttled(exc: Exception) -> bool:
+    """判断异常是否为 429/503 之类的限流/过载错误。"""
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if code in THROTTLE_CODES:
+        return True
+    text = str(exc)
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+def retry_after(exc: Exception) -> float | None:
+    """从错误信息里解析服务端建议的等待时间（RetryInfo.retryDelay，如 '12s'）。"""
+    match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(exc))
+    return float(match.group(1)) if match else None
+
+
+@contextmanager
+def _file_lock(lock_path: Path):
+    """跨进程互斥锁（POSIX 用 flock，Windows 用 msvcrt.locking）。"""
+    with open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SharedLimiter:
+    """文件共享的令牌桶 + AIMD 并发窗口。"""
+
+    def __init__(
+        self,
+        name: str,
+        rpm: float,
+        burst: float,
+        max_concurrency: int,
+        max_retries: int = 6,
+    ):
+        if rpm <= 0:
+            raise ValueError(f"rpm 必须为正数: {rpm}")
+        self.name = name
+        self.rate = rpm / 60.0
+        self.burst = max(1.0, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.state_path = cache_path(f"ratelimit_{name}.json")
+        self.lock_path = cache_path(f"ratelimit_{name}.lock")
+
+    # ---------------- 状态读写（必须在锁内调用） ----------------
+
+    def _load(self, now: float) -> dict:
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            state = {}
+        state.setdefault("tokens", self.burst)
+        state.setdefault("updated", now)
+        state.setdefault("cwnd", min(2.0, float(self.max_concurrency)))
+        state.setdefault("leases", {})
+        state.setdefault("cooldown_until", 0.0)
+        # 补充令牌
+        elapsed = max(0.0, now - state["updated"])
+        state["tokens"] = min(self.burst, state["tokens"] + elapsed * self.rate)
+        state["updated"] = now
+        # 回收过期租约（进程被杀死时留下的）
+        state["leases"] = {k: v for k, v in state["leases"].items() if v > now}
+        return state
+
+    def _save(self, state: dict):
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    # ---------------- 申请/归还 ----------------
+
+    def acquire(self) -> str:
+        """阻塞直到拿到一个令牌和一个并发名额，返回租约 ID。"""
+        lease_id = uuid.uuid4().hex
+        while True:
+            now = time.time()
+            with _file_lock(self.lock_path):
+                state = self._load(now)
+                window = max(1, int(state["cwnd"]))
+                if (
+                    now >= state["cooldown_until"]
+                    and state["tokens"] >= 1.0
+                    and len(state["leases"]) < window
+                ):
+                    state["tokens"] -= 1.0
+                    state["leases"][lease_id] = now + LEASE_TIMEOUT
+                    self._save(state)
+                    return lease_id
+                self._save(state)
+                if now < state["cooldown_until"]:
+                    wait = state["cooldown_until"] - now
+                elif state["tokens"] < 1.0:
+                    wait = (1.0 - state["tokens"]) / self.rate
+                else:
+                    wait = 0.25  # 等待其他进程归还并发名额
+            # 加一点抖动，避免多个进程同时醒来抢锁
+            time.sleep(min(wait, 5.0) + random.uniform(0, 0.1))
+
+    def release(self, lease_id: str, outcome: str = "ok", delay: float | None = None):
+        """
+        归还租约并调整并发窗口。
+        outcome: "ok"（加性增）| "throttled"（乘性减 + 冷却）| "error"（不调整）
+        """
+        now = time.time()
+        with _file_lock(self.lock_path):
+            state = self._load(now)
+            state["leases"].pop(lease_id, None)
+            if outcome == "ok":
+                state["cwnd"] = min(float(self.max_concurrency), state["cwnd"] + 1.0 / state["cwnd"])
+            elif outcome == "throttled":
+                state["cwnd"] = max(1.0, state["cwnd"] / 2.0)
+                state["tokens"] = 0.0
+                state["cooldown_until"] = max(state["cooldown_until"], now + (delay or 0.0))
+            self._save(state)
+
+    def _retry_delay(self, exc: Exception, attempt: int, backoff: float) -> float:
+        delay = retry_after(exc) or backoff * random.uniform(0.8, 1.2)
+        print(f"  [限流] 配额/过载 ({exc.__class__.__name__})，{delay:.1f}s 后重试 "
+              f"({attempt + 1}/{self.max_retries})")
+        return delay
+
+    def call(self, fn, *args, **kwargs):
+        """在限流器保护下调用 fn；遇到 429/503 时退避并重试，其他异常原样抛出。"""
+        backoff = 2.0
+        for attempt in range(self.max_retries + 1):
+            lease_id = self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if is_throttled(e) and attempt < self.max_retries:
+                    delay = self._retry_delay(e, attempt, backoff)
+                    backoff = min(backoff * 2, 60.0)
+                    self.release(lease_id, "throttled", delay)
+                    continue
+                self.release(lease_id, "error")
+                raise
+            self.release(lease_id, "ok")
+            return result
+
+    def stream(self, fn, *args, on_start=None, **kwargs):
+        """
+        流式版 call：fn 返回惰性迭代器，租约一直持有到迭代结束（请求在迭代时才真正发出）。
+        还没收到任何 chunk 时遇到 429/503 会退避重试；已产出部分内容后出错则原样抛出。
+        on_start 在拿到租约、发出请求前调用（每次重试都会调用），调用方可以从这里开始计时。
+        """
+        backoff = 2.0
+        for attempt in range(self.max_retries + 1):
+            lease_id = self.acquire()
+            outcome, delay, received = "error", None, False
+            try:
+                if on_start is not None:
+                    on_start()
+                for chunk in fn(*args, **kwargs):
+                    received = True
+                    yield chunk
+                outcome = "ok"
+                return
+            except Exception as e:
+                if received or not is_throttled(e) or attempt >= self.max_retries:
+                    raise
+                outcome, delay = "throttled", self._retry_delay(e, attempt, backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                self.release(lease_id, outcome, delay)
+
+
+_LIMITERS: dict[str, SharedLimiter] = {}
+
+
+def _env_number(key: str, default, minimum, kind=float):
+    """读取数值环境变量；非数字或小于 minimum 时警告并回退到 default。"""
+    raw = os.environ.get(key)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = kind(raw)
+    except ValueError:
+        value = None
+    if value is None or value != value or value < minimum:  # value != value: NaN
+        print(f"  [警告] {key}={raw} 无效（应为 ≥ {minimum} 的数字），使用默认值 {default}")
+        return default
+    return value
+
+
+def gemini_limiter(name: str = "gemini") -> SharedLimiter:
+    """返回进程内单例的共享限流器（参数来自环境变量）。"""
+    if name not in _LIMITERS:
+        # RPM/BURST 为 0 会让令牌永远补不满（补充速率为 0，等待时间除零）
+        rpm = _env_number("GEMINI_RPM", 10.0, 1e-3)
+        _LIMITERS[name] = SharedLimiter(
+            name,
+            rpm=rpm,
+            burst=_env_number("GEMINI_BURST", min(rpm, 5.0), 1.0),
+            max_concurrency=_env_number("GEMINI_MAX_CONCURRENCY", 4, 1, int),
+            max_retries=_env_number("GEMINI_MAX_RETRIES", 6, 0, int),
+        )
+    return _LIMITERS[name]
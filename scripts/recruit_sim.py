@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+招募兵属性分布与"战力/薪资"评估（纯 NumPy，向量化蒙特卡洛）。
+
+按 App.tsx / mapGenerator.ts 的 createMercenary 与 constants.ts 的 assignTraits 逐项复刻：
+    属性 = 基础随机(如生命 50~70) + 背景修正随机(hpMod "min,max") + 特质修正
+    特质：50% 一个正面 + 30% 再一个正面（不重复） + 40% 一个负面，一个都没有时从全部特质里补一个；
+          preferredTraits 中的特质权重 ×3；injury_ 开头的伤病特质不参与
+    薪资 = floor(10 × salaryMult)
+星级只影响成长、不影响初始属性，这里不模拟。
+
+战力（combat value）以"同档普通新兵互殴"的消耗模型估计，基准新兵（无背景修正、无特质、
+各项取基础随机中值）为 1.0：
+    命中率   = clamp(命中 - 对手防御, 5, 95)，近战/远程取较高者
+    有效生命 = 生命 / 对手对我的命中率
+    战力     ∝ 命中率 × 有效生命 × 胆识、体力、先手的小幅修正
+性价比 = 平均战力 / (薪资 / 10)，即每 10 金薪资买到的战力。
+
+generate_csv 生成新背景后、写入 backgrounds.csv 之前会调用 review_new_backgrounds()：
+修正范围格式不对的行被丢弃，性价比落在现有背景范围之外的行给出警告。
+
+用法:
+    python -m scripts recruits                       # 全部背景的分位数表与性价比排名
+    python -m scripts recruits FARMER DESERTER -n 1000000
+    python -m scripts recruits --stats hp meleeSkill --seed 1
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+from design_db import query
+from profiling import profiled_main, span
+
+DEFAULT_SAMPLES = 50_000   # 每个背景的样本数（全表约 225 万新兵，单核 1 秒内；分位数误差 < 1 点）
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# 属性 → (基础随机范围, 背景修正列, 特质修正列)
+STATS = {
+    "hp": ((50, 70), "hpMod", "hpMod"),
+    "fatigue": ((90, 110), "fatigueMod", "fatigueMod"),
+    "resolve": ((30, 50), "resolveMod", "resolveMod"),
+    "initiative": ((100, 110), "initMod", "initMod"),
+    "meleeSkill": ((47, 57), "meleeSkillMod", "meleeSkillMod"),
+    "rangedSkill": ((37, 47), "rangedSkillMod", "rangedSkillMod"),
+    "meleeDefense": ((0, 5), "defMod", "meleeDefMod"),
+    "rangedDefense": ((0, 5), "defMod", "rangedDefMod"),
+}
+RANGE_COLUMNS = sorted({bg_col for _, bg_col, _ in STATS.values()})
+
+POSITIVE_CHANCES = (0.50, 0.30)
+NEGATIVE_CHANCE = 0.40
+PREFERRED_WEIGHT = 3
+BASE_SALARY = 10
+
+# 战力模型：对手取基准新兵的中值
+HIT_MIN, HIT_MAX = 5, 95
+REF_SKILL = 52
+REF_DEFENSE = 2.5
+
+
+# ============================================================
+#  数据
+# ============================================================
+
+def load_traits() -> tuple[list[dict], list[dict]]:
+    """(正面特质, 负面特质)，顺序与 constants.ts 的 POSITIVE_TRAITS / NEGATIVE_TRAITS 一致。"""
+    rows = query("SELECT * FROM traits ORDER BY _line")
+    positive = [t for t in rows if t["type"] == "positive"]
+    negative = [t for t in rows if t["type"] == "negative" and not t["id"].startswith("injury_")]
+    return positive, negative
+
+
+def load_backgrounds(ids=None) -> list[dict]:
+    rows = query("SELECT * FROM backgrounds ORDER BY _line")
+    for row in rows:
+        for col in RANGE_COLUMNS + ["preferredTraits"]:
+            row[col] = json.loads(row[col]) if isinstance(row[col], str) else row[col]
+    if ids:
+        rows = [r for r in rows if r["id"] in ids]
+    return rows
+
+
+def range_problems(bg: dict) -> list[str]:
+    """修正范围必须是 [min, max] 两个整数且 min <= max（否则游戏里 rollMod 会得到 NaN）。"""
+    problems = []
+    for col in RANGE_COLUMNS:
+        value = bg.get(col)
+        if not (isinstance(value, list) and len(value) == 2 and all(isinstance(v, int) for v in value)):
+            problems.append(f"{col}={value!r} 不是\"最小值,最大值\"")
+        elif value[0] > value[1]:
+            problems.append(f"{col}={value[0]},{value[1]} 最小值大于最大值")
+    if not isinstance(bg.get("salaryMult"), (int, float)) or bg["salaryMult"] <= 0:
+        problems.append(f"salaryMult={bg.get('salaryMult')!r} 不是正数")
+    return problems
+
+
+# ============================================================
+#  采样
+# ============================================================
+
+def _trait_matrix(traits: list[dict]) -> np.ndarray:
+    """每个特质的 8 项修正（列顺序同 STATS），末尾追加一行 0 表示"没有特质"。"""
+    mods = [[t[trait_col] or 0 for _, _, trait_col in STATS.values()] for t in traits]
+    return np.array(mods + [[0] * len(STATS)], dtype=np.int16)
+
+
+def trait_table(positive: list[dict], negative: list[dict]) -> np.ndarray:
+    """(8, 组合数) 的修正合计表：组合 (正面1, 正面2, 负面) 编成一个下标，每项属性一次一维查表。"""
+    pos, neg = _trait_matrix(positive), _trait_matrix(negative)
+    combos = pos[:, None, None, :] + pos[None, :, None, :] + neg[None, None, :, :]
+    return np.ascontiguousarray(combos.reshape(-1, len(STATS)).T)
+
+
+def _weights(traits: list[dict], preferred: set) -> np.ndarray:
+    return np.array([PREFERRED_WEIGHT if t["id"] in preferred else 1 for t in traits], dtype=np.int64)
+
+
+def _pick(rng, weights: np.ndarray, n: int) -> np.ndarray:
+    """按整数权重抽 n 次：权重为 w 的下标在查找表里出现 w 次，均匀抽表即可（比 searchsorted 快一个数量级）。"""
+    table = np.repeat(np.arange(len(weights), dtype=np.intp), weights)
+    return table[rng.integers(0, len(table), n, dtype=np.int32)]
+
+
+def sample_traits(rng, n: int, positive: list[dict], negative: list[dict], preferred: set) -> np.ndarray:
+    """n 个新兵的特质组合下标（对应 trait_table 的列）。"""
+    w_pos, w_neg = _weights(positive, preferred), _weights(negative, preferred)
+    none_pos, none_neg = len(positive), len(negative)  # 指向修正矩阵末尾的 0 行
+
+    pick1 = _pick(rng, w_pos, n)
+    pick1[rng.random(n) >= POSITIVE_CHANCES[0]] = none_pos
+    pick2 = _pick(rng, w_pos, n)
+    pick2[rng.random(n) >= POSITIVE_CHANCES[1]] = none_pos
+    # 第二个正面特质不能与第一个相同：拒绝采样等价于在去掉第一个后重新按权重抽
+    clash = np.flatnonzero((pick2 == pick1) & (pick2 != none_pos))
+    while clash.size:
+        pick2[clash] = _pick(rng, w_pos, clash.size)
+        clash = clash[pick2[clash] == pick1[clash]]
+    pick3 = _pick(rng, w_neg, n)
+    pick3[rng.random(n) >= NEGATIVE_CHANCE] = none_neg
+
+    # 一个特质都没有时，从全部特质（正面 + 负面）里按权重补一个
+    empty = np.flatnonzero((pick1 == none_pos) & (pick2 == none_pos) & (pick3 == none_neg))
+    if empty.size:
+        fallback = _pick(rng, np.concatenate([w_pos, w_neg]), empty.size)
+        is_pos = fallback < none_pos
+        pick1[empty[is_pos]] = fallback[is_pos]
+        pick3[empty[~is_pos]] = fallback[~is_pos] - none_pos
+    return (pick1 * (none_pos + 1) + pick2) * (none_neg + 1) + pick3
+
+
+def sample_background(rng, bg: dict, n: int, positive: list[dict], negative: list[dict],
+                      table: np.ndarray | None = None) -> dict[str, np.ndarray]:
+    """n 个该背景新兵的初始属性 {属性: int16 数组}。"""
+    if table is None:
+        table = trait_table(positive, negative)
+    combo = sample_traits(rng, n, positive, negative, set(bg.get("preferredTraits") or []))
+    stats = {}
+    for i, (name, ((lo, hi), bg_col, _)) in enumerate(STATS.items()):
+        bg_lo, bg_hi = bg[bg_col]
+        stats[name] = (rng.integers(lo, hi + 1, n, dtype=np.int16)
+                       + rng.integers(bg_lo, bg_hi + 1, n, dtype=np.int16)
+                       + table[i].take(combo))
+    return stats
+
+
+# ============================================================
+#  战力与统计
+# ============================================================
+
+def _hit(diff) -> np.ndarray:
+    return np.clip(diff, HIT_MIN, HIT_MAX) / 100.0
+
+
+def combat_value(s: dict[str, np.ndarray]) -> np.ndarray:
+    offense = np.maximum(_hit(s["meleeSkill"] - REF_DEFENSE), _hit(s["rangedSkill"] - REF_DEFENSE))
+    effective_hp = np.maximum(s["hp"], 1) / _hit(REF_SKILL - s["meleeDefense"])
+    modifiers = ((1 + (s["resolve"] - 40) / 200)
+                 * (1 + (s["fatigue"] - 100) / 400)
+                 * (1 + (s["initiative"] - 105) / 500))
+    return offense * effective_hp * modifiers
+
+
+def _baseline_value() -> float:
+    mid = {name: np.array([(lo + hi) / 2]) for name, ((lo, hi), _, _) in STATS.items()}
+    return float(combat_value(mid)[0])
+
+
+BASELINE_VALUE = _baseline_value()
+
+
+def int_percentiles(values: np.ndarray, percentiles=PERCENTILES) -> list[int]:
+    """整数数组的分位数：bincount + 累积分布，O(n)，不排序。"""
+    low = int(values.min())
+    cdf = np.cumsum(np.bincount(values.astype(np.int64) - low))
+    return [int(np.searchsorted(cdf, p / 100 * len(values))) + low for p in percentiles]
+
+
+def salary_of(bg: dict) -> int:
+    return math.floor(BASE_SALARY * bg["salaryMult"])
+
+
+def analyze(backgrounds: list[dict], samples: int = DEFAULT_SAMPLES, seed: int | None = None,
+            traits=None) -> list[dict]:
+    """每个背景的属性分位数、战力分位数与性价比。"""
+    rng = np.random.default_rng(seed)
+    positive, negative = traits or load_traits()
+    table = trait_table(positive, negative)
+    results = []
+    for bg in backgrounds:
+        with span("sample", bg=bg["id"], n=samples):
+            stats = sample_background(rng, bg, samples, positive, negative, table)
+            value = combat_value(stats) / BASELINE_VALUE
+        salary = salary_of(bg)
+        mean_value = float(value.mean())
+        results.append({
+            "id": bg["id"],
+            "name": bg.get("name", ""),
+            "salary": salary,
+            "stats": {name: int_percentiles(arr) for name, arr in stats.items()},
+            "value": [round(float(v), 3) for v in np.percentile(value, PERCENTILES)],
+            "mean_value": round(mean_value, 3),
+            "value_per_salary": round(mean_value / max(salary, 1) * BASE_SALARY, 3),
+        })
+    return results
+
+
+# ============================================================
+#  生成前审查（generate_csv 调用）
+# ============================================================
+
+def review_new_backgrounds(header: str, lines: list[str], samples: int = DEFAULT_SAMPLES) -> list[str]:
+    """审查 AI 生成的背景行：丢弃修正范围不合法的行，性价比超出现有背景范围的给出警告。返回保留的行。"""
+    from csv_tools import parse_value
+
+    columns = [h.strip() for h in header.split("|")]
+    candidates, kept = [], []
+    for line in lines:
+        cells = [c.strip() for c in line.split("|")]
+        bg = {col: parse_value(cells[i]) if i < len(cells) else None for i, col in enumerate(columns)}
+        bg["preferredTraits"] = [bg["preferredTraits"]] if isinstance(bg.get("preferredTraits"), str) \
+            else bg.get("preferredTraits") or []
+        problems = range_problems(bg)
+        if problems:
+            print(f"  [跳过] {bg.get('id')}: {'；'.join(problems)}")
+            continue
+        candidates.append(bg)
+        kept.append(line)
+    if not candidates:
+        return kept
+
+    start = time.perf_counter()
+    traits = load_traits()
+    existing = analyze(load_backgrounds(), samples, traits=traits)
+    new = analyze(candidates, samples, traits=traits)
+    low = min(r["value_per_salary"] for r in existing)
+    high = max(r["value_per_salary"] for r in existing)
+    print(f"  [评估] {len(new)} 个新背景 × {samples} 名新兵（{time.perf_counter() - start:.2f}s），"
+          f"现有背景性价比 {low:.2f}~{high:.2f}")
+    for r in new:
+        flag = ""
+        if r["value_per_salary"] > high:
+            flag = "  [警告] 高于所有现有背景，薪资可能偏低"
+        elif r["value_per_salary"] < low:
+            flag = "  [警告] 低于所有现有背景，薪资可能偏高"
+        print(f"    {r['id']:<16} 薪资 {r['salary']:>3}  战力 {r['mean_value']:.2f}  性价比 {r['value_per_salary']:.2f}{flag}")
+    return kept
+
+
+# ============================================================
+#  命令行
+# ============================================================
+
+def print_report(results: list[dict], stat_names: list[str]):
+    pct = "/".join(f"p{p}" for p in PERCENTILES)
+    print(f"\n{'背景':<15}{'薪资':>4}  {'战力 ' + pct:<34}{'均值':>6}{'性价比':>8}")
+    for r in sorted(results, key=lambda r: -r["value_per_salary"]):
+        values = " ".join(f"{v:.2f}" for v in r["value"])
+        print(f"{r['id']:<16}{r['salary']:>4}  {values:<34}{r['mean_value']:>6.2f}{r['value_per_salary']:>8.2f}")
+    for name in stat_names:
+        print(f"\n{name}（{pct}）")
+        for r in results:
+            print(f"  {r['id']:<16}" + " ".join(f"{v:>4}" for v in r["stats"][name]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="招募兵属性分布与战力/薪资评估（NumPy 蒙特卡洛）")
+    parser.add_argument("ids", nargs="*", help="只评估这些背景（默认全部）")
+    parser.add_argument("-n", "--samples", type=int, default=DEFAULT_SAMPLES, help="每个背景的样本数")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子（结果可复现）")
+    parser.add_argument("--stats", nargs="*", default=list(STATS), help="输出分位数表的属性（默认全部）")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args()
+
+    unknown = [s for s in args.stats if s not in STATS]
+    if unknown:
+        print(f"[错误] 未知属性: {', '.join(unknown)}，支持: {', '.join(STATS)}")
+        sys.exit(1)
+    backgrounds = load_backgrounds(set(args.ids) if args.ids else None)
+    if not backgrounds:
+        print("[错误] 没有匹配的背景")
+        sys.exit(1)
+    for bg in backgrounds:
+        if problems := range_problems(bg):
+            print(f"[错误] {bg['id']}: {'；'.join(problems)}")
+            sys.exit(1)
+
+    start = time.perf_counter()
+    results = analyze(backgrounds, args.samples, args.seed)
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=1))
+        return
+    print_report(results, args.stats)
+    print(f"\n{len(backgrounds)} 个背景 × {args.samples} 名新兵，用时 {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    profiled_main(main)
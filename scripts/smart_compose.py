@@ -1,17 +1,38 @@
 import os
 import json
+import argparse
+import hashlib
 import base64
+import threading
 from pathlib import Path
-from PIL import Image
-from google import genai
-from google.genai import types
+
+from buildgraph import file_digest, hash_cache, value_digest
+from common import ROOT, cache_path
+from encoder import encode, write_atomic
+from list_models import pick_model
+from preview import preview_bytes
+from profiling import profiled_main, span
+from ratelimit import gemini_limiter
 
 # 配置路径
-BASE_DIR = Path("/Users/fater/project/QingBrother")
+BASE_DIR = ROOT
 DOCS_DIR = BASE_DIR / "docs"
 IMAGES_DIR = DOCS_DIR / "final_image"
 OUTPUT_DIR = IMAGES_DIR / "composed"
-OUTPUT_DIR.mkdir(exist_ok=True)
+
+# 默认布局模型；有测速结果时用 layout 任务最快的模型。
+# 模型不参与布局缓存键和构建图参数：测速结果的波动或过期不应让已合成的图全部失效，
+# 使用的模型记录在缓存的布局里（"model"）
+LAYOUT_MODEL = "gemini-2.0-flash"
+
+
+def layout_model() -> str:
+    return pick_model("layout", LAYOUT_MODEL)
+
+# 布局缓存；本地布局置信度低于该值时才调用远程模型
+LAYOUT_CACHE_FILE = cache_path("layouts.json")
+LOCAL_CONFIDENCE = 0.5
+_layout_lock = threading.Lock()
 
 # Logo 文件路径
 LOGO_PATH = IMAGES_DIR / "6._游戏_LOGO_-_方案_A_中文书法标题.png"
@@ -39,34 +60,79 @@ def load_api_key():
                 return line
     return None
 
-def remove_white_bg(image, threshold=240):
+# Logo 去底参数：min(R,G,B) >= threshold 完全透明，<= threshold - softness 完全保留，中间线性过渡
+MATTE_THRESHOLD = 240
+MATTE_SOFTNESS = 40
+MATTE_CACHE_DIR = cache_path("matte")
+
+def remove_white_bg(image, threshold=MATTE_THRESHOLD, softness=MATTE_SOFTNESS):
     """
-    将图像中的白色背景转换为透明
+    将图像中的白色背景转换为透明（NumPy 向量化的软抠图）
+
+    - 白度取 min(R,G,B)：只有三个通道都亮才算白
+    - 白度在 [threshold - softness, threshold] 内 alpha 线性过渡，边缘不再锯齿；softness=0 即原来的硬阈值
+    - 半透明边缘做去白边：按 C = a*F + (1-a)*255 反解前景色 F
+    - 按 alpha 的包围盒裁剪，与上面在同一次数组运算里完成
     """
+    import numpy as np
+    from PIL import Image
+
     print("Processing Logo: Removing white background...")
-    image = image.convert("RGBA")
-    data = image.getdata()
-    
-    new_data = []
-    for item in data:
-        # item is (R, G, B, A)
-        # 如果像素足够白，将其 Alpha 设为 0
-        if item[0] > threshold and item[1] > threshold and item[2] > threshold:
-            new_data.append((255, 255, 255, 0))
+    with span("remove_white_bg", size=f"{image.width}x{image.height}"):
+        rgba = np.asarray(image.convert("RGBA"), dtype=np.float32)
+        rgb, alpha = rgba[..., :3], rgba[..., 3]
+
+        whiteness = rgb.min(axis=2)
+        if softness > 0:
+            matte = np.clip((threshold - whiteness) / softness, 0.0, 1.0)
         else:
-            new_data.append(item)
-            
-    image.putdata(new_data)
-    # 裁剪掉多余的透明边缘，让 Logo 紧凑
-    bbox = image.getbbox()
-    if bbox:
-        image = image.crop(bbox)
-    return image
-
-def get_layout_from_ai(client, image_path):
-    # 读取图片数据
-    with open(image_path, "rb") as f:
-        image_bytes = f.read()
+            matte = (whiteness <= threshold).astype(np.float32)
+
+        # 裁剪到不透明区域的包围盒（裁剪掉多余的透明边缘，让 Logo 紧凑）
+        visible = (matte * alpha) >= 1.0
+        rows = np.flatnonzero(visible.any(axis=1))
+        cols = np.flatnonzero(visible.any(axis=0))
+        if rows.size:
+            box = np.s_[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+            rgb, alpha, matte = rgb[box], alpha[box], matte[box]
+
+        # 去白边：完全透明的像素颜色无意义（Pillow 缩放 RGBA 时会预乘 alpha）
+        safe = np.maximum(matte, 1e-3)[..., None]
+        fg = np.clip((rgb - (1.0 - matte)[..., None] * 255.0) / safe, 0.0, 255.0)
+        out = np.empty(rgb.shape[:2] + (4,), dtype=np.uint8)
+        out[..., :3] = np.rint(fg)
+        out[..., 3] = np.rint(alpha * matte)
+        return Image.fromarray(out, "RGBA")
+
+def matte_path(logo_path, threshold=MATTE_THRESHOLD, softness=MATTE_SOFTNESS):
+    """去底后 Logo 的缓存文件（按源文件哈希 + 参数命名），不存在时生成。"""
+    from PIL import Image
+
+    digest = file_digest(logo_path)
+    cached = MATTE_CACHE_DIR / f"{digest[:24]}_t{threshold}_s{softness}.png"
+    if cached.exists():
+        return cached
+    logo = remove_white_bg(Image.open(logo_path), threshold, softness)
+    with span("encode", file=cached.name):
+        write_atomic(cached, encode(logo, "PNG", compress_level=1))
+    hash_cache().save()
+    return cached
+
+def load_logo(logo_path, threshold=MATTE_THRESHOLD, softness=MATTE_SOFTNESS):
+    """去底后的 Logo；结果按源文件哈希 + 参数缓存在 .cache/matte/，重复合成时直接读取。"""
+    from PIL import Image
+
+    cached = matte_path(logo_path, threshold, softness)
+    with span("decode", file=cached.name):
+        logo = Image.open(cached)
+        logo.load()
+    return logo
+
+def get_layout_from_ai(client, image_path, model=LAYOUT_MODEL):
+    from google.genai import types
+
+    # 上传缩小后的预览图（按源文件哈希缓存）；bounding_box 是 0-1000 归一化坐标，等比缩放不影响结果
+    image_bytes, mime_type = preview_bytes(image_path)
     
     prompt = """
     I have a game logo (text based) that needs to be placed on this marketing image.
@@ -89,20 +155,22 @@ def get_layout_from_ai(client, image_path):
     """
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[
-                types.Content(
-                    parts=[
-                        types.Part.from_bytes(data=image_bytes, mime_type="image/png"),
-                        types.Part.from_text(text=prompt)
-                    ]
+        with span("call", file=image_path.name, bytes=len(image_bytes)):
+            response = gemini_limiter().call(
+                client.models.generate_content,
+                model=model,
+                contents=[
+                    types.Content(
+                        parts=[
+                            types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
+                            types.Part.from_text(text=prompt)
+                        ]
+                    )
+                ],
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json"
                 )
-            ],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"
             )
-        )
         
         text = response.text.strip()
         # Clean markdown code blocks if present
@@ -130,14 +198,12 @@ def get_layout_from_ai(client, image_path):
         print(f"Error getting AI layout for {image_path.name}: {e}")
         return None
 
-def compose_image(bg_path, logo_image, layout):
-    bg = Image.open(bg_path).convert("RGBA")
-    # logo_image 已经是处理过的 Image 对象
-    
-    bg_w, bg_h = bg.size
-    
-    # 解析 AI 返回的坐标 (0-1000 scale)
-    bbox = layout["bounding_box"]
+def place_logo(bg_size, logo_size, bbox):
+    """
+    把 0-1000 归一化的 [ymin, xmin, ymax, xmax] 框换算成像素，Logo 等比缩放到框内并居中。
+    返回 (paste_x, paste_y, new_w, new_h)。
+    """
+    bg_w, bg_h = bg_size
     ymin, xmin, ymax, xmax = bbox
     
     # 转换为像素坐标
@@ -147,7 +213,7 @@ def compose_image(bg_path, logo_image, layout):
     target_h = int(((ymax - ymin) / 1000) * bg_h)
     
     # 计算 Logo 缩放
-    logo_w, logo_h = logo_image.size
+    logo_w, logo_h = logo_size
     logo_aspect = logo_w / logo_h
     target_aspect = target_w / target_h
     
@@ -159,41 +225,321 @@ def compose_image(bg_path, logo_image, layout):
         # Logo 更高，以高度为准
         new_h = target_h
         new_w = int(new_h * logo_aspect)
-        
-    # 调整 Logo 大小 (使用 LANCZOS 保持高质量)
-    logo_resized = logo_image.resize((new_w, new_h), Image.Resampling.LANCZOS)
     
     # 计算居中位置 (在目标框内居中)
     paste_x = target_x + (target_w - new_w) // 2
     paste_y = target_y + (target_h - new_h) // 2
+    return paste_x, paste_y, new_w, new_h
+
+def compose_image(bg_path, logo_image, layout):
+    from PIL import Image
+
+    with span("decode", file=bg_path.name):
+        bg = Image.open(bg_path).convert("RGBA")
+    # logo_image 已经是处理过的 Image 对象
+    
+    paste_x, paste_y, new_w, new_h = place_logo(bg.size, logo_image.size, layout["bounding_box"])
+    
+    # 调整 Logo 大小 (使用 LANCZOS 保持高质量)
+    with span("resize", size=f"{new_w}x{new_h}"):
+        logo_resized = logo_image.resize((new_w, new_h), Image.Resampling.LANCZOS)
     
     # 合成 (使用 logo 本身作为 mask)
     bg.paste(logo_resized, (paste_x, paste_y), logo_resized)
     
     # 保存
-    output_filename = f"Logo版_{bg_path.name}"
-    output_path = OUTPUT_DIR / output_filename
-    bg.save(output_path)
+    output_path = output_path_for(bg_path)
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    with span("encode", file=output_path.name):
+        bg.save(output_path)
     print(f"✅ Generated: {output_path.name}")
     print(f"   Reason: {layout['position_description']}")
+    return output_path
 
-def main():
+def output_path_for(bg_path):
+    return OUTPUT_DIR / f"Logo版_{bg_path.name}"
+
+def make_client():
     api_key = load_api_key()
     if not api_key:
+        return None
+    from google import genai
+
+    return genai.Client(api_key=api_key)
+
+def _image_digest(image):
+    """Logo 像素内容的哈希（布局缓存键的一部分）。"""
+    return value_digest([image.size, hashlib.sha256(image.tobytes()).hexdigest()])
+
+def _load_layout_cache():
+    try:
+        return json.loads(LAYOUT_CACHE_FILE.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _store_layout(key, layout):
+    with _layout_lock:
+        cache = _load_layout_cache()
+        cache[key] = layout
+        tmp = LAYOUT_CACHE_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(cache, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, LAYOUT_CACHE_FILE)
+
+def resolve_layout(client, bg_path, processed_logo, mode="auto"):
+    """
+    布局来源：
+      缓存（背景图哈希 + Logo 哈希 + 引擎版本 + 模式）命中 → 直接用
+      auto  本地显著性搜索；置信度 < LOCAL_CONFIDENCE 时才调用远程模型（没有 client 则仍用本地结果）
+      local 只用本地结果
+      ai    总是调用远程模型
+    """
+    from layout_engine import ENGINE_VERSION, find_layout
+
+    key = value_digest({
+        "bg": file_digest(bg_path),
+        "logo": _image_digest(processed_logo),
+        "engine": ENGINE_VERSION,
+        "mode": mode,
+    })
+    cached = _load_layout_cache().get(key)
+    if cached:
+        print(f"   Layout: cached ({cached.get('source', 'ai')})")
+        return cached
+
+    layout = None
+    if mode != "ai":
+        from PIL import Image
+
+        with span("local_layout", file=bg_path.name):
+            with Image.open(bg_path) as bg:
+                bg.draft("RGB", (1024, 1024))
+                layout = find_layout(bg, processed_logo.width / processed_logo.height)
+        if layout:
+            print(f"   Local layout: confidence {layout['confidence']:.2f}")
+        if layout and (mode == "local" or layout["confidence"] >= LOCAL_CONFIDENCE):
+            _store_layout(key, layout)
+            return layout
+
+    if client is not None:
+        model = layout_model()
+        ai_layout = get_layout_from_ai(client, bg_path, model)
+        if ai_layout and "bounding_box" in ai_layout:
+            ai_layout["source"] = "ai"
+            ai_layout["model"] = model
+            _store_layout(key, ai_layout)
+            return ai_layout
+    elif mode == "ai":
+        print("   No API key; cannot request an AI layout.")
+        return None
+    else:
+        print("   Low confidence but no API key; using the local layout.")
+
+    # 远程失败时退回本地结果（不写缓存，下次还会再试远程）
+    return layout
+
+def compose_target(client, bg_path, processed_logo, mode="auto"):
+    """分析单张背景图的布局并合成，返回输出路径；失败返回 None。"""
+    print(f"\nAnalyzing {bg_path.name}...")
+    layout = resolve_layout(client, bg_path, processed_logo, mode)
+    if layout:
+        return compose_image(bg_path, processed_logo, layout)
+    return None
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def _shared_inputs():
+    """构建图的多个合成节点共享同一个 client 和去底后的 Logo（只在真正需要重建时创建）。"""
+    with _shared_lock:
+        if not _shared:
+            # 没有 Key 也能构建：只用本地布局
+            _shared["client"] = make_client()
+            _shared["logo"] = load_logo(LOGO_PATH)
+        return _shared["client"], _shared["logo"]
+
+def build_nodes(graph):
+    """向构建图注册每张背景图的合成节点（背景图、Logo 或布局参数变化时才重建）。"""
+    from layout_engine import ENGINE_VERSION
+
+    for filename in TARGET_FILES:
+        bg_path = IMAGES_DIR / filename
+        if not bg_path.exists():
+            continue
+
+        def action(bg_path=bg_path):
+            client, logo = _shared_inputs()
+            output_path = compose_target(client, bg_path, logo)
+            if output_path is None:
+                raise RuntimeError(f"no layout for {bg_path.name}")
+            return [output_path]
+
+        graph.add(
+            f"compose:{bg_path.stem}",
+            action,
+            inputs=[bg_path, LOGO_PATH],
+            outputs=[output_path_for(bg_path)],
+            params={
+                "layout_engine": ENGINE_VERSION,
+                "local_confidence": LOCAL_CONFIDENCE,
+                "matte": [MATTE_THRESHOLD, MATTE_SOFTNESS],
+            },
+            adopt_existing=True,
+        )
+
+# 矩阵模式的布局预设：None 表示按背景分析（resolve_layout），其余为固定框 [ymin, xmin, ymax, xmax]（0-1000）
+LAYOUT_PRESETS = {
+    "smart": None,
+    "top": [40, 150, 300, 850],
+    "center": [330, 150, 670, 850],
+    "bottom": [700, 150, 960, 850],
+    "top_left": [40, 40, 290, 520],
+    "bottom_right": [710, 480, 960, 960],
+}
+MATRIX_DIR = OUTPUT_DIR / "matrix"
+MATRIX_PNG_LEVEL = 3  # zlib 压缩级别：3 比默认 6 快约 3 倍，体积相差无几
+
+def matrix_output_path(bg_path, logo_path, preset):
+    """确定性的输出名：<背景>__<Logo>__<预设>.png"""
+    return MATRIX_DIR / f"{bg_path.stem}__{logo_path.stem}__{preset}.png"
+
+def expand_backgrounds(patterns):
+    """背景图 glob（相对仓库根目录或 docs/final_image/），去重并按名称排序。"""
+    found = set()
+    for pattern in patterns:
+        for base in (BASE_DIR, IMAGES_DIR):
+            found.update(p for p in base.glob(pattern) if p.is_file())
+    return sorted(found, key=lambda p: p.name)
+
+_logo_sizes = {}  # 工作进程内：(Logo 文件, 宽, 高) → 缩放后的 Logo
+
+def _resized_logo(logo_file, size):
+    from PIL import Image
+
+    key = (logo_file, size)
+    if key not in _logo_sizes:
+        base_key = (logo_file, None)
+        if base_key not in _logo_sizes:
+            with Image.open(logo_file) as logo:
+                logo.load()
+                _logo_sizes[base_key] = logo.copy()
+        with span("resize", size=f"{size[0]}x{size[1]}"):
+            _logo_sizes[key] = _logo_sizes[base_key].resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return _logo_sizes[key]
+
+def compose_group(bg_file, jobs):
+    """
+    在工作进程中执行：背景图只解码一次，依次贴上多个 Logo/布局。
+    jobs: [(去底 Logo 缓存文件, bounding_box, 输出路径), ...]；返回写出的路径列表。
+    """
+    from PIL import Image
+
+    with span("decode", file=Path(bg_file).name):
+        with Image.open(bg_file) as img:
+            bg = img.convert("RGBA")
+    # 背景不透明时输出 RGB：编码更快、文件更小
+    opaque = bg.getchannel("A").getextrema()[0] == 255
+    written = []
+    for logo_file, bbox, out_file in jobs:
+        with Image.open(logo_file) as logo:
+            logo_size = logo.size
+        paste_x, paste_y, new_w, new_h = place_logo(bg.size, logo_size, bbox)
+        logo_resized = _resized_logo(logo_file, (new_w, new_h))
+        canvas = bg.copy()
+        canvas.alpha_composite(logo_resized, (paste_x, paste_y))
+        with span("encode", file=Path(out_file).name):
+            data = encode(canvas.convert("RGB") if opaque else canvas, "PNG", compress_level=MATRIX_PNG_LEVEL)
+        write_atomic(Path(out_file), data)
+        written.append(out_file)
+    return written
+
+def compose_matrix(client, backgrounds, logo_paths, presets, layout_mode="auto", workers=None):
+    """背景 × Logo × 布局预设，全部组合在进程池中合成（按背景分组，每张背景只解码一次）。"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    logos = {logo_path: matte_path(logo_path) for logo_path in logo_paths}
+    matted = {}  # smart 预设分析布局时才需要在主进程里加载 Logo
+    groups = {}
+    for bg_path in backgrounds:
+        for logo_path, logo_file in logos.items():
+            for preset in presets:
+                bbox = LAYOUT_PRESETS[preset]
+                if bbox is None:
+                    print(f"\nAnalyzing {bg_path.name} for {logo_path.name}...")
+                    if logo_path not in matted:
+                        matted[logo_path] = load_logo(logo_path)
+                    layout = resolve_layout(client, bg_path, matted[logo_path], layout_mode)
+                    if not layout:
+                        print(f"  [跳过] {bg_path.name} × {logo_path.name}: 没有可用布局")
+                        continue
+                    bbox = layout["bounding_box"]
+                out = matrix_output_path(bg_path, logo_path, preset)
+                groups.setdefault(str(bg_path), []).append((str(logo_file), bbox, str(out)))
+    hash_cache().save()
+    if not groups:
+        return []
+
+    MATRIX_DIR.mkdir(parents=True, exist_ok=True)
+    total = sum(len(jobs) for jobs in groups.values())
+    workers = min(workers or os.cpu_count() or 4, len(groups))
+    print(f"\nComposing {total} images from {len(groups)} backgrounds with {workers} processes...")
+    written = []
+    with span("compose_matrix", images=total), ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(compose_group, bg_file, jobs): bg_file for bg_file, jobs in groups.items()}
+        for future in as_completed(futures):
+            try:
+                paths = future.result()
+            except Exception as e:
+                print(f"  [错误] {Path(futures[future]).name}: {e}")
+                continue
+            for path in paths:
+                print(f"✅ Generated: {Path(path).name}")
+            written.extend(paths)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="布局分析 + Logo 合成宣传图")
+    parser.add_argument("--layout", choices=("auto", "local", "ai"), default="auto",
+                        help="auto: 本地显著性搜索，置信度低时才问 AI（默认）；local: 只用本地；ai: 总是问 AI")
+    parser.add_argument("--matrix", action="store_true",
+                        help="矩阵模式：--bg × --logo × --preset 全部组合，进程池并行合成到 composed/matrix/")
+    parser.add_argument("--bg", action="append", metavar="GLOB",
+                        help="背景图 glob，可重复（默认 TARGET_FILES）")
+    parser.add_argument("--logo", action="append", type=Path, metavar="PATH",
+                        help="Logo 文件，可重复（默认 LOGO_PATH）")
+    parser.add_argument("--preset", action="append", choices=list(LAYOUT_PRESETS),
+                        help="布局预设，可重复（默认 smart）")
+    parser.add_argument("--workers", type=int, default=None, help="矩阵模式的进程数（默认 CPU 核数）")
+    args = parser.parse_args()
+
+    client = make_client() if args.layout != "local" else None
+    if client is None and args.layout == "ai":
         print("API Key not found.")
         return
-        
-    client = genai.Client(api_key=api_key)
+    if client is None and args.layout == "auto":
+        print("API Key not found; using local layouts only.")
     
+    if args.matrix:
+        backgrounds = expand_backgrounds(args.bg) if args.bg else [
+            IMAGES_DIR / f for f in TARGET_FILES if (IMAGES_DIR / f).exists()
+        ]
+        logo_paths = args.logo or [LOGO_PATH]
+        missing = [p for p in logo_paths if not p.exists()]
+        if missing:
+            print(f"Logo not found at {missing[0]}")
+            return
+        written = compose_matrix(client, backgrounds, logo_paths, args.preset or ["smart"],
+                                 layout_mode=args.layout, workers=args.workers)
+        print(f"\nDone! Wrote {len(written)} images to {MATRIX_DIR}")
+        return
+
     if not LOGO_PATH.exists():
         print(f"Logo not found at {LOGO_PATH}")
         return
 
-    print(f"Starting AI-powered composition using Logo: {LOGO_PATH.name}...")
+    print(f"Starting composition using Logo: {LOGO_PATH.name} (layout: {args.layout})...")
     
-    # 预处理 Logo：加载并去底
-    raw_logo = Image.open(LOGO_PATH)
-    processed_logo = remove_white_bg(raw_logo)
+    # 预处理 Logo：加载并去底（按源文件哈希缓存）
+    processed_logo = load_logo(LOGO_PATH)
     
     processed_count = 0
     for filename in TARGET_FILES:
@@ -201,14 +547,11 @@ def main():
         if not bg_path.exists():
             continue
             
-        print(f"\nAnalyzing {filename}...")
-        layout = get_layout_from_ai(client, bg_path)
-        
-        if layout:
-            compose_image(bg_path, processed_logo, layout)
+        if compose_target(client, bg_path, processed_logo, args.layout):
             processed_count += 1
+    hash_cache().save()
             
     print(f"\nDone! Processed {processed_count} images. Check {OUTPUT_DIR}")
 
 if __name__ == "__main__":
-    main()
+    profiled_main(main)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+武器/盾牌图标图集：把 public/assets/icons/*.png 缩到界面实际显示的尺寸，用 MaxRects
+装箱成 1x/2x 两张图集，各输出 WebP 与 PNG（回退），外加帧清单 JSON。
+
+源图是 640x640 的 PNG（单张 120~430 KB），界面里只画 20~30px；打包后战斗界面只需
+请求并解码一张几十 KB 的图集。前端用法见 services/iconAtlas.ts 与 index.css 的 .icon-atlas。
+
+输出（public/assets/atlas/）:
+    icons-1x.webp / icons-1x.png     1x 图集
+    icons-2x.webp / icons-2x.png     2x 图集（布局与 1x 完全相同，坐标 ×2）
+    icons.json                       {"width", "height", "frames": {名: {x, y, w, h}}}（1x 像素）
+
+用法:
+    python scripts/sprite_atlas.py
+    python scripts/sprite_atlas.py --force
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from buildgraph import BuildGraph
+from common import ROOT
+from encoder import encode, write_atomic
+from profiling import profiled_main, span
+
+ICON_DIR = ROOT / "public" / "assets" / "icons"
+ATLAS_DIR = ROOT / "public" / "assets" / "atlas"
+ATLAS_NAME = "icons"
+
+# 界面中的最大显示边长（CSS px）：武器图标 24/30px，盾牌 20px
+DEFAULT_ICON_SIZE = 30
+ICON_SIZES = {"shield": 20}
+SCALES = (1, 2)
+PADDING = 2  # 帧间留白（1x 像素），避免缩放采样时串色
+
+WEBP_QUALITY = 90
+PNG_LEVEL = 9
+
+
+# ============================================================
+#  MaxRects 装箱（Best Short Side Fit）
+# ============================================================
+
+def _split(free, used):
+    """从空闲矩形 free 中切掉 used 覆盖的部分，返回剩余的（可能重叠的）最大矩形。"""
+    fx, fy, fw, fh = free
+    ux, uy, uw, uh = used
+    if ux >= fx + fw or ux + uw <= fx or uy >= fy + fh or uy + uh <= fy:
+        return [free]
+    parts = []
+    if ux > fx:
+        parts.append((fx, fy, ux - fx, fh))
+    if ux + uw < fx + fw:
+        parts.append((ux + uw, fy, fx + fw - ux - uw, fh))
+    if uy > fy:
+        parts.append((fx, fy, fw, uy - fy))
+    if uy + uh < fy + fh:
+        parts.append((fx, uy + uh, fw, fy + fh - uy - uh))
+    return parts
+
+
+def _prune(rects):
+    """去掉被其它空闲矩形完全包含的矩形。"""
+    def inside(a, b):
+        return a[0] >= b[0] and a[1] >= b[1] and a[0] + a[2] <= b[0] + b[2] and a[1] + a[3] <= b[1] + b[3]
+
+    return [r for i, r in enumerate(rects)
+            if not any(i != j and inside(r, o) and (r != o or j < i) for j, o in enumerate(rects))]
+
+
+def maxrects_pack(sizes: dict[str, tuple[int, int]], width: int, height: int) -> dict[str, tuple[int, int]] | None:
+    """在 width x height 内放下全部矩形（不旋转），返回 {名: (x, y)}；放不下返回 None。"""
+    free = [(0, 0, width, height)]
+    placed = {}
+    # 大的先放
+    for name, (w, h) in sorted(sizes.items(), key=lambda kv: (-max(kv[1]), -min(kv[1]), kv[0])):
+        best = None
+        for fx, fy, fw, fh in free:
+            if w <= fw and h <= fh:
+                score = (min(fw - w, fh - h), max(fw - w, fh - h))
+                if best is None or score < best[0]:
+                    best = (score, fx, fy)
+        if best is None:
+            return None
+        _, x, y = best
+        placed[name] = (x, y)
+        free = _prune([part for rect in free for part in _split(rect, (x, y, w, h))])
+    return placed
+
+
+def pack(sizes: dict[str, tuple[int, int]]) -> tuple[int, int, dict[str, tuple[int, int]]]:
+    """尝试一系列宽度，取长边最短（其次面积最小）的装箱结果，避免细长条图集。"""
+    total = sum(w * h for w, h in sizes.values())
+    min_w = max(w for w, _ in sizes.values())
+    max_w = sum(w for w, _ in sizes.values())
+    best = None
+    for width in range(min_w, max_w + 1):
+        height = max(max(h for _, h in sizes.values()), -(-total // width))
+        while (placed := maxrects_pack(sizes, width, height)) is None:
+            height += 1
+        used_w = max(x + sizes[n][0] for n, (x, _) in placed.items())
+        used_h = max(y + sizes[n][1] for n, (_, y) in placed.items())
+        key = (max(used_w, used_h), used_w * used_h)
+        if best is None or key < best[0]:
+            best = (key, used_w, used_h, placed)
+    _, width, height, placed = best
+    return width, height, placed
+
+
+# ============================================================
+#  图集
+# ============================================================
+
+def list_icons() -> list[Path]:
+    """带 alpha 的图标源图；不透明的图（如误放进来的 logo 原图）跳过。"""
+    from PIL import Image
+
+    icons = []
+    for path in sorted(ICON_DIR.glob("*.png")):
+        with Image.open(path) as img:
+            if img.mode not in ("RGBA", "LA", "PA") and "transparency" not in img.info:
+                print(f"  [跳过] {path.name}: 不是透明图标（{img.format} {img.mode}）")
+                continue
+        icons.append(path)
+    return icons
+
+
+def icon_size(path: Path) -> int:
+    return ICON_SIZES.get(path.stem, DEFAULT_ICON_SIZE)
+
+
+def output_paths() -> list[Path]:
+    return [ATLAS_DIR / f"{ATLAS_NAME}-{s}x.{ext}" for s in SCALES for ext in ("webp", "png")] + \
+        [ATLAS_DIR / f"{ATLAS_NAME}.json"]
+
+
+def build_atlas(icons: list[Path]) -> list[Path]:
+    from PIL import Image
+
+    frames = {}
+    sources = {}
+    for path in icons:
+        with span("decode", file=path.name):
+            with Image.open(path) as img:
+                sources[path.stem] = img.convert("RGBA")
+        size = icon_size(path)
+        frames[path.stem] = (size, size)
+
+    # 以 1x 尺寸（含留白）装箱；2x 用同一布局，坐标与尺寸 ×2
+    padded = {name: (w + PADDING, h + PADDING) for name, (w, h) in frames.items()}
+    with span("pack", icons=len(frames)):
+        width, height, placed = pack(padded)
+    width, height = width - PADDING, height - PADDING  # 最右/最下一列不需要留白
+
+    written = []
+    for scale in SCALES:
+        sheet = Image.new("RGBA", (width * scale, height * scale), (0, 0, 0, 0))
+        for name, (x, y) in placed.items():
+            w, h = frames[name]
+            with span("resize", icon=name, scale=scale):
+                icon = sources[name].resize((w * scale, h * scale), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            sheet.paste(icon, (x * scale, y * scale))
+        stem = ATLAS_DIR / f"{ATLAS_NAME}-{scale}x"
+        with span("encode", scale=scale):
+            webp = encode(sheet, "WEBP", quality=WEBP_QUALITY, alpha_quality=100, method=6)
+            png = encode(sheet, "PNG", optimize=True, compress_level=PNG_LEVEL)
+        written += [write_atomic(stem.with_suffix(".webp"), webp), write_atomic(stem.with_suffix(".png"), png)]
+        print(f"  [写入] {stem.name}: {sheet.width}x{sheet.height}，WebP {len(webp) / 1024:.1f} KB，"
+              f"PNG {len(png) / 1024:.1f} KB")
+
+    manifest = {
+        "width": width,
+        "height": height,
+        "scales": list(SCALES),
+        "frames": {name: {"x": x, "y": y, "w": frames[name][0], "h": frames[name][1]}
+                   for name, (x, y) in sorted(placed.items())},
+    }
+    written.append(write_atomic(ATLAS_DIR / f"{ATLAS_NAME}.json",
+                                (json.dumps(manifest, indent=2) + "\n").encode("utf-8")))
+    source_bytes = sum(p.stat().st_size for p in icons)
+    atlas_bytes = (ATLAS_DIR / f"{ATLAS_NAME}-2x.webp").stat().st_size
+    print(f"  {len(icons)} 个图标: 源图 {source_bytes / 1024:.0f} KB → 2x WebP 图集 {atlas_bytes / 1024:.1f} KB")
+    return written
+
+
+def build_nodes(graph):
+    icons = list_icons()
+    if not icons:
+        return
+    graph.add(
+        f"atlas:{ATLAS_NAME}",
+        lambda: build_atlas(icons),
+        inputs=icons,
+        outputs=output_paths(),
+        params={
+            "sizes": {p.stem: icon_size(p) for p in icons},
+            "scales": list(SCALES),
+            "padding": PADDING,
+            "webp": WEBP_QUALITY,
+            "png": PNG_LEVEL,
+        },
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="打包武器图标图集（1x/2x WebP + PNG + 帧清单）")
+    parser.add_argument("--force", action="store_true", help="忽略构建记录，重新打包")
+    args = parser.parse_args()
+
+    graph = BuildGraph()
+    build_nodes(graph)
+    if not graph.nodes:
+        print(f"[错误] 在 {ICON_DIR} 下未找到透明 PNG 图标")
+        sys.exit(1)
+    results = graph.build(force=args.force)
+    if "failed" in results.values():
+        sys.exit(1)
+    if all(status == "fresh" for status in results.values()):
+        print("  图标未变化，图集已是最新")
+
+
+if __name__ == "__main__":
+    profiled_main(main)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+多商店素材导出：一张截图只解码一次，按 STORE_SPECS 表派生各商店需要的裁剪/尺寸/编码。
+
+STORE_SPECS 是声明式的规格表，每个商店若干目标（target）：
+    source   "screens"（docs/taptap 下的每张截图）或 "keyart"（横版宣传图，--key-art 可改）
+    fit      "clamp"   宽高比夹在 ratio 区间内（以第一张截图为准，所有截图比例一致），再放大到不低于 min
+             "fill"    居中裁剪铺满 size（截图竖版时宽高对调）
+             "contain" 等比缩小到 size 以内，不裁剪不放大
+    format   "JPEG" / "PNG" / "keep"（保持源文件格式）
+    max_bytes 单张上限；超出时由 encoder 先降质量再缩尺寸（不低于 min）
+
+每张源图是构建图里的一个节点（stores:<文件名>），签名 = 源图 + 第一张截图的内容哈希 + 规格参数；
+未变化的源图直接跳过，过期的分发到进程池并行处理。输出在 docs/store/<商店>/ 下。
+不同商店中除名称外完全相同的目标（如 Steam 与 Google Play 的 1920x1080 截图）只编码一次，
+其余商店的文件硬链接到同一份输出（不支持硬链接时复制）。
+
+用法:
+    python scripts/store_export.py                     # 全部商店
+    python scripts/store_export.py steam googleplay    # 只导出指定商店
+    python scripts/store_export.py --key-art docs/final_image/竖版封面图.png --force
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from buildgraph import BuildGraph
+from common import ROOT
+from encoder import Q_MAX, encode, encode_under_budget, write_atomic
+from profiling import profiled_main, span
+from taptap_crop_screenshots import (
+    H_RATIO_MAX, H_RATIO_MIN, INPUT_DIR, MAX_FILE_BYTES, MIN_HEIGHT_H, MIN_HEIGHT_V, MIN_WIDTH_H,
+    MIN_WIDTH_V, V_RATIO_MAX, V_RATIO_MIN, list_inputs,
+)
+
+STORE_DIR = ROOT / "docs" / "store"
+KEY_ART = ROOT / "docs" / "final_image" / "横版宣传.jpeg"
+MB = 1024 * 1024
+
+STORE_SPECS = {
+    # 与 taptap_crop_screenshots.py 同一套规则（常量从那里导入）
+    "taptap": [
+        {"name": "screen", "source": "screens", "fit": "clamp",
+         "ratio": {"horizontal": [H_RATIO_MIN, H_RATIO_MAX], "vertical": [V_RATIO_MIN, V_RATIO_MAX]},
+         "min": {"horizontal": [MIN_WIDTH_H, MIN_HEIGHT_H], "vertical": [MIN_WIDTH_V, MIN_HEIGHT_V]},
+         "format": "keep", "max_bytes": MAX_FILE_BYTES},
+    ],
+    # 截图 16:9（长边不超过短边 2 倍、单张 ≤ 8MB）；置顶大图 1024x500
+    "googleplay": [
+        {"name": "screen", "source": "screens", "fit": "fill", "size": [1920, 1080],
+         "format": "JPEG", "max_bytes": 8 * MB},
+        {"name": "feature_graphic", "source": "keyart", "fit": "fill", "size": [1024, 500],
+         "format": "JPEG", "max_bytes": 1 * MB},
+    ],
+    # 截图 1920x1080（与 Google Play 截图规格一致，共用同一份输出）；各类 capsule 按 Steamworks 当前尺寸
+    "steam": [
+        {"name": "screen", "source": "screens", "fit": "fill", "size": [1920, 1080],
+         "format": "JPEG", "max_bytes": 8 * MB},
+        {"name": "header_capsule", "source": "keyart", "fit": "fill", "size": [920, 430], "format": "PNG"},
+        {"name": "small_capsule", "source": "keyart", "fit": "fill", "size": [462, 174], "format": "PNG"},
+        {"name": "main_capsule", "source": "keyart", "fit": "fill", "size": [1232, 706], "format": "PNG"},
+        {"name": "vertical_capsule", "source": "keyart", "fit": "fill", "size": [748, 896], "format": "PNG"},
+        {"name": "library_capsule", "source": "keyart", "fit": "fill", "size": [600, 900], "format": "PNG"},
+        {"name": "library_hero", "source": "keyart", "fit": "fill", "size": [3840, 1240], "format": "JPEG"},
+    ],
+    # 封面 630x500；截图不裁剪，限制在 1920x1080 以内（保守取 3MB 上限）
+    "itch": [
+        {"name": "cover", "source": "keyart", "fit": "fill", "size": [630, 500], "format": "PNG"},
+        {"name": "screen", "source": "screens", "fit": "contain", "size": [1920, 1080],
+         "format": "JPEG", "max_bytes": 3 * MB},
+    ],
+}
+
+SUFFIXES = {"JPEG": ".jpg", "PNG": ".png"}
+
+
+# ============================================================
+#  几何：由规格和源图尺寸算出裁剪框与输出尺寸
+# ============================================================
+
+def orientation(size) -> str:
+    return "horizontal" if size[0] >= size[1] else "vertical"
+
+
+def center_crop_box(size, ratio):
+    """居中裁剪到 ratio（宽/高）的裁剪框。"""
+    w, h = size
+    if w / h > ratio:
+        new_w = round(h * ratio)
+        left = (w - new_w) // 2
+        return (left, 0, left + new_w, h)
+    new_h = round(w / ratio)
+    top = (h - new_h) // 2
+    return (0, top, w, top + new_h)
+
+
+def plan_geometry(target, src_size, first_size):
+    """返回 (裁剪框或 None, 输出尺寸, 最小尺寸)。"""
+    fit = target["fit"]
+    mode = orientation(first_size)
+    if fit == "clamp":
+        lo, hi = target["ratio"][mode]
+        ratio = max(lo, min(hi, first_size[0] / first_size[1]))
+        box = center_crop_box(src_size, ratio)
+        cw, ch = box[2] - box[0], box[3] - box[1]
+        min_w, min_h = target["min"][mode]
+        scale = max(1.0, min_w / cw, min_h / ch)
+        return box, (max(round(cw * scale), min_w), max(round(ch * scale), min_h)), (min_w, min_h)
+    w, h = target["size"]
+    if target["source"] == "screens" and mode == "vertical":
+        w, h = h, w
+    if fit == "fill":
+        return center_crop_box(src_size, w / h), (w, h), (w, h)
+    # contain
+    scale = min(1.0, w / src_size[0], h / src_size[1])
+    out = (max(1, round(src_size[0] * scale)), max(1, round(src_size[1] * scale)))
+    return None, out, (1, 1)
+
+
+def output_format(target, src_path: Path) -> str:
+    if target["format"] == "keep":
+        return "PNG" if src_path.suffix.lower() == ".png" else "JPEG"
+    return target["format"]
+
+
+def output_path(store, target, src_path: Path, index: int | None) -> Path:
+    fmt = output_format(target, src_path)
+    suffix = src_path.suffix.lower() if target["format"] == "keep" and fmt == "JPEG" else SUFFIXES[fmt]
+    name = target["name"] if index is None else f"{target['name']}{index + 1}"
+    return STORE_DIR / store / f"{name}{suffix}"
+
+
+# ============================================================
+#  工作进程：解码一次，产出全部目标
+# ============================================================
+
+def link_output(src: Path, dest: Path):
+    """规格相同的其他商店：硬链接到已写出的文件，不重复编码。"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+def export_source(src: str, jobs: list[dict], first_size) -> list[str]:
+    """
+    jobs: [{"target", "out", "links"}]；源图只解码一次，所有目标都从内存中的图派生。
+    links 为规格相同的其他商店的输出路径，指向 out 的同一份数据。
+    """
+    from PIL import Image
+
+    src = Path(src)
+    with span("decode", file=src.name):
+        with Image.open(src) as img:
+            img.load()
+            if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+                rgba = img.convert("RGBA")
+                image = Image.new("RGB", rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.getchannel("A"))
+            else:
+                image = img.convert("RGB")
+
+    written = []
+    for job in jobs:
+        target, out = job["target"], Path(job["out"])
+        box, size, min_size = plan_geometry(target, image.size, first_size)
+        with span("resize", file=out.name):
+            view = image.crop(box) if box else image
+            if view.size != tuple(size):
+                view = view.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        fmt = "PNG" if out.suffix == ".png" else "JPEG"
+        with span("encode", file=out.name):
+            if target.get("max_bytes"):
+                result = encode_under_budget(view, target["max_bytes"], fmt, min_size=min_size, optimize=True)
+                if result.format != fmt:
+                    out = out.with_suffix(result.suffix)
+                if not result.fits:
+                    print(f"  [警告] {out.name} 仍超过 {target['max_bytes'] / MB:.0f}MB")
+                data = result.data
+            elif fmt == "PNG":
+                data = encode(view, "PNG", optimize=True)
+            else:
+                data = encode(view, "JPEG", quality=Q_MAX, optimize=True)
+        write_atomic(out, data)
+        written.append(str(out))
+        for link in job.get("links", []):
+            link = Path(link).with_suffix(out.suffix)
+            link_output(out, link)
+            written.append(str(link))
+    return written
+
+
+# ============================================================
+#  构建图
+# ============================================================
+
+_pool = {}
+_pool_lock = threading.Lock()
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    """构建图的线程各自把节点交给同一个进程池执行（只在有过期节点时创建）。"""
+    with _pool_lock:
+        if "pool" not in _pool:
+            _pool["pool"] = ProcessPoolExecutor(max_workers=os.cpu_count() or 4)
+        return _pool["pool"]
+
+
+def _shutdown_pool():
+    with _pool_lock:
+        pool = _pool.pop("pool", None)
+    if pool:
+        pool.shutdown()
+
+
+def _spec_key(target: dict) -> str:
+    return json.dumps({k: v for k, v in target.items() if k != "name"}, sort_keys=True)
+
+
+def build_nodes(graph, stores=None, key_art: Path = KEY_ART):
+    """每张源图一个节点，输出为它在各商店的全部目标。"""
+    stores = stores or list(STORE_SPECS)
+    graph.add_teardown(_shutdown_pool)
+    screens = list_inputs()
+    if not screens:
+        return
+    from PIL import Image
+
+    with Image.open(screens[0]) as img:
+        first_size = img.size
+    sources = [(path, i, "screens") for i, path in enumerate(screens)]
+    if key_art.exists():
+        with Image.open(key_art) as img:
+            key_size = img.size
+        sources.append((key_art, None, "keyart"))
+
+    for src, index, kind in sources:
+        jobs = []
+        by_spec = {}
+        for store in stores:
+            for target in STORE_SPECS[store]:
+                if target["source"] != kind:
+                    continue
+                out = str(output_path(store, target, src, index))
+                shared = by_spec.get(_spec_key(target))
+                if shared:
+                    shared["links"].append(out)
+                else:
+                    by_spec[_spec_key(target)] = {"target": target, "out": out, "links": []}
+                    jobs.append(by_spec[_spec_key(target)])
+        if not jobs:
+            continue
+        # key art 自成一组，不受第一张截图比例影响
+        ref_size = first_size if kind == "screens" else key_size
+
+        def action(src=src, jobs=jobs, ref_size=ref_size):
+            return [Path(p) for p in _process_pool().submit(export_source, str(src), jobs, ref_size).result()]
+
+        graph.add(
+            f"stores:{src.stem}",
+            action,
+            inputs=[src, screens[0]] if kind == "screens" else [src],
+            outputs=[Path(p) for j in jobs for p in [j["out"], *j["links"]]],
+            params={"jobs": jobs, "ref_size": list(ref_size)},
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按商店规格表导出截图与宣传图")
+    parser.add_argument("stores", nargs="*", help=f"商店（默认全部: {', '.join(STORE_SPECS)}）")
+    parser.add_argument("--key-art", type=Path, default=KEY_ART, help="capsule/封面等使用的横版宣传图")
+    parser.add_argument("--force", action="store_true", help="忽略构建记录，全部重新导出")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要重新导出的源图")
+    args = parser.parse_args()
+
+    unknown = set(args.stores) - set(STORE_SPECS)
+    if unknown:
+        print(f"[错误] 未知商店: {', '.join(sorted(unknown))}，支持: {', '.join(STORE_SPECS)}")
+        sys.exit(1)
+    if not INPUT_DIR.is_dir() or not list_inputs():
+        print(f"[错误] 在 {INPUT_DIR} 下未找到截图")
+        sys.exit(1)
+
+    graph = BuildGraph()
+    build_nodes(graph, args.stores or None, args.key_art.resolve())
+    results = graph.build(jobs=os.cpu_count() or 4, force=args.force, dry_run=args.dry_run)
+    counts = {}
+    for status in results.values():
+        counts[status] = counts.get(status, 0) + 1
+    print(f"\n完成: {', '.join(f'{k} {v}' for k, v in sorted(counts.items())) or '无源图'}。输出目录: {STORE_DIR}")
+    if counts.get("failed"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    profiled_main(main)
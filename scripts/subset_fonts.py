@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+按游戏实际用到的文字给 Noto Serif SC 做子集，替换 Google Fonts 的 100 多个分片。
+
+字表来源（SOURCES）：
+    csv/*.csv               所有文本列（非数字列）的单元格
+    constants.ts、types.ts、App.tsx、index.tsx、components/*.tsx、services/*.ts
+                            字符串字面量（'…' "…" `…`）与 JSX 文本，注释不计入
+另加 BASE_CHARS（ASCII 可见字符与常用中文标点），保证数字、拼接文本等动态内容可显示。
+
+字体来源是 download-assets.js 下载的分片（public/fonts/NotoSerifSC/*.woff2，wght 可变字体）。
+流程：按分片 CSS 的 unicode-range 只取用到的分片 → 各自子集 → 实例化成 400/700 两个静态字重
+→ 每个字重合并成一个 woff2。分片子集与两个字重的合并都在进程池里并行；
+每个分片的子集结果按（分片哈希, 该分片用到的字）缓存在 scripts/.cache/fonts/，
+新增几个字时只有包含新字的分片需要重新子集。
+
+首次运行时把原分片 CSS 备份为 NotoSerifSC.slices.css（之后以它为分片索引），再重写
+NotoSerifSC.css 只引用子集文件；未覆盖的字符由浏览器回退到系统字体。
+子集目录下的 subset.json 记录字表与来源哈希：字表没有新增字符且来源不变时跳过，
+所以 generate_csv.py 追加数据后只有出现新字才会重建。
+
+依赖 fontTools 与 brotli（pip install "fonttools[woff]"），未安装时提示并跳过。
+
+用法:
+    python scripts/subset_fonts.py            # 有新字才重建
+    python scripts/subset_fonts.py --force
+    python scripts/subset_fonts.py --list     # 只统计字表
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from buildgraph import file_digest, hash_cache, value_digest
+from common import ROOT, cache_path
+from csv_tools import parse_value, read_table, table_names, table_path
+from encoder import write_atomic
+from profiling import profiled_main, span
+
+FONTS_DIR = ROOT / "public" / "fonts"
+FONT_CSS = FONTS_DIR / "NotoSerifSC.css"
+SLICE_CSS = FONTS_DIR / "NotoSerifSC.slices.css"
+SUBSET_DIR = FONTS_DIR / "NotoSerifSC-subset"
+MANIFEST = SUBSET_DIR / "subset.json"
+SLICE_CACHE = cache_path("fonts")
+
+FAMILY = "Noto Serif SC"
+FILE_PREFIX = "noto-serif-sc"
+WEIGHTS = (400, 700)
+
+# 随游戏发布的全部 TS/TSX（构建配置除外）；services/ 里也有界面文字（如 uniqueWeaponService 的按钮文案）
+SOURCES = ["constants.ts", "types.ts", "App.tsx", "index.tsx", "components/*.tsx", "services/*.ts"]
+BASE_CHARS = (
+    "".join(chr(c) for c in range(0x20, 0x7F))
+    + "，。、；：？！…—～·“”‘’（）《》〈〉【】「」『』〔〕％＋－×÷＝０１２３４５６７８９"
+)
+
+LITERAL_RE = re.compile(
+    r"(//[^\n]*|/\*.*?\*/)"                                          # 注释
+    r"|('(?:\\.|[^'\\\n])*'|\"(?:\\.|[^\"\\\n])*\"|`(?:\\.|[^`\\])*`)",  # 字符串字面量
+    re.S,
+)
+JSX_TEXT_RE = re.compile(r">([^<>{}]+)<")
+SLICE_RULE_RE = re.compile(r"src:\s*url\(\./NotoSerifSC/([^)]+)\).*?unicode-range:\s*([^;]+);", re.S)
+
+
+# ============================================================
+#  字表
+# ============================================================
+
+def csv_text(name: str) -> str:
+    """一张表里所有文本列（至少有一个非数字值的列）的内容。"""
+    header, rows = read_table(name)
+    text_cols = set()
+    for row in rows:
+        for i, raw in enumerate(row):
+            value = parse_value(raw)
+            values = value if isinstance(value, list) else [value]
+            if any(isinstance(v, str) for v in values):
+                text_cols.add(i)
+    return "".join(row[i] for row in rows for i in text_cols if i < len(row))
+
+
+def source_text(path: Path) -> str:
+    """TS/TSX 中的字符串字面量与 JSX 文本（先去掉注释）。"""
+    code = path.read_text(encoding="utf-8")
+    literals = []
+
+    def keep(match):
+        if match.group(2):
+            literals.append(match.group(2)[1:-1])
+            return " " * len(match.group(2))  # 占位，避免字面量里的 >…< 被当成 JSX 文本
+        return ""
+
+    code = LITERAL_RE.sub(keep, code)
+    literals += JSX_TEXT_RE.findall(code)
+    return "".join(literals)
+
+
+def source_files() -> list[Path]:
+    files = [table_path(name) for name in table_names()]
+    for pattern in SOURCES:
+        files += sorted(ROOT.glob(pattern))
+    return files
+
+
+def collect_glyphs() -> set[int]:
+    """游戏文本用到的全部码位（不含控制字符）。"""
+    text = BASE_CHARS
+    with span("collect", files=len(source_files())):
+        for name in table_names():
+            text += csv_text(name)
+        for pattern in SOURCES:
+            for path in sorted(ROOT.glob(pattern)):
+                text += source_text(path)
+    return {ord(c) for c in text if ord(c) >= 0x20 and not 0x7F <= ord(c) < 0xA0}
+
+
+# ============================================================
+#  分片索引
+# ============================================================
+
+def parse_ranges(value: str) -> set[int]:
+    codes = set()
+    for part in value.split(","):
+        part = part.strip().upper().removeprefix("U+")
+        start, _, end = part.partition("-")
+        codes.update(range(int(start, 16), int(end or start, 16) + 1))
+    return codes
+
+
+def is_slice_css(path: Path) -> bool:
+    return path.exists() and SLICE_RULE_RE.search(path.read_text(encoding="utf-8")) is not None
+
+
+def ensure_slice_index() -> Path | None:
+    """
+    返回分片 CSS。NotoSerifSC.css 仍是分片版（首次运行或 download-assets.js 重新下载后）时，
+    先把它备份为 NotoSerifSC.slices.css。
+    """
+    if is_slice_css(FONT_CSS):
+        shutil.copy2(FONT_CSS, SLICE_CSS)
+        print(f"  [备份] {FONT_CSS.name} -> {SLICE_CSS.name}")
+    return SLICE_CSS if is_slice_css(SLICE_CSS) else None
+
+
+def slice_ranges(css_path: Path) -> dict[str, set[int]]:
+    """分片文件名 → 覆盖的码位（400/700 规则指向同一批可变字体文件，合并去重）。"""
+    slices = {}
+    for name, ranges in SLICE_RULE_RE.findall(css_path.read_text(encoding="utf-8")):
+        slices.setdefault(name, set()).update(parse_ranges(ranges))
+    return slices
+
+
+# ============================================================
+#  子集与合并
+# ============================================================
+
+def subset_slice(path: str, codes: list[int], outputs: dict[int, str]):
+    """在工作进程中执行：子集一个分片，实例化为各静态字重，写到 outputs {字重: 缓存路径}。"""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    from fontTools.varLib import instancer
+
+    font = TTFont(path)
+    options = subset.Options()  # 默认只保留常用 OpenType 特性（含竖排 vert/vrt2）
+    options.hinting = False
+    options.notdef_outline = True
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codes)
+    subsetter.subset(font)
+
+    for weight, out in outputs.items():
+        static = instancer.instantiateVariableFont(font, {"wght": weight}) if "fvar" in font else font
+        buf = io.BytesIO()
+        static.save(buf)
+        write_atomic(Path(out), buf.getvalue())
+
+
+def merge_fonts(parts: list[str]) -> bytes:
+    """在工作进程中执行：把同一字重的各分片子集（TTF 路径）合并成一个 woff2。"""
+    from fontTools.merge import Merger
+
+    font = Merger().merge(parts)
+    font.flavor = "woff2"
+    buf = io.BytesIO()
+    font.save(buf)
+    return buf.getvalue()
+
+
+def font_css(files: dict[int, str]) -> str:
+    # 每个字重只有一个文件，不写 unicode-range：字体里没有的字浏览器会逐字回退到系统字体
+    rules = []
+    for weight, name in sorted(files.items()):
+        rules.append(
+            "@font-face {\n"
+            f"  font-family: '{FAMILY}';\n"
+            "  font-style: normal;\n"
+            f"  font-weight: {weight};\n"
+            "  font-display: swap;\n"
+            f"  src: url(./{SUBSET_DIR.name}/{name}) format('woff2');\n"
+            "}\n"
+        )
+    header = f"/* 由 scripts/subset_fonts.py 生成，原分片版见 {SLICE_CSS.name} */\n"
+    return header + "".join(rules)
+
+
+# ============================================================
+#  增量构建
+# ============================================================
+
+def load_manifest() -> dict:
+    try:
+        return json.loads(MANIFEST.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def is_fresh(manifest: dict, glyphs: set[int], sources: str) -> bool:
+    """没有新增字符、来源与参数不变、输出都还在。"""
+    if manifest.get("sources") != sources or manifest.get("weights") != list(WEIGHTS):
+        return False
+    if not glyphs <= {ord(c) for c in manifest.get("glyphs", "")}:
+        return False
+    return FONT_CSS.exists() and all((SUBSET_DIR / f).exists() for f in manifest.get("files", {}).values())
+
+
+def build_subset(force: bool = False, workers: int | None = None) -> list[Path] | None:
+    """
+    必要时重建子集字体与 CSS，返回写出的文件；已是最新返回 []；
+    缺少 fontTools 或分片时返回 None。
+    """
+    try:
+        import fontTools  # noqa: F401
+    except ImportError:
+        print('[跳过] 未安装 fontTools，字体子集未更新（pip install "fonttools[woff]"）')
+        return None
+
+    slice_css = ensure_slice_index()
+    if slice_css is None:
+        print(f"[跳过] 找不到分片字体 CSS（{FONT_CSS.name} / {SLICE_CSS.name}），请先运行 download-assets.js")
+        return None
+
+    glyphs = collect_glyphs()
+    slices = slice_ranges(slice_css)
+    sources = value_digest({name: file_digest(FONTS_DIR / "NotoSerifSC" / name) for name in slices})
+    hash_cache().save()
+    manifest = load_manifest()
+    if not force and is_fresh(manifest, glyphs, sources):
+        print(f"  字体子集已是最新（{len(glyphs)} 字，无新增）")
+        return []
+
+    used = {name: sorted(glyphs & codes) for name, codes in slices.items() if glyphs & codes}
+    covered = set().union(*map(set, used.values())) if used else set()
+    missing = glyphs - covered
+    print(f"  字表 {len(glyphs)} 字，涉及 {len(used)}/{len(slices)} 个分片"
+          + (f"，{len(missing)} 个字符字体中没有" if missing else ""))
+
+    parts = {weight: [] for weight in WEIGHTS}
+    pending = []
+    for name, codes in sorted(used.items()):
+        path = FONTS_DIR / "NotoSerifSC" / name
+        key = value_digest([file_digest(path), codes])[:20]
+        outputs = {weight: SLICE_CACHE / f"{key}-{weight}.ttf" for weight in WEIGHTS}
+        for weight, out in outputs.items():
+            parts[weight].append(str(out))
+        if not all(out.exists() for out in outputs.values()):
+            pending.append((str(path), codes, {w: str(o) for w, o in outputs.items()}))
+    print(f"  需要重新子集的分片: {len(pending)}（其余取自缓存）")
+
+    workers = workers or os.cpu_count() or 4
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, max(len(pending), len(WEIGHTS))))) as pool:
+        with span("subset", slices=len(pending)):
+            for future in [pool.submit(subset_slice, *job) for job in pending]:
+                future.result()
+        with span("merge", weights=len(WEIGHTS)):
+            merged = {weight: pool.submit(merge_fonts, parts[weight]) for weight in WEIGHTS}
+            merged = {weight: future.result() for weight, future in merged.items()}
+
+    files, written = {}, []
+    for weight, data in merged.items():
+        # 文件名带内容哈希，字表变化后浏览器不会用到旧缓存
+        name = f"{FILE_PREFIX}-{weight}.{value_digest(data.hex())[:10]}.woff2"
+        written.append(write_atomic(SUBSET_DIR / name, data))
+        files[weight] = name
+        print(f"  [写入] {name}（{len(data) / 1024:.0f} KB）")
+
+    for old in SUBSET_DIR.glob(f"{FILE_PREFIX}-*.woff2"):
+        if old.name not in files.values():
+            old.unlink()
+    written.append(write_atomic(FONT_CSS, font_css(files).encode("utf-8")))
+    manifest = {
+        "glyphs": "".join(chr(c) for c in sorted(glyphs)),
+        "sources": sources,
+        "weights": list(WEIGHTS),
+        "files": {str(w): n for w, n in files.items()},
+    }
+    written.append(write_atomic(MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8")))
+    return written
+
+
+def build_nodes(graph):
+    """字表来源或分片变化时进入 build_subset；没有新字时它自己会跳过。"""
+    graph.add(
+        "fonts:subset",
+        lambda: build_subset() or [],
+        inputs=source_files() + [p for p in (SLICE_CSS,) if p.exists()],
+        outputs=[FONT_CSS, MANIFEST],
+        params={"weights": list(WEIGHTS), "base": BASE_CHARS, "sources": SOURCES},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按游戏文本子集化 Noto Serif SC")
+    parser.add_argument("--force", action="store_true", help="忽略字表记录，强制重建")
+    parser.add_argument("--list", action="store_true", help="只统计字表，不生成字体")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    args = parser.parse_args()
+
+    if args.list:
+        glyphs = collect_glyphs()
+        cjk = sum(1 for c in glyphs if 0x3400 <= c <= 0x9FFF)
+        print(f"字表: {len(glyphs)} 个字符，其中汉字 {cjk} 个")
+        return
+    if build_subset(force=args.force, workers=args.workers) is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    profiled_main(main)
@@ -17,6 +17,9 @@ except ImportError:
     print("请先安装 Pillow: pip install Pillow")
     sys.exit(1)
 
+from encoder import encode_under_budget, write_atomic
+from profiling import profiled_main, span
+
 # 路径
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 INPUT_DIR = PROJECT_ROOT / "docs" / "taptap"
@@ -95,29 +98,20 @@ def resize_to_min(img: Image.Image, mode: str) -> Image.Image:
     return img.resize((new_w, new_h), Image.Resampling.LANCZOS)
 
 
-def save_under_size(img: Image.Image, out_path: Path, ext: str) -> None:
-    """保存为 JPG/PNG，若超过 4MB 则降低 JPG 质量重试。"""
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    if ext.lower() == ".png":
-        img.save(out_path, "PNG", optimize=True)
-        if out_path.stat().st_size > MAX_FILE_BYTES:
-            # PNG 过大时转为 JPG
-            out_path = out_path.with_suffix(".jpg")
-            save_under_size(img, out_path, ".jpg")
-        return
-    # JPG
-    for quality in [92, 85, 78, 70, 60]:
-        img.save(out_path, "JPEG", quality=quality, optimize=True)
-        if out_path.stat().st_size <= MAX_FILE_BYTES:
-            return
-    # 最后缩小尺寸
-    w, h = img.size
-    while out_path.exists() and out_path.stat().st_size > MAX_FILE_BYTES and w > 640:
-        w, h = w * 9 // 10, h * 9 // 10
-        img_small = img.resize((w, h), Image.Resampling.LANCZOS)
-        img_small.save(out_path, "JPEG", quality=75, optimize=True)
-    if out_path.stat().st_size > MAX_FILE_BYTES:
+def save_under_size(img: Image.Image, out_path: Path, ext: str, min_size: tuple[int, int] = (1, 1)) -> Path:
+    """
+    在内存中找出 < 4MB 的编码（PNG 放不下改 JPG；JPG 先二分质量，再缩小尺寸但不低于 min_size），
+    只写一次文件。返回实际写出的路径。
+    """
+    fmt = "PNG" if ext.lower() == ".png" else "JPEG"
+    result = encode_under_budget(img, MAX_FILE_BYTES, fmt, min_size=min_size, optimize=True)
+    # 格式没变时保留原扩展名（如 .jpeg）
+    out_path = write_atomic(out_path if result.format == fmt else out_path.with_suffix(result.suffix), result.data)
+    if not result.fits:
         print(f"  警告: {out_path.name} 仍超过 4MB，请手动压缩或换图")
+    elif result.size != img.size:
+        print(f"  {out_path.name} 超过 4MB，已缩小到 {result.size[0]}x{result.size[1]}（质量 {result.quality}）")
+    return out_path
 
 
 def process_image(
@@ -125,35 +119,77 @@ def process_image(
     target_ratio: float,
     mode: str,
     index: int,
-) -> None:
-    """处理单张图片：裁剪、缩放、保存。"""
+) -> Path:
+    """处理单张图片：裁剪、缩放、保存。返回输出路径。"""
     with Image.open(path) as img:
-        img = img.convert("RGB") if img.mode not in ("RGB", "RGBA") else img
-        if img.mode == "RGBA":
-            bg = Image.new("RGB", img.size, (255, 255, 255))
-            bg.paste(img, mask=img.split()[-1])
-            img = bg
-        cropped = crop_to_ratio(img, target_ratio, mode)
-        resized = resize_to_min(cropped, mode)
+        with span("decode", file=path.name):
+            img.load()
+            img = img.convert("RGB") if img.mode not in ("RGB", "RGBA") else img
+            if img.mode == "RGBA":
+                bg = Image.new("RGB", img.size, (255, 255, 255))
+                bg.paste(img, mask=img.split()[-1])
+                img = bg
+        with span("resize", file=path.name):
+            cropped = crop_to_ratio(img, target_ratio, mode)
+            resized = resize_to_min(cropped, mode)
         ext = path.suffix.lower()
         if ext not in (".jpg", ".jpeg", ".png"):
             ext = ".jpg"
         out_name = f"screen{index + 1}{ext}"
-        out_path = OUTPUT_DIR / out_name
-        save_under_size(resized, out_path, ext)
+        with span("encode", file=out_name):
+            min_size = (MIN_WIDTH_H, MIN_HEIGHT_H) if mode == "horizontal" else (MIN_WIDTH_V, MIN_HEIGHT_V)
+            out_path = save_under_size(resized, OUTPUT_DIR / out_name, ext, min_size)
         size_mb = out_path.stat().st_size / (1024 * 1024)
-        print(f"  {path.name} -> {out_name} ({resized.size[0]}x{resized.size[1]}, {size_mb:.2f} MB)")
+        print(f"  {path.name} -> {out_path.name} ({resized.size[0]}x{resized.size[1]}, {size_mb:.2f} MB)")
+        return out_path
 
 
-def main():
-    if not INPUT_DIR.is_dir():
-        print(f"输入目录不存在: {INPUT_DIR}")
-        sys.exit(1)
+def list_inputs() -> list[Path]:
+    """列出输入目录下按文件名排序的截图。"""
     allowed = {".jpg", ".jpeg", ".png"}
-    files = sorted(
+    if not INPUT_DIR.is_dir():
+        return []
+    return sorted(
         [f for f in INPUT_DIR.iterdir() if f.is_file() and f.suffix.lower() in allowed],
         key=lambda p: p.name,
     )
+
+
+def target_spec(first: Path) -> tuple[str, float]:
+    """以第一张图确定横/竖与目标宽高比。"""
+    with Image.open(first) as img:
+        w, h = img.size
+    return clamp_ratio_to_taptap(w, h)
+
+
+def build_nodes(graph):
+    """向构建图注册每张截图的裁剪节点（截图本身、第一张图或规范变化时才重建）。"""
+    files = list_inputs()
+    if len(files) < 3:
+        return
+    mode, target_ratio = target_spec(files[0])
+    spec = {
+        "mode": mode,
+        "ratio": round(target_ratio, 6),
+        "min": [MIN_WIDTH_H, MIN_HEIGHT_H, MIN_WIDTH_V, MIN_HEIGHT_V],
+        "max_bytes": MAX_FILE_BYTES,
+    }
+    for i, path in enumerate(files):
+        ext = path.suffix.lower()
+        graph.add(
+            f"taptap:screen{i + 1}",
+            lambda path=path, i=i: [process_image(path, target_ratio, mode, i)],
+            inputs=[path, files[0]],
+            outputs=[OUTPUT_DIR / f"screen{i + 1}{ext}"],
+            params={**spec, "index": i},
+        )
+
+
+def main():
+    if not INPUT_DIR.is_dir():
+        print(f"输入目录不存在: {INPUT_DIR}")
+        sys.exit(1)
+    files = list_inputs()
     if not files:
         print(f"在 {INPUT_DIR} 下未找到 JPG/PNG 图片")
         sys.exit(1)
@@ -161,9 +197,7 @@ def main():
         print("TapTap 要求不少于 3 张截图，当前不足 3 张，请补充后再运行")
         sys.exit(1)
     # 第一张定比例
-    with Image.open(files[0]) as first:
-        w, h = first.size
-    mode, target_ratio = clamp_ratio_to_taptap(w, h)
+    mode, target_ratio = target_spec(files[0])
     print(f"以第一张为准: {'横图' if mode == 'horizontal' else '竖图'}, 宽高比 ≈ {target_ratio:.3f}")
     print(f"输出目录: {OUTPUT_DIR}\n")
     for i, path in enumerate(files):
@@ -172,4 +206,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    profiled_main(main)
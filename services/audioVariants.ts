@@ -0,0 +1,165 @@
+import mainBgm from '../public/audio/variants/main_bgm/main_bgm.json';
+
+// 由 scripts/audio_variants.py 生成：public/audio/*.mp3 的 Opus/AAC 低码率版本、片头分段与清单。
+// WebM 带 Cues、m4a 的 moov 前置，收到第一段数据即可开始播放，其余边播边下。
+interface AudioVariant {
+  file: string;
+  codec: string;
+  kbps: number;
+  bytes: number;
+}
+
+interface AudioManifest {
+  loudness?: { gain_db: number };
+  loop?: { start: number; end: number | null };
+  intro?: { seconds: number; files: AudioVariant[] };
+  variants: AudioVariant[];
+}
+
+const MANIFESTS: Record<string, AudioManifest> = {
+  main_bgm: mainBgm,
+};
+
+const MIME: Record<string, string> = {
+  opus: 'audio/webm; codecs="opus"',
+  aac: 'audio/mp4; codecs="mp4a.40.2"',
+};
+
+// 背景音乐取不低于该码率的最小版本（Opus 32kbps / AAC 48kbps）
+const MIN_KBPS = 32;
+const AUDIO_PATH_RE = /^\/audio\/([^/]+)\.mp3$/;
+
+const probe = typeof Audio !== 'undefined' ? new Audio() : null;
+const supported = (codec: string) => !!probe && !!MIME[codec] && probe.canPlayType(MIME[codec]) !== '';
+
+const pickFile = (files: AudioVariant[]): AudioVariant | undefined =>
+  files
+    .filter(v => v.kbps >= MIN_KBPS && supported(v.codec))
+    .sort((a, b) => a.bytes - b.bytes)[0];
+
+export interface BgmSource {
+  src: string;
+  introSrc: string | null;           // 片头分段：先播它，完整版能流畅播放后从同一位置接上
+  gainDb: number;                    // 响度归一化到目标 LUFS 所需的增益
+  loop: { start: number; end: number } | null;  // 去掉首尾静音后的循环区间（秒）
+}
+
+/** '/audio/main_bgm.mp3' → 当前平台能播放的版本、片头、增益与循环点；没有生成版本或都不支持时用原路径 */
+export const getBgmSource = (src: string): BgmSource => {
+  const match = AUDIO_PATH_RE.exec(src);
+  const manifest = match ? MANIFESTS[match[1]] : undefined;
+  const variant = manifest && pickFile(manifest.variants);
+  if (!match || !manifest || !variant) return { src, introSrc: null, gainDb: 0, loop: null };
+  const dir = `/audio/variants/${match[1]}/`;
+  const intro = manifest.intro && pickFile(manifest.intro.files);
+  const loop = manifest.loop;
+  return {
+    src: dir + variant.file,
+    introSrc: intro ? dir + intro.file : null,
+    gainDb: manifest.loudness?.gain_db ?? 0,
+    loop: loop && loop.end != null && loop.end > loop.start ? { start: loop.start, end: loop.end } : null,
+  };
+};
+
+/**
+ * 背景音乐播放器：片头与完整版两个 Audio 元素。
+ * 切换曲目时先播片头（几十 KB，首段数据到达即可出声），完整版 canplaythrough 后从片头当前位置接上；
+ * 音量按清单的 gain_db 归一化，有循环点时在 loop.end 跳回 loop.start。
+ */
+export class BgmPlayer {
+  private main = new Audio();
+  private intro = new Audio();
+  private current: BgmSource | null = null;
+  private volume = 1;
+  private handedOff = false;
+  private retry: (() => void) | null = null;
+
+  constructor() {
+    this.main.preload = 'auto';
+    this.main.addEventListener('timeupdate', this.checkLoop);
+    this.main.addEventListener('ended', this.restartLoop);
+    this.intro.addEventListener('ended', this.handoff);
+  }
+
+  /** 播放 src（已在播放则只更新音量）；volume 为用户设置的 0~1 音量 */
+  play(src: string, volume: number) {
+    this.volume = volume;
+    const next = getBgmSource(src);
+    if (this.current && this.current.src === next.src) {
+      this.applyVolume();
+      return;
+    }
+    this.stop();
+    this.current = next;
+    this.applyVolume();
+    this.main.loop = !next.loop;
+    this.main.src = next.src;
+    this.main.load();
+    if (next.introSrc) {
+      this.handedOff = false;
+      this.main.addEventListener('canplaythrough', this.handoff);
+      this.intro.src = next.introSrc;
+      this.start(this.intro);
+    } else {
+      this.handedOff = true;
+      this.start(this.main);
+    }
+  }
+
+  stop() {
+    this.main.removeEventListener('canplaythrough', this.handoff);
+    this.main.pause();
+    this.intro.pause();
+    this.intro.removeAttribute('src');
+    this.clearRetry();
+  }
+
+  private applyVolume() {
+    const gain = Math.pow(10, (this.current?.gainDb ?? 0) / 20);
+    const volume = Math.min(1, Math.max(0, this.volume * gain));
+    this.main.volume = volume;
+    this.intro.volume = volume;
+  }
+
+  /** 片头播完或完整版已可流畅播放：完整版从片头的位置继续 */
+  private handoff = () => {
+    if (this.handedOff) return;
+    this.handedOff = true;
+    this.main.removeEventListener('canplaythrough', this.handoff);
+    const position = this.intro.ended ? this.intro.duration : this.intro.currentTime;
+    this.intro.pause();
+    if (Number.isFinite(position)) this.main.currentTime = position;
+    this.start(this.main);
+  };
+
+  private checkLoop = () => {
+    const loop = this.current?.loop;
+    if (loop && this.main.currentTime >= loop.end) this.main.currentTime = loop.start;
+  };
+
+  private restartLoop = () => {
+    const loop = this.current?.loop;
+    if (!loop) return;
+    this.main.currentTime = loop.start;
+    this.start(this.main);
+  };
+
+  /** 播放；被浏览器自动播放策略拦截时，等用户第一次点击后再播 */
+  private start(audio: HTMLAudioElement) {
+    this.clearRetry();
+    audio.play().catch(() => {
+      if (audio === this.intro && this.handedOff) return;  // 片头已被完整版接替
+      const retry = () => {
+        this.clearRetry();
+        audio.play().catch(() => {});
+      };
+      this.retry = retry;
+      window.addEventListener('click', retry);
+    });
+  }
+
+  private clearRetry() {
+    if (this.retry) window.removeEventListener('click', this.retry);
+    this.retry = null;
+  }
+}
@@ -0,0 +1,32 @@
+import type { CSSProperties } from 'react';
+import atlas from '../public/assets/atlas/icons.json';
+
+// 由 scripts/sprite_atlas.py 生成：public/assets/icons/*.png 打包成的 1x/2x 图集，
+// 图片本身由 index.css 的 .icon-atlas 提供（WebP 1x/2x，PNG 回退）。
+export interface AtlasFrame {
+  x: number;
+  y: number;
+  w: number;
+  h: number;
+}
+
+const FRAMES: Record<string, AtlasFrame> = atlas.frames;
+const ICON_PATH_RE = /^\/assets\/icons\/([^/]+)\.png$/;
+
+/** '/assets/icons/axe.png' → 图集中的帧；不在图集中返回 null */
+export const getAtlasFrame = (icon: string): AtlasFrame | null => {
+  const match = ICON_PATH_RE.exec(icon);
+  return match ? FRAMES[match[1]] ?? null : null;
+};
+
+/** 以 width x height（px）显示某一帧的背景样式 */
+export const getAtlasStyle = (frame: AtlasFrame, width: number, height: number): CSSProperties => {
+  const sx = width / frame.w;
+  const sy = height / frame.h;
+  return {
+    width: `${width}px`,
+    height: `${height}px`,
+    backgroundSize: `${atlas.width * sx}px ${atlas.height * sy}px`,
+    backgroundPosition: `${-frame.x * sx}px ${-frame.y * sy}px`,
+  };
+};